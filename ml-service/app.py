@@ -1,7 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
+from app.response_cache import ResponseCache
 
 app = FastAPI(title="Echo ML Service", version="1.0.0")
 
@@ -13,6 +14,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+response_cache = ResponseCache()
+
 @app.get("/")
 async def root():
     return {"message": "Echo ML Service is running", "status": "healthy"}
@@ -37,17 +40,18 @@ async def generate_questions(request: dict = {}):
         "personalization_level": "adaptive"
     }
 
+THIS_OR_THAT_QUESTIONS = [
+    {"option1": "Coffee", "option2": "Tea"},
+    {"option1": "Beach vacation", "option2": "Mountain vacation"},
+    {"option1": "Movie night", "option2": "Night out"},
+    {"option1": "Early bird", "option2": "Night owl"},
+    {"option1": "Cooking together", "option2": "Ordering takeout"}
+]
+
 @app.get("/games/this-or-that")
-async def this_or_that_questions():
-    questions = [
-        {"option1": "Coffee", "option2": "Tea"},
-        {"option1": "Beach vacation", "option2": "Mountain vacation"},
-        {"option1": "Movie night", "option2": "Night out"},
-        {"option1": "Early bird", "option2": "Night owl"},
-        {"option1": "Cooking together", "option2": "Ordering takeout"}
-    ]
-    
-    return {"questions": questions}
+async def this_or_that_questions(request: Request):
+    key = ResponseCache.make_key('/games/this-or-that')
+    return response_cache.respond(request, key, lambda: {"questions": THIS_OR_THAT_QUESTIONS})
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7860))
@@ -1,70 +1,189 @@
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import json
-from datetime import datetime
+import os
+import time
+from .bandit import ThompsonSelector
+from .entity_state import EntityArrays, EntitySets
+from .interning import IdRegistry
+from .metrics import timed
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+DIFFICULTY_CODES = {difficulty: code for code, difficulty in enumerate(DIFFICULTIES)}
+# Engagement scores kept per user (features use the last 5, suggestions the last 3)
+RECENT_ENGAGEMENT = 5
+# Games whose questions are not asked again
+RECENT_GAMES = 3
+# Categories and conversation topics counted per user, by their interned ints (later ones are not tracked)
+MAX_PROFILE_CATEGORIES = 32
+MAX_PROFILE_TOPICS = 16
+# Conversation sentiments, coded by position (0, neutral, until a conversation is analyzed)
+SENTIMENTS = ('neutral', 'positive', 'negative')
+SENTIMENT_CODES = {sentiment: code for code, sentiment in enumerate(SENTIMENTS)}
+ENGAGING_TYPES = ('this_or_that', 'multiple_choice')
+# Bandit segments: optimal difficulty x engagement level (low / medium / high)
+ENGAGEMENT_LEVELS = 3
+SEGMENTS = len(DIFFICULTIES) * ENGAGEMENT_LEVELS
+SELECTION_POLICIES = ('heuristic', 'thompson')
 
 class AdaptiveLearningEngine:
-    def __init__(self):
+    # Bump when export_state's layout changes; older snapshots are then skipped rather than misread
+    STATE_VERSION = 2
+
+    def __init__(self, registry: Optional[IdRegistry] = None, selection_policy: Optional[str] = None):
         self.question_classifier = DecisionTreeClassifier(random_state=42)
         self.difficulty_classifier = RandomForestClassifier(n_estimators=10, random_state=42)
-        self.user_profiles = {}
-        self.question_history = {}
+        # String ids are interned once; per-user and per-question numbers live in arrays indexed by those ints
+        self.registry = registry or IdRegistry()
+        self.user_state = EntityArrays({
+            'games_played': np.int32,
+            'score_sum': np.float64,
+            'difficulty_sum': (np.float64, (len(DIFFICULTIES),), 0.0),
+            'difficulty_count': (np.int32, (len(DIFFICULTIES),), 0),
+            'recent_engagement': (np.float64, (RECENT_ENGAGEMENT,), 0.0),
+            'engagement_count': np.int64,
+            'last_seen': np.float64,
+            # Games per category and conversation hits per topic, indexed by the registry's category/topic ints
+            'category_plays': (np.int32, (MAX_PROFILE_CATEGORIES,), 0),
+            'topic_interest': (np.int32, (MAX_PROFILE_TOPICS,), 0)
+        })
+        # Question attributes are read from the question dict the first time its id is seen
+        self.question_state = EntityArrays({
+            'known': np.bool_,
+            'category': (np.int32, (), -1),
+            'difficulty': (np.int8, (), -1),
+            'engaging': np.bool_
+        })
+        # user int -> ints of the questions the user answered
+        self.answered = EntitySets()
+        # couple int -> question ints of the couple's last RECENT_GAMES games, oldest first, and each game's length
+        self.question_history = EntitySets()
+        self.couple_state = EntityArrays({
+            'game_lengths': (np.int32, (RECENT_GAMES,), 0),
+            # SENTIMENTS code of the couple's latest analyzed conversation
+            'sentiment': np.int8
+        })
+        # Learns which questions each segment engages with from every recorded game, whichever policy selects
+        self.bandit = ThompsonSelector(SEGMENTS)
+        self.selection_policy = selection_policy or os.environ.get('QUESTION_SELECTION_POLICY', 'heuristic')
+        if self.selection_policy not in SELECTION_POLICIES:
+            raise ValueError(f"Unknown question selection policy {self.selection_policy!r}; expected one of {SELECTION_POLICIES}")
         self.is_trained = False
         
     def update_user_profile(self, user_id: str, game_data: Dict[str, Any]):
         """Update user profile with new game data"""
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {
-                'games_played': 0,
-                'avg_score': 0,
-                'preferred_categories': {},
-                'difficulty_performance': {'easy': [], 'medium': [], 'hard': []},
-                'engagement_scores': [],
-                'question_preferences': {}
-            }
-        
-        profile = self.user_profiles[user_id]
-        profile['games_played'] += 1
-        
-        # Update average score
-        new_score = game_data.get('score', 0)
-        games_count = profile['games_played']
-        profile['avg_score'] = (profile['avg_score'] * (games_count - 1) + new_score) / games_count
+        index = self.registry.intern('user', user_id)
+        category = self.registry.intern('category', game_data.get('category', 'general'))
+        state = self.user_state
+        state.ensure(index)
+        
+        new_score = float(game_data.get('score', 0))
+        state.columns['games_played'][index] += 1
+        state.columns['score_sum'][index] += new_score
+        state.columns['last_seen'][index] = time.time()
         
         # Update category preferences
-        category = game_data.get('category', 'general')
-        profile['preferred_categories'][category] = profile['preferred_categories'].get(category, 0) + 1
+        if category < MAX_PROFILE_CATEGORIES:
+            state.columns['category_plays'][index, category] += 1
         
         # Update difficulty performance
-        difficulty = game_data.get('difficulty', 'medium')
-        if difficulty in profile['difficulty_performance']:
-            profile['difficulty_performance'][difficulty].append(new_score)
-        
-        # Update engagement
-        engagement = game_data.get('engagement_score', 0.5)
-        profile['engagement_scores'].append(engagement)
-        
-        # Track question responses
-        for question_id, response in game_data.get('responses', {}).items():
-            if question_id not in profile['question_preferences']:
-                profile['question_preferences'][question_id] = []
-            profile['question_preferences'][question_id].append(response)
+        code = DIFFICULTY_CODES.get(game_data.get('difficulty', 'medium'))
+        if code is not None:
+            state.columns['difficulty_sum'][index, code] += new_score
+            state.columns['difficulty_count'][index, code] += 1
+        
+        # Update engagement (ring buffer of the latest scores)
+        count = state.columns['engagement_count'][index]
+        state.columns['recent_engagement'][index, count % RECENT_ENGAGEMENT] = game_data.get('engagement_score', 0.5)
+        state.columns['engagement_count'][index] = count + 1
+        
+        # Track answered questions (only whether a question was answered is ever read)
+        responses = game_data.get('responses', {})
+        if responses:
+            self.answered.add(index, self.registry.intern_many('question', list(responses.keys())))
+    
+    def has_profile(self, index: Optional[int]) -> bool:
+        """Whether a user int has any recorded game"""
+        return index is not None and 0 <= index < self.user_state.size \
+            and self.user_state.columns['games_played'][index] > 0
+    
+    def preferred_categories(self, index: int) -> Dict[str, int]:
+        """Games played per category name for a user int"""
+        return self._named_counts('category', self.user_state.columns['category_plays'][index])
+    
+    def topic_interest(self, index: int) -> Dict[str, int]:
+        """Conversation hits per topic name for a user int"""
+        return self._named_counts('topic', self.user_state.columns['topic_interest'][index])
+    
+    def _named_counts(self, namespace: str, counts: np.ndarray) -> Dict[str, int]:
+        return {self.registry.key(namespace, code): int(counts[code]) for code in np.flatnonzero(counts).tolist()}
+    
+    def get_user_profile(self, user_id: str) -> Dict[str, Any]:
+        """Profile summary in the shape QuestionGenerator expects ({} for unknown users)"""
+        index = self.registry.get('user', user_id)
+        if not self.has_profile(index):
+            return {}
+        games = int(self.user_state.columns['games_played'][index])
+        return {
+            'games_played': games,
+            'avg_score': float(self.user_state.columns['score_sum'][index]) / max(games, 1),
+            'preferred_categories': self.preferred_categories(index),
+            'topic_interest': self.topic_interest(index)
+        }
     
     def get_optimal_difficulty(self, user_id: str) -> str:
         """Determine optimal difficulty for user"""
-        if user_id not in self.user_profiles:
+        index = self.registry.get('user', user_id)
+        if index is None or index >= self.user_state.size:
             return 'medium'
-        
-        profile = self.user_profiles[user_id]
-        difficulty_scores = {}
-        
-        for difficulty, scores in profile['difficulty_performance'].items():
-            if scores:
-                avg_score = np.mean(scores)
-                difficulty_scores[difficulty] = avg_score
-        
+        return DIFFICULTIES[int(self._optimal_difficulties(np.array([index]))[0])]
+    
+    def _optimal_difficulties(self, indexes: np.ndarray) -> np.ndarray:
+        """_pick_difficulty for many users at once, as difficulty codes"""
+        counts = self.user_state.columns['difficulty_count'][indexes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, self.user_state.columns['difficulty_sum'][indexes] / counts, -np.inf)
+        # argmax takes the first of equal means, like max() over easy/medium/hard in order
+        best = means.argmax(axis=1)
+        best_score = means[np.arange(len(indexes)), best]
+        codes = np.where((best_score > 0.8) & (best < DIFFICULTY_CODES['hard']), best + 1, best)
+        return np.where(counts.any(axis=1), codes, DIFFICULTY_CODES['medium'])
+    
+    def _recent_engagement(self, indexes: np.ndarray, window: int = RECENT_ENGAGEMENT) -> np.ndarray:
+        """Mean of each user's last `window` engagement scores (0.5 when there are none)"""
+        counts = self.user_state.columns['engagement_count'][indexes]
+        steps = np.arange(window)
+        slots = (counts[:, None] - 1 - steps[None, :]) % RECENT_ENGAGEMENT
+        present = steps[None, :] < np.minimum(counts, window)[:, None]
+        values = self.user_state.columns['recent_engagement'][indexes[:, None], slots]
+        totals = np.where(present, values, 0.0).sum(axis=1)
+        filled = present.sum(axis=1)
+        return np.where(filled > 0, totals / np.maximum(filled, 1), 0.5)
+    
+    def user_segment(self, user_id: str) -> int:
+        """Bandit segment for a user: optimal difficulty x recent engagement level"""
+        index = self.registry.get('user', user_id)
+        if index is None or index >= self.user_state.size:
+            difficulty, engagement = DIFFICULTY_CODES['medium'], 0.5
+        else:
+            indexes = np.array([index])
+            difficulty = int(self._optimal_difficulties(indexes)[0])
+            engagement = float(self._recent_engagement(indexes)[0])
+        # Same thresholds as the engagement_level reported in insights
+        level = 2 if engagement > 0.7 else 1 if engagement > 0.4 else 0
+        return difficulty * ENGAGEMENT_LEVELS + level
+    
+    def _engagement_history(self, index: int) -> List[float]:
+        """A user's retained engagement scores, oldest first"""
+        count = int(self.user_state.columns['engagement_count'][index])
+        kept = min(count, RECENT_ENGAGEMENT)
+        ring = self.user_state.columns['recent_engagement'][index]
+        return [float(ring[(count - kept + offset) % RECENT_ENGAGEMENT]) for offset in range(kept)]
+    
+    def _pick_difficulty(self, difficulty_scores: Dict[str, float]) -> str:
+        """Best-performing difficulty, stepped up when the user is acing it"""
         if not difficulty_scores:
             return 'medium'
         
@@ -72,97 +191,161 @@ class AdaptiveLearningEngine:
         best_diff_name, best_score = max(difficulty_scores.items(), key=lambda x: x[1])
         
         # If performing well on current difficulty, suggest harder
-        if best_difficulty[1] > 0.8 and best_difficulty[0] != 'hard':
+        if best_score > 0.8 and best_diff_name != 'hard':
             difficulty_order = ['easy', 'medium', 'hard']
-            current_idx = difficulty_order.index(best_difficulty[0])
+            current_idx = difficulty_order.index(best_diff_name)
             return difficulty_order[min(current_idx + 1, 2)]
         
-        return best_difficulty[0]
+        return best_diff_name
+    
+    def user_features(self, user_id: str) -> List[float]:
+        """Build the feature row used by the difficulty model"""
+        index = self.registry.get('user', user_id)
+        if index is None or index >= self.user_state.size:
+            return [0.0, 0.0, 0.5, 0.5, 0.5, 0.5]
+        return self._features(np.array([index]))[0].tolist()
+    
+    def _features(self, indexes: np.ndarray) -> np.ndarray:
+        """Feature rows for many users: games, avg score, mean score per difficulty, recent engagement"""
+        columns = self.user_state.columns
+        games = columns['games_played'][indexes].astype(np.float64)
+        counts = columns['difficulty_count'][indexes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            difficulty_means = np.where(counts > 0, columns['difficulty_sum'][indexes] / counts, 0.5)
+        return np.column_stack([
+            games,
+            columns['score_sum'][indexes] / np.maximum(games, 1),
+            difficulty_means,
+            self._recent_engagement(indexes)
+        ])
+    
+    @timed('AdaptiveLearningEngine.train_models')
+    def train_models(self, min_profiles: int = 5) -> bool:
+        """Fit the difficulty classifier on current profiles, labelled by the heuristic"""
+        users = np.flatnonzero(self.user_state['games_played'] > 0)
+        if users.size < min_profiles:
+            return False
+        
+        features = self._features(users)
+        labels = np.asarray(DIFFICULTIES)[self._optimal_difficulties(users)]
+        if len(set(labels.tolist())) < 2:
+            return False
+        
+        classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+        classifier.fit(features, labels)
+        self.difficulty_classifier = classifier
+        self.is_trained = True
+        return True
     
-    def select_questions(self, user_id: str, partner_id: str, available_questions: List[Dict], count: int = 5) -> List[Dict]:
-        """Select optimal questions using decision tree"""
+    def difficulty_from_proba(self, probabilities: Dict[str, float]) -> str:
+        """Pick the most likely difficulty from a batched predict_proba result"""
+        if not probabilities:
+            return 'medium'
+        return max(probabilities.items(), key=lambda x: x[1])[0]
+    
+    @timed('AdaptiveLearningEngine.select_questions')
+    def select_questions(self, user_id: str, partner_id: str, available_questions: List[Dict], count: int = 5,
+                         policy: Optional[str] = None) -> List[Dict]:
+        """Select optimal questions with the heuristic scores or Thompson sampling (policy, default selection_policy)"""
         if not available_questions:
             return []
         
+        question_ints = self._question_ints(available_questions)
+        
         # Filter out recently asked questions
-        filtered_questions = self._filter_recent_questions(user_id, partner_id, available_questions)
+        candidates = self._filter_recent_questions(user_id, partner_id, question_ints)
+        
+        if len(candidates) < count:
+            candidates = np.arange(len(available_questions))
         
-        if len(filtered_questions) < count:
-            filtered_questions = available_questions
+        if (policy or self.selection_policy) == 'thompson':
+            positions = self.bandit.select(self.user_segment(user_id), question_ints[candidates], count)
+            return [available_questions[position] for position in candidates[positions]]
         
         # Score questions based on user preferences and learning
-        scored_questions = []
-        for question in filtered_questions:
-            score = self._score_question(user_id, partner_id, question)
-            scored_questions.append((question, score))
+        scores = self._score_questions(user_id, question_ints[candidates])
         
-        # Sort by score and return top questions
-        scored_questions.sort(key=lambda x: x[1], reverse=True)
-        return [q[0] for q in scored_questions[:count]]
+        # Highest scores first; equal scores keep their order in available_questions
+        order = np.argsort(-scores, kind='stable')[:count]
+        return [available_questions[position] for position in candidates[order]]
     
-    def _filter_recent_questions(self, user_id: str, partner_id: str, questions: List[Dict]) -> List[Dict]:
-        """Filter out questions asked in last 3 games"""
-        couple_key = f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
-        
-        if couple_key not in self.question_history:
-            return questions
-        
-        recent_questions = set()
-        history = self.question_history[couple_key]
-        
-        # Get last 3 games worth of questions
-        for game in history[-3:]:
-            recent_questions.update(game.get('question_ids', []))
-        
-        return [q for q in questions if q.get('id') not in recent_questions]
+    def _question_ints(self, questions: List[Dict]) -> np.ndarray:
+        """Interned ids for questions, registering the attributes of any seen for the first time"""
+        ids = [question.get('id') for question in questions]
+        present = [position for position, question_id in enumerate(ids) if question_id is not None]
+        question_ints = np.full(len(questions), -1, dtype=np.int64)
+        if not present:
+            return question_ints
+        question_ints[present] = self.registry.intern_many('question', [ids[position] for position in present])
+        
+        state = self.question_state
+        state.ensure(int(question_ints.max()))
+        known = state.columns['known']
+        for position in present:
+            index = question_ints[position]
+            if not known[index]:
+                question = questions[position]
+                state.columns['category'][index] = self.registry.intern('category', question.get('category', 'general'))
+                state.columns['difficulty'][index] = DIFFICULTY_CODES.get(question.get('difficulty'), -1)
+                state.columns['engaging'][index] = question.get('type', 'open_ended') in ENGAGING_TYPES
+                known[index] = True
+        return question_ints
+    
+    def _filter_recent_questions(self, user_id: str, partner_id: str, question_ints: np.ndarray) -> np.ndarray:
+        """Positions of questions not asked in the couple's last 3 games"""
+        recent_questions = self.question_history.get(self.registry.couple(user_id, partner_id))
+        if not recent_questions.size:
+            return np.arange(len(question_ints))
+        return np.flatnonzero(~np.isin(question_ints, recent_questions))
     
-    def _score_question(self, user_id: str, partner_id: str, question: Dict) -> float:
-        """Score question based on user preferences and learning objectives"""
-        score = 0.5  # Base score
+    def _score_questions(self, user_id: str, question_ints: np.ndarray) -> np.ndarray:
+        """Score questions based on user preferences and learning objectives"""
+        scores = np.full(len(question_ints), 0.5)  # Base score
+        known = question_ints >= 0
+        safe_ints = np.where(known, question_ints, 0)
+        columns = self.question_state.columns
         
         # User preference scoring
-        if user_id in self.user_profiles:
-            profile = self.user_profiles[user_id]
+        index = self.registry.get('user', user_id)
+        if self.has_profile(index):
+            games = int(self.user_state.columns['games_played'][index])
             
-            # Category preference
-            category = question.get('category', 'general')
-            if category in profile['preferred_categories']:
-                category_weight = profile['preferred_categories'][category] / profile['games_played']
-                score += category_weight * 0.3
+            # Category preference (the last slot, weight 0, stands for unknown or untracked categories)
+            category_weights = np.zeros(MAX_PROFILE_CATEGORIES + 1)
+            category_weights[:MAX_PROFILE_CATEGORIES] = self.user_state.columns['category_plays'][index] / games
+            categories = columns['category'][safe_ints]
+            tracked = known & (categories >= 0) & (categories < MAX_PROFILE_CATEGORIES)
+            scores += category_weights[np.where(tracked, categories, MAX_PROFILE_CATEGORIES)] * 0.3
             
             # Difficulty matching
-            optimal_difficulty = self.get_optimal_difficulty(user_id)
-            if question.get('difficulty') == optimal_difficulty:
-                score += 0.2
+            optimal_difficulty = self._optimal_difficulties(np.array([index]))[0]
+            scores += np.where(known & (columns['difficulty'][safe_ints] == optimal_difficulty), 0.2, 0.0)
             
             # Novelty bonus (questions not answered before)
-            question_id = question.get('id')
-            if question_id not in profile['question_preferences']:
-                score += 0.3
-        
-        # Engagement prediction
-        question_type = question.get('type', 'open_ended')
-        if question_type in ['this_or_that', 'multiple_choice']:
-            score += 0.1  # These tend to be more engaging
-        
-        return min(score, 1.0)
-    
-    def record_game_session(self, user_id: str, partner_id: str, game_data: Dict):
-        """Record game session for learning"""
-        couple_key = f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
-        
-        if couple_key not in self.question_history:
-            self.question_history[couple_key] = []
-        
-        session_data = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'question_ids': game_data.get('question_ids', []),
-            'user_responses': {user_id: game_data.get('user_responses', {})},
-            'scores': {user_id: game_data.get('score', 0)},
-            'engagement': game_data.get('engagement_score', 0.5)
-        }
+            scores += np.where(np.isin(question_ints, self.answered.get(index)) & known, 0.0, 0.3)
+        
+        # Engagement prediction: this_or_that / multiple_choice tend to be more engaging
+        scores += np.where(known & columns['engaging'][safe_ints], 0.1, 0.0)
+        
+        return np.minimum(scores, 1.0)
+    
+    @timed('AdaptiveLearningEngine.record_game_session')
+    def record_game_session(self, user_id: str, partner_id: str, game_data: Dict, update_bandit: bool = True):
+        """Record game session for learning
+
+        update_bandit=False leaves the bandit posteriors alone (the replay evaluator feeds them itself).
+        """
+        couple = self.registry.couple(user_id, partner_id)
+        # Segment as of selection time, before this game moves the user's profile
+        segment = self.user_segment(user_id)
+        
+        # Only which questions each recent game asked is read back
+        question_ints = self.registry.intern_many('question', game_data.get('question_ids', []))
+        self._remember_game(couple, question_ints)
         
-        self.question_history[couple_key].append(session_data)
+        engagement = game_data.get('engagement_score', 0.5)
+        if update_bandit and engagement is not None:
+            self.bandit.update(segment, question_ints, engagement)
         
         # Update user profiles with error handling
         try:
@@ -174,41 +357,91 @@ class AdaptiveLearningEngine:
         except Exception as e:
             print(f"Error updating user profiles: {e}")
     
+    def _remember_game(self, couple: int, question_ints: np.ndarray):
+        """Append a game to the couple's recent questions, dropping the oldest game past RECENT_GAMES"""
+        with self.question_history.lock:
+            self.couple_state.ensure(couple)
+            lengths = self.couple_state.columns['game_lengths'][couple]
+            recent = self.question_history.get(couple)
+            self.question_history.replace(couple, np.concatenate([recent[int(lengths[0]):], question_ints]))
+            lengths[:-1] = lengths[1:].copy()
+            lengths[-1] = len(question_ints)
+    
+    @timed('AdaptiveLearningEngine.get_learning_insights')
     def get_learning_insights(self, user_id: str) -> Dict[str, Any]:
         """Generate learning insights for user"""
-        if user_id not in self.user_profiles:
+        index = self.registry.get('user', user_id)
+        if not self.has_profile(index):
             return {'message': 'Not enough data for insights'}
         
-        profile = self.user_profiles[user_id]
+        categories = self.preferred_categories(index)
+        columns = self.user_state.columns
+        games = int(columns['games_played'][index])
+        avg_score = float(columns['score_sum'][index]) / max(games, 1)
         
         # Performance trends
-        recent_engagement = profile['engagement_scores'][-5:] if profile['engagement_scores'] else [0.5]
-        avg_engagement = np.mean(recent_engagement)
+        avg_engagement = float(self._recent_engagement(np.array([index]))[0])
         
         # Preferred categories
         top_categories = sorted(
-            profile['preferred_categories'].items(), 
+            categories.items(), 
             key=lambda x: x[1], 
             reverse=True
         )[:3]
         
         # Difficulty analysis
         difficulty_analysis = {}
-        for difficulty, scores in profile['difficulty_performance'].items():
-            if scores:
+        for code, difficulty in enumerate(DIFFICULTIES):
+            played = int(columns['difficulty_count'][index, code])
+            if played:
                 difficulty_analysis[difficulty] = {
-                    'avg_score': np.mean(scores),
-                    'games_played': len(scores)
+                    'avg_score': float(columns['difficulty_sum'][index, code]) / played,
+                    'games_played': played
                 }
         
         return {
-            'games_played': profile['games_played'],
-            'avg_score': round(profile['avg_score'], 2),
+            'games_played': games,
+            'avg_score': round(avg_score, 2),
             'engagement_level': 'high' if avg_engagement > 0.7 else 'medium' if avg_engagement > 0.4 else 'low',
             'preferred_categories': [cat[0] for cat in top_categories],
             'optimal_difficulty': self.get_optimal_difficulty(user_id),
             'difficulty_performance': difficulty_analysis,
-            'improvement_suggestions': self._generate_suggestions(profile)
+            'improvement_suggestions': self._generate_suggestions({
+                'avg_score': avg_score,
+                'preferred_categories': categories,
+                'engagement_scores': self._engagement_history(index)
+            })
+        }
+    
+    @timed('AdaptiveLearningEngine.insights_from_aggregates')
+    def insights_from_aggregates(self, aggregates: Dict[str, Any]) -> Dict[str, Any]:
+        """Same insights as get_learning_insights, built from aggregates (aggregates.insight_inputs or performance.learning_aggregates)"""
+        if not aggregates.get('games_played'):
+            return {'message': 'Not enough data for insights'}
+        
+        difficulty_analysis = aggregates['difficulty_performance']
+        categories = aggregates['category_counts']
+        recent_engagement = aggregates.get('recent_engagement') or []
+        if aggregates.get('engagement_ema') is not None:
+            # Materialized aggregates keep a moving average instead of the raw recent scores
+            recent_engagement = [aggregates['engagement_ema']]
+        avg_engagement = np.mean(recent_engagement[-5:]) if recent_engagement else 0.5
+        top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]
+        
+        return {
+            'games_played': aggregates['games_played'],
+            'avg_score': round(aggregates['avg_score'], 2),
+            'engagement_level': 'high' if avg_engagement > 0.7 else 'medium' if avg_engagement > 0.4 else 'low',
+            'preferred_categories': [cat[0] for cat in top_categories],
+            'optimal_difficulty': self._pick_difficulty(
+                {difficulty: stats['avg_score'] for difficulty, stats in difficulty_analysis.items()}
+            ),
+            'difficulty_performance': difficulty_analysis,
+            'improvement_suggestions': self._generate_suggestions({
+                'avg_score': aggregates['avg_score'],
+                'preferred_categories': categories,
+                'engagement_scores': recent_engagement
+            })
         }
     
     def _generate_suggestions(self, profile: Dict) -> List[str]:
@@ -230,22 +463,84 @@ class AdaptiveLearningEngine:
         
         return suggestions
     
-    def update_conversation_context(self, couple_key: str, conversation_data: Dict):
-        """Update conversation context for better question generation"""
-        if not hasattr(self, 'conversation_contexts'):
-            self.conversation_contexts = {}
-        
-        if couple_key not in self.conversation_contexts:
-            self.conversation_contexts[couple_key] = []
-        
-        self.conversation_contexts[couple_key].append(conversation_data)
-        
-        # Keep only last 10 conversation contexts
-        contexts = self.conversation_contexts[couple_key]
-        if len(contexts) > 10:
-            self.conversation_contexts[couple_key] = contexts[-10:]
+    def share_state(self, user_capacity: int, question_capacity: int, couple_capacity: int, set_capacity: int):
+        """Put all learned per-user, per-question and per-couple state in shared memory before forking workers
+
+        Ids (and category/topic names) must then be interned through a shared IdRegistry so every
+        worker maps them to the same rows. Answered questions and recent game history share one
+        pool of set_capacity slots each.
+        """
+        self.user_state.share(user_capacity)
+        self.question_state.share(question_capacity)
+        self.couple_state.share(couple_capacity)
+        self.answered.share(user_capacity, set_capacity)
+        self.question_history.share(couple_capacity, set_capacity)
+        self.bandit.posteriors.share(question_capacity)
+
+    def release_shared_state(self):
+        self.user_state.release()
+        self.question_state.release()
+        self.couple_state.release()
+        self.answered.release()
+        self.question_history.release()
+        self.bandit.posteriors.release()
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Arrays and metadata for snapshots.SnapshotStore (the trained model is not kept; retrain after restoring)"""
+        arrays = {f"user.{name}": column for name, column in self.user_state.export().items()}
+        arrays.update({f"question.{name}": column for name, column in self.question_state.export().items()})
+        arrays.update({f"couple.{name}": column for name, column in self.couple_state.export().items()})
+        # Ragged per-user and per-couple int sets are stored concatenated with offsets
+        arrays.update({f"answered.{name}": array for name, array in self.answered.export().items()})
+        arrays.update({f"history.{name}": array for name, array in self.question_history.export().items()})
+        bandit_arrays, bandit_meta = self.bandit.export_state()
+        arrays.update({f"bandit.{name}": column for name, column in bandit_arrays.items()})
+        # Serialized here, so dicts mutated after this call cannot race the snapshot writer
+        return arrays, json.loads(json.dumps({'bandit': bandit_meta}))
+
+    def restore_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """Replace all learned state with a snapshot's; nothing changes if any part of it does not fit"""
+        def prefixed(prefix: str) -> Dict[str, np.ndarray]:
+            return {key[len(prefix):]: array for key, array in arrays.items() if key.startswith(prefix)}
+
+        user_state = EntityArrays(self.user_state.fields)
+        user_state.restore(prefixed('user.'))
+        question_state = EntityArrays(self.question_state.fields)
+        question_state.restore(prefixed('question.'))
+        couple_state = EntityArrays(self.couple_state.fields)
+        couple_state.restore(prefixed('couple.'))
+        answered = EntitySets()
+        answered.restore(prefixed('answered.'))
+        question_history = EntitySets()
+        question_history.restore(prefixed('history.'))
+        bandit = ThompsonSelector(SEGMENTS)
+        bandit.restore_state(prefixed('bandit.'), meta['bandit'])
+
+        self.user_state, self.question_state, self.couple_state = user_state, question_state, couple_state
+        self.answered, self.question_history, self.bandit = answered, question_history, bandit
+        # The model is refit from the restored profiles (train_models) rather than stored
+        self.is_trained = False
+
+    def update_conversation_context(self, couple: int, conversation_data: Dict):
+        """Record a couple's latest conversation: its sentiment, and topic hits for each participant's profile"""
+        self.couple_state.ensure(couple)
+        self.couple_state.columns['sentiment'][couple] = SENTIMENT_CODES.get(conversation_data.get('sentiment'), 0)
         
-        # Update user profiles based on conversation topics
+        # Update user profiles based on conversation topics (a list, or {topic: hits} from TopicTagger.observe)
         topics = conversation_data.get('topics', [])
-        # TODO: Implement topic-based preference updates
-        return len(topics)  # Return number of topics processed
\ No newline at end of file
+        topic_hits = topics if isinstance(topics, dict) else {topic: 1 for topic in topics}
+        for user_id in conversation_data.get('participants', []):
+            index = self.registry.get('user', user_id)
+            if not self.has_profile(index):
+                continue
+            for topic, hits in topic_hits.items():
+                code = self.registry.intern('topic', topic)
+                if code < MAX_PROFILE_TOPICS:
+                    self.user_state.columns['topic_interest'][index, code] += int(hits)
+        return len(topic_hits)  # Return number of topics processed
+
+    def couple_sentiment(self, couple: int) -> str:
+        """Sentiment of the couple's latest analyzed conversation ('neutral' before the first)"""
+        if couple >= self.couple_state.size:
+            return SENTIMENTS[0]
+        return SENTIMENTS[int(self.couple_state.columns['sentiment'][couple])]
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+class RouteClass:
+    """In-flight work and service time for a group of routes with similar cost"""
+
+    def __init__(self, name: str, slots: int, service_time: float):
+        self.name = name
+        # Requests of this class that run in parallel before the rest start queueing
+        self.slots = max(1, slots)
+        # Moving average of how long one request takes when it does not queue
+        self.service_time = service_time
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.degraded = 0
+
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.slots)
+
+    def estimated_wait(self) -> float:
+        """Seconds a request arriving now would wait for a free slot"""
+        if self.in_flight < self.slots:
+            return 0.0
+        return (self.in_flight - self.slots + 1) * self.service_time / self.slots
+
+    def observe(self, seconds: float, smoothing: float = 0.2):
+        self.service_time += smoothing * (seconds - self.service_time)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'slots': self.slots,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth(),
+            'max_in_flight': self.max_in_flight,
+            'service_time_ms': round(self.service_time * 1000, 3),
+            'estimated_wait_ms': round(self.estimated_wait() * 1000, 3),
+            'admitted': self.admitted,
+            'shed': self.shed,
+            'degraded': self.degraded
+        }
+
+class AdmissionController:
+    """Rejects work early instead of letting it queue past the point where callers give up
+
+    Routes are registered into a class (e.g. cheap template routes vs heavy model routes). When a
+    request arrives and the wait estimated from the class's in-flight count and service time
+    exceeds the budget, it is shed: routes with a fallback get their cheap degraded response,
+    others get 503 with Retry-After. Unregistered routes (/health, /metrics, stats) are never shed.
+    """
+
+    def __init__(self, wait_budget_ms: Optional[float] = None, enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.environ.get('ADMISSION_CONTROL_ENABLED', '1') != '0'
+        self.wait_budget = (wait_budget_ms if wait_budget_ms is not None
+                            else float(os.environ.get('ADMISSION_WAIT_BUDGET_MS', 1000))) / 1000
+        self.classes: Dict[str, RouteClass] = {}
+        # path -> (class name, fallback payload builder or None)
+        self.routes: Dict[str, Tuple[str, Optional[Callable[[], Any]]]] = {}
+
+    def add_class(self, name: str, slots: int, service_time_ms: float):
+        self.classes[name] = RouteClass(name, slots, service_time_ms / 1000)
+
+    def route(self, path: str, route_class: str, fallback: Optional[Callable[[], Any]] = None):
+        """Put a route under admission control; fallback() builds the degraded response body"""
+        if route_class not in self.classes:
+            raise ValueError(f"Unknown route class '{route_class}'")
+        self.routes[path] = (route_class, fallback)
+
+    def admit(self, route_class: RouteClass) -> bool:
+        if self.enabled and route_class.estimated_wait() > self.wait_budget:
+            return False
+        route_class.admitted += 1
+        route_class.in_flight += 1
+        route_class.max_in_flight = max(route_class.max_in_flight, route_class.in_flight)
+        return True
+
+    def release(self, route_class: RouteClass, queued: bool, started: float):
+        """End an admitted request; only requests that found a free slot measure service time"""
+        route_class.in_flight -= 1
+        if not queued:
+            route_class.observe(time.perf_counter() - started)
+
+    def reject(self, route_class: RouteClass, fallback: Optional[Callable[[], Any]]) -> Tuple[int, Any]:
+        """(status, body) for a request that was not admitted: the fallback payload, or 503"""
+        if fallback is not None:
+            route_class.degraded += 1
+            return 200, fallback()
+        route_class.shed += 1
+        return 503, {'detail': 'Service overloaded, retry later'}
+
+    def metric_families(self):
+        """Admission gauges and shed counters for the /metrics endpoint"""
+        families = [
+            ('ml_admission_in_flight', 'gauge', 'Admitted requests not yet finished', 'in_flight'),
+            ('ml_admission_queue_depth', 'gauge', 'Admitted requests waiting for a slot', 'queue_depth'),
+            ('ml_admission_admitted_total', 'counter', 'Requests admitted', 'admitted'),
+            ('ml_admission_shed_total', 'counter', 'Requests rejected with 503', 'shed'),
+            ('ml_admission_degraded_total', 'counter', 'Requests answered with the fallback response', 'degraded')
+        ]
+        for name, metric_type, help_text, attribute in families:
+            samples = []
+            for route_class in self.classes.values():
+                value = route_class.queue_depth() if attribute == 'queue_depth' else getattr(route_class, attribute)
+                samples.append(({'class': route_class.name}, value))
+            yield name, metric_type, help_text, samples
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'wait_budget_ms': round(self.wait_budget * 1000, 3),
+            'classes': {name: route_class.snapshot() for name, route_class in self.classes.items()},
+            'routes': {path: route_class for path, (route_class, _) in self.routes.items()}
+        }
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to the routes registered with it"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        registration = self.controller.routes.get(scope['path']) if scope['type'] == 'http' else None
+        if registration is None:
+            await self.app(scope, receive, send)
+            return
+
+        class_name, fallback = registration
+        route_class = self.controller.classes[class_name]
+        if not self.controller.admit(route_class):
+            await self._shed(route_class, fallback, send)
+            return
+
+        # Queued requests include the wait, so they do not update the service time
+        queued = route_class.in_flight > route_class.slots
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class, queued, started)
+
+    async def _shed(self, route_class: RouteClass, fallback: Optional[Callable[[], Any]], send):
+        status, payload = self.controller.reject(route_class, fallback)
+        if status == 200:
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            headers = [(b'x-degraded', b'load-shed')]
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            retry_after = max(1, math.ceil(route_class.estimated_wait()))
+            headers = [(b'retry-after', str(retry_after).encode())]
+        headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import UserAggregate, db, insert_performance, performance_source, run_write
+
+# Weight of the newest game in the engagement moving average
+ENGAGEMENT_EMA_ALPHA = float(os.environ.get('USER_AGGREGATE_EMA_ALPHA', 0.3))
+
+AGGREGATE_FIELDS = ('games_played', 'score_sum', 'difficulty_stats', 'category_counts', 'engagement_ema', 'last_active')
+# Fields of a submitted game that come straight from the untyped request body
+NUMERIC_FIELDS = ('score', 'engagement_score', 'completion_time')
+TEXT_FIELDS = ('game_type', 'difficulty', 'category')
+
+def empty_aggregate() -> Dict[str, Any]:
+    return {
+        'games_played': 0,
+        'score_sum': 0.0,
+        'difficulty_stats': {},
+        'category_counts': {},
+        'engagement_ema': None,
+        'last_active': None
+    }
+
+def fold(aggregate: Dict[str, Any], row: Dict[str, Any], alpha: float = ENGAGEMENT_EMA_ALPHA) -> Dict[str, Any]:
+    """Apply one UserPerformance row to a running aggregate; the JSON fields are copied, not mutated"""
+    score = float(row.get('score') or 0.0)
+    aggregate['games_played'] += 1
+    aggregate['score_sum'] += score
+
+    difficulty = row.get('difficulty')
+    if difficulty:
+        stats = dict(aggregate['difficulty_stats'])
+        previous = stats.get(difficulty, {'score_sum': 0.0, 'games_played': 0})
+        stats[difficulty] = {'score_sum': previous['score_sum'] + score, 'games_played': previous['games_played'] + 1}
+        aggregate['difficulty_stats'] = stats
+
+    category = row.get('category')
+    if category:
+        counts = dict(aggregate['category_counts'])
+        counts[category] = counts.get(category, 0) + 1
+        aggregate['category_counts'] = counts
+
+    engagement = row.get('engagement_score')
+    if engagement is not None:
+        previous_ema = aggregate['engagement_ema']
+        aggregate['engagement_ema'] = (float(engagement) if previous_ema is None
+                                       else alpha * float(engagement) + (1 - alpha) * previous_ema)
+
+    created_at = row.get('created_at')
+    if created_at is not None and (aggregate['last_active'] is None or created_at > aggregate['last_active']):
+        aggregate['last_active'] = created_at
+    return aggregate
+
+def insight_inputs(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape an aggregate row the way AdaptiveLearningEngine.insights_from_aggregates expects"""
+    games_played = aggregate['games_played']
+    return {
+        'games_played': games_played,
+        'avg_score': aggregate['score_sum'] / games_played if games_played else 0.0,
+        'difficulty_performance': {
+            difficulty: {'avg_score': stats['score_sum'] / stats['games_played'], 'games_played': stats['games_played']}
+            for difficulty, stats in aggregate['difficulty_stats'].items() if stats['games_played']
+        },
+        'category_counts': dict(aggregate['category_counts']),
+        'engagement_ema': aggregate['engagement_ema'],
+        'recent_engagement': [],
+        'last_active': aggregate['last_active']
+    }
+
+def _as_dict(record: UserAggregate) -> Dict[str, Any]:
+    return {field: getattr(record, field) for field in AGGREGATE_FIELDS}
+
+async def _ensure_rows(session: AsyncSession, user_ids: Set[str]):
+    """Insert empty aggregate rows for new users, tolerating concurrent writers"""
+    dialect = session.bind.dialect.name
+    rows = [{'user_id': user_id, **empty_aggregate()} for user_id in user_ids]
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        existing = set((await session.execute(
+            select(UserAggregate.user_id).where(UserAggregate.user_id.in_(user_ids))
+        )).scalars())
+        missing = [row for row in rows if row['user_id'] not in existing]
+        if missing:
+            await session.execute(insert(UserAggregate), missing)
+        return
+    await session.execute(dialect_insert(UserAggregate).on_conflict_do_nothing(index_elements=['user_id']), rows)
+
+async def apply_to_aggregates(session: AsyncSession, rows: List[Dict[str, Any]]):
+    """Fold new performance rows into user_aggregates inside the caller's transaction
+
+    Rows are created first (insert-or-ignore) and then locked, so concurrent ingestors
+    serialize per user instead of overwriting each other.
+    """
+    if not rows:
+        return
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_user.setdefault(row['user_id'], []).append(row)
+
+    await _ensure_rows(session, set(by_user))
+    records = (await session.execute(
+        select(UserAggregate).where(UserAggregate.user_id.in_(by_user)).with_for_update()
+    )).scalars().all()
+
+    now = datetime.utcnow()
+    for record in records:
+        aggregate = _as_dict(record)
+        for row in sorted(by_user[record.user_id], key=lambda r: r['created_at']):
+            fold(aggregate, row)
+        for field, value in aggregate.items():
+            setattr(record, field, value)
+        record.updated_at = now
+
+async def _ingest(session: AsyncSession, rows: List[Dict[str, Any]]):
+    rows = await insert_performance(session, rows)
+    await apply_to_aggregates(session, rows)
+
+async def ingest_performance(rows: List[Dict[str, Any]], session: Optional[AsyncSession] = None) -> int:
+    """Store UserPerformance rows and update user_aggregates in the same transaction"""
+    return await run_write(_ingest, rows, session)
+
+async def load_aggregate(session: AsyncSession, user_id: str) -> Optional[Dict[str, Any]]:
+    """One user's aggregate row, or None if they have no recorded games"""
+    record = await session.get(UserAggregate, user_id)
+    return _as_dict(record) if record is not None else None
+
+async def rebuild_aggregates(session: AsyncSession, user_ids: Optional[Iterable[str]] = None,
+                             batch_size: int = 1000) -> int:
+    """Recompute user_aggregates from UserPerformance (all users, or just user_ids); returns rows written"""
+    source = await performance_source(session)
+    query = select(
+        source.c.user_id, source.c.score, source.c.difficulty, source.c.category,
+        source.c.engagement_score, source.c.created_at
+    ).order_by(source.c.user_id, source.c.created_at)
+    clear = delete(UserAggregate)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        query = query.where(source.c.user_id.in_(user_ids))
+        clear = clear.where(UserAggregate.user_id.in_(user_ids))
+
+    aggregates: Dict[str, Dict[str, Any]] = {}
+    result = await session.stream(query)
+    async for row in result.mappings():
+        aggregate = aggregates.get(row['user_id'])
+        if aggregate is None:
+            aggregate = aggregates[row['user_id']] = empty_aggregate()
+        fold(aggregate, row)
+
+    await session.execute(clear)
+    now = datetime.utcnow()
+    rows = [{'user_id': user_id, **aggregate, 'updated_at': now} for user_id, aggregate in aggregates.items()]
+    for start in range(0, len(rows), batch_size):
+        await session.execute(insert(UserAggregate), rows[start:start + batch_size])
+    await session.commit()
+    return len(rows)
+
+class PerformanceIngestor:
+    """Write-behind buffer: game results are queued by request handlers and persisted in batches"""
+
+    def __init__(self, flush_ms: Optional[float] = None, max_rows: Optional[int] = None):
+        self.flush_ms = flush_ms if flush_ms is not None else float(os.environ.get('PERFORMANCE_FLUSH_MS', 250))
+        self.max_rows = max_rows if max_rows is not None else int(os.environ.get('PERFORMANCE_FLUSH_ROWS', 500))
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # One batch at a time, so batches don't contend for the same aggregate rows
+        self._write_lock: Optional[asyncio.Lock] = None
+
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.rejected_fields = 0
+        self.retried_batches = 0
+
+    def add(self, row: Dict[str, Any]):
+        """Queue one UserPerformance row (created_at defaults to now); fields of the wrong type are nulled"""
+        row = self.clean(row)
+        row.setdefault('created_at', datetime.utcnow())
+        self._pending.append(row)
+        self.queued += 1
+
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_ms / 1000.0, self._flush)
+
+    def clean(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce the request's values to the column types, so one bad field cannot fail a whole batch"""
+        row = dict(row)
+        row['user_id'] = str(row['user_id'])
+        for field in NUMERIC_FIELDS:
+            value = row.get(field)
+            if value is None:
+                continue
+            try:
+                number = float(value) if not isinstance(value, bool) else math.nan
+            except (TypeError, ValueError):
+                number = math.nan
+            if math.isfinite(number):
+                row[field] = number
+            else:
+                row[field] = None
+                self.rejected_fields += 1
+        for field in TEXT_FIELDS:
+            value = row.get(field)
+            if value is not None and not isinstance(value, str):
+                row[field] = None
+                self.rejected_fields += 1
+        return row
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        rows, self._pending = self._pending, []
+        if rows:
+            task = asyncio.get_running_loop().create_task(self._write(rows))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            try:
+                await ingest_performance(rows)
+                self.written += len(rows)
+                self.batches += 1
+                return
+            except Exception as e:
+                print(f"Error persisting a batch of {len(rows)} game results, retrying row by row: {e}")
+            # Each row in its own transaction, so a row the database rejects only loses itself
+            self.retried_batches += 1
+            for row in rows:
+                try:
+                    await ingest_performance([row])
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Error persisting game result for {row.get('user_id')}: {e}")
+
+    async def drain(self):
+        """Write everything still queued; called on shutdown"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queued,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'retried_batches': self.retried_batches,
+            'rejected_fields': self.rejected_fields,
+            'pending': len(self._pending)
+        }
+
+async def _rebuild(user_ids: Optional[List[str]]) -> int:
+    await db.init()
+    try:
+        async with db.session_factory() as session:
+            return await rebuild_aggregates(session, user_ids)
+    finally:
+        await db.dispose()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute user_aggregates from user_performance')
+    parser.add_argument('--user', action='append', dest='users', help='Only rebuild this user (repeatable)')
+    args = parser.parse_args()
+    print(f"Rebuilt {asyncio.run(_rebuild(args.users))} user aggregates")
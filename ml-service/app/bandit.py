@@ -0,0 +1,95 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from .entity_state import EntityArrays
+
+class ThompsonSelector:
+    """Online question selection by Thompson sampling over per-(segment, question) Beta posteriors
+
+    Engagement in [0, 1] is treated as a fractional Bernoulli reward (alpha += r, beta += 1 - r),
+    so an event is a constant number of array writes no matter how many questions or users
+    there are. Selection draws one sample per candidate from its posterior in a single
+    vectorized rng.beta call and keeps the top k. Posteriors are EntityArrays rows indexed by
+    interned question int, one column per segment; questions never updated sit at the prior.
+    """
+
+    def __init__(self, segments: int, prior_alpha: float = 1.0, prior_beta: float = 1.0, seed: Optional[int] = None):
+        self.segments = segments
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.posteriors = EntityArrays({
+            'alpha': (np.float64, (segments,), prior_alpha),
+            'beta': (np.float64, (segments,), prior_beta)
+        })
+        self.rng = np.random.default_rng(seed)
+        # Guards array growth and the generator, neither of which is safe to share across threads
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.selections = 0
+
+    def sample(self, segment: int, question_ints: np.ndarray) -> np.ndarray:
+        """One posterior draw per question (questions without an int draw from the prior)"""
+        question_ints = np.asarray(question_ints, dtype=np.int64)
+        known = question_ints >= 0
+        with self._lock:
+            if known.any():
+                self.posteriors.ensure(int(question_ints.max()))
+            rows = np.where(known, question_ints, 0)
+            alpha = np.where(known, self.posteriors.columns['alpha'][rows, segment], self.prior_alpha)
+            beta = np.where(known, self.posteriors.columns['beta'][rows, segment], self.prior_beta)
+            return self.rng.beta(alpha, beta)
+
+    def select(self, segment: int, question_ints: np.ndarray, count: int) -> np.ndarray:
+        """Positions of the `count` candidates with the highest posterior draws, best first"""
+        draws = self.sample(segment, question_ints)
+        self.selections += 1
+        count = min(count, draws.size)
+        if count <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-draws, count - 1)[:count]
+        return top[np.argsort(-draws[top])]
+
+    def update(self, segment: int, question_ints: np.ndarray, reward: float):
+        """Fold one engagement event into the posteriors of the questions it covered"""
+        question_ints = np.asarray(question_ints, dtype=np.int64)
+        question_ints = question_ints[question_ints >= 0]
+        if not question_ints.size:
+            return
+        reward = min(max(float(reward), 0.0), 1.0)
+        with self._lock:
+            self.posteriors.ensure(int(question_ints.max()))
+            np.add.at(self.posteriors.columns['alpha'], (question_ints, segment), reward)
+            np.add.at(self.posteriors.columns['beta'], (question_ints, segment), 1.0 - reward)
+            self.updates += 1
+
+    def mean(self, segment: int, question_ints: np.ndarray) -> np.ndarray:
+        """Posterior mean engagement per question"""
+        question_ints = np.asarray(question_ints, dtype=np.int64)
+        inside = (question_ints >= 0) & (question_ints < self.posteriors.size)
+        alpha = np.full(question_ints.size, self.prior_alpha, dtype=np.float64)
+        beta = np.full(question_ints.size, self.prior_beta, dtype=np.float64)
+        alpha[inside] = self.posteriors.columns['alpha'][question_ints[inside], segment]
+        beta[inside] = self.posteriors.columns['beta'][question_ints[inside], segment]
+        return alpha / (alpha + beta)
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        with self._lock:
+            arrays = self.posteriors.export()
+        return arrays, {'segments': self.segments, 'updates': self.updates, 'selections': self.selections}
+
+    def restore_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        if meta['segments'] != self.segments:
+            raise ValueError(f"Snapshot has {meta['segments']} segments, selector has {self.segments}")
+        with self._lock:
+            self.posteriors.restore(arrays)
+            self.updates = meta['updates']
+            self.selections = meta['selections']
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'segments': self.segments,
+            'questions': self.posteriors.size,
+            'updates': self.updates,
+            'selections': self.selections,
+            'bytes': self.posteriors.nbytes
+        }
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError
+from .admission import AdmissionController
+
+class RawJSON(bytes):
+    """A sub-operation result that is already serialized JSON (e.g. a cached response body), spliced in as is"""
+
+class BatchOperation(BaseModel):
+    name: str = Field(description="Key the result is returned under; unique within the batch")
+    op: str = Field(description="Operation, named like its route without the leading slash, e.g. 'analyze-compatibility'")
+    params: Dict[str, Any] = Field(default={}, description="The body the operation's own route takes")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+class BatchDispatcher:
+    """Runs the named sub-operations of one /batch request concurrently
+
+    Each op is registered with the request model and coroutine behind its route, so a
+    sub-operation goes through the same response cache, coalescing, executor pools and
+    fallbacks as a request to that route. With an AdmissionController, each sub-operation is
+    admitted into its route's class like a request to that route. A shed one gets the route's
+    fallback payload (marked "degraded") or a 503 entry. Every operation's params are validated
+    before any of them runs. Errors stay with their operation: an unknown op, invalid params or a
+    handler that raises gives that entry a status and an error, and the rest of the batch still
+    succeeds.
+    """
+
+    def __init__(self, max_operations: Optional[int] = None, admission: Optional[AdmissionController] = None):
+        self.max_operations = max_operations if max_operations is not None \
+            else int(os.environ.get('BATCH_MAX_OPERATIONS', 16))
+        self.admission = admission
+        self.operations: Dict[str, Tuple[Type[BaseModel], Callable[[Any], Awaitable[Any]]]] = {}
+        self.batches = 0
+        # Per op: sub-operations run and those that ended in an error entry
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def register(self, op: str, model: Type[BaseModel], handler: Callable[[Any], Awaitable[Any]]):
+        self.operations[op] = (model, handler)
+
+    def validate(self, request: BatchRequest) -> List[Tuple[str, str, Any]]:
+        """(name, op, parsed params or an error entry) per operation; 422 for the batch as a whole"""
+        if len(request.operations) > self.max_operations:
+            raise HTTPException(status_code=422, detail=f"At most {self.max_operations} operations per batch")
+        names = [operation.name for operation in request.operations]
+        if len(set(names)) != len(names):
+            raise HTTPException(status_code=422, detail="Operation names must be unique within a batch")
+
+        parsed = []
+        for operation in request.operations:
+            registration = self.operations.get(operation.op)
+            if registration is None:
+                parsed.append((operation.name, operation.op, {'status': 404, 'error': f"Unknown operation '{operation.op}'"}))
+                continue
+            try:
+                parsed.append((operation.name, operation.op, registration[0].model_validate(operation.params)))
+            except ValidationError as e:
+                parsed.append((operation.name, operation.op, {'status': 422, 'error': e.errors(include_url=False)}))
+        return parsed
+
+    async def run(self, request: BatchRequest) -> bytes:
+        """The batch response body: {"results": {name: {"status", "result" | "error"}}}"""
+        parsed = self.validate(request)
+        self.batches += 1
+        outcomes = await asyncio.gather(*[self._call(op, params) for _, op, params in parsed])
+
+        parts = []
+        for (name, op, _), outcome in zip(parsed, outcomes):
+            # Op names come from the client; only registered ones become metric labels
+            op = op if op in self.operations else 'unknown'
+            self.calls[op] += 1
+            if isinstance(outcome, RawJSON):
+                entry = b'{"status":200,"result":' + outcome + b'}'
+            else:
+                if outcome['status'] != 200:
+                    self.errors[op] += 1
+                entry = self.serialize(outcome)
+            parts.append(self.serialize(name) + b':' + entry)
+        return b'{"results":{' + b','.join(parts) + b'}}'
+
+    async def _call(self, op: str, params: Any) -> Any:
+        if isinstance(params, dict):
+            return params
+        registration = self.admission.routes.get(f"/{op}") if self.admission is not None else None
+        if registration is None:
+            return await self._handle(op, params)
+
+        class_name, fallback = registration
+        route_class = self.admission.classes[class_name]
+        if not self.admission.admit(route_class):
+            status, payload = self.admission.reject(route_class, fallback)
+            if status == 200:
+                return {'status': 200, 'result': payload, 'degraded': 'load-shed'}
+            return {'status': status, 'error': payload['detail']}
+        queued = route_class.in_flight > route_class.slots
+        started = time.perf_counter()
+        try:
+            return await self._handle(op, params)
+        finally:
+            self.admission.release(route_class, queued, started)
+
+    async def _handle(self, op: str, params: Any) -> Any:
+        try:
+            result = await self.operations[op][1](params)
+        except HTTPException as e:
+            return {'status': e.status_code, 'error': e.detail}
+        except Exception as e:
+            return {'status': 500, 'error': str(e)}
+        if isinstance(result, RawJSON):
+            return result
+        return {'status': 200, 'result': result}
+
+    @staticmethod
+    def serialize(payload: Any) -> bytes:
+        # Same encoding the routes' own responses get
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                          separators=(',', ':')).encode('utf-8')
+
+    def metric_families(self):
+        """Batch counters for the /metrics endpoint"""
+        yield 'ml_batch_requests_total', 'counter', 'Requests to /batch', [({}, self.batches)]
+        yield 'ml_batch_operations_total', 'counter', 'Sub-operations run from /batch', \
+            [({'op': op}, count) for op, count in self.calls.items()]
+        yield 'ml_batch_operation_errors_total', 'counter', 'Sub-operations that returned an error entry', \
+            [({'op': op}, count) for op, count in self.errors.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'max_operations': self.max_operations,
+            'operations': sorted(self.operations),
+            'calls': dict(self.calls),
+            'errors': dict(self.errors)
+        }
@@ -2,6 +2,7 @@ import numpy as np
 from typing import Dict, List, Any
 from sklearn.metrics.pairwise import cosine_similarity
 from .models import CompatibilityResponse, RelationshipInsightResponse
+from .metrics import timed
 
 class CompatibilityAnalyzer:
     def __init__(self):
@@ -14,6 +15,7 @@ class CompatibilityAnalyzer:
             'personality': 0.10
         }
     
+    @timed('CompatibilityAnalyzer.analyze')
     def analyze(self, user1_answers: Dict[str, Any], user2_answers: Dict[str, Any]) -> CompatibilityResponse:
         # Calculate category scores
         category_scores = {}
@@ -124,6 +126,7 @@ class CompatibilityAnalyzer:
         
         return recommendations
     
+    @timed('CompatibilityAnalyzer.generate_insights')
     def generate_insights(self, interaction_history: List[Dict[str, Any]]) -> RelationshipInsightResponse:
         # Analyze interaction patterns
         total_interactions = len(interaction_history)
@@ -0,0 +1,484 @@
+"""Each couple's daily question, tip and game recommendations, planned ahead in a nightly batch
+
+    python -m app.daily_picks --day 2026-10-20
+
+get_daily_question / get_daily_tip drew at random on every call, so a couple's "daily" question
+changed on each reload. Here every pick is a hash of (couple, day) into a bucket chosen from the
+couple's profile (favourite category, easier of the two optimal difficulties, games played), so
+the same couple gets the same picks all day and new ones the next. The job plans every couple
+in the id registry in chunks: profile features are gathered in this process, each chunk's
+picks are computed with a handful of array operations on a process pool, and the rows are
+upserted into daily_picks one chunk per transaction. Couples that already have a row for the
+day are skipped, so an interrupted run resumes where it stopped. A run holds a lock that every
+process sharing the database sees (see run_lock), so uvicorn workers, replicas and cron never
+plan the same day side by side. Request handlers read the
+table (through an LRU) and only plan a single couple on demand when it has no row yet. With a
+MemcachedPublisher configured, each stored chunk is also written to the backend's memcached, so
+the backend can read a couple's picks without calling this service.
+"""
+import argparse
+import asyncio
+import os
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .adaptive_learning import DIFFICULTIES, DIFFICULTY_CODES, AdaptiveLearningEngine
+from .database import DailyPick, db
+from .memcached import MemcachedPublisher
+from .metrics import metrics
+from .question_recommender import QuestionRecommender
+from .recommendation import RecommendationEngine
+
+# Question bank category -> the activity category its tips are drawn from (others draw from all tips)
+TIP_FOCUS = {'communication': 'communication', 'intimacy': 'intimacy', 'fun': 'lifestyle', 'deep': 'values'}
+# Below this many games between them a couple gets recommend_games' new-relationship games
+NEW_RELATIONSHIP_GAMES = 10
+QUESTION_SALT = 0x5851F42D4C957F2D
+TIP_SALT = 0x14057B7EF767814F
+# Postgres advisory lock held for the length of a run
+RUN_LOCK_KEY = 0x0EC40DA1
+
+try:
+    import fcntl
+except ImportError:  # Windows: no run lock for SQLite deployments
+    fcntl = None
+
+class RunInProgress(RuntimeError):
+    """Another run holds the daily pick lock, in this process or another"""
+
+def stable_hashes(keys: Sequence[str], day: date, salt: int) -> np.ndarray:
+    """A 64-bit hash of (key, day, salt) per key (crc32 of the key, mixed with splitmix64)"""
+    x = np.fromiter((zlib.crc32(key.encode('utf-8')) for key in keys), dtype=np.uint64, count=len(keys))
+    x ^= np.uint64((day.toordinal() << 32) ^ salt)
+    x += np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _flatten(buckets: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Members, offsets and sizes of a list of index arrays laid end to end"""
+    sizes = np.array([len(bucket) for bucket in buckets], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    members = np.concatenate(buckets).astype(np.int64) if sizes.sum() else np.zeros(0, dtype=np.int64)
+    return members, offsets, sizes
+
+class DailyPlanner:
+    """Question and tip buckets as flat arrays, so a chunk of couples is planned with a few array lookups
+
+    Question buckets are (category, difficulty), then each category, then each difficulty, then
+    the whole bank; a couple takes the most specific non-empty one its profile allows.
+    """
+
+    def __init__(self, question_bank: Dict[str, List[Dict[str, Any]]], activity_database: Dict[str, List[str]],
+                 game_recommendations: Dict[str, List[str]]):
+        self.categories = list(question_bank)
+        self.questions = [question for category in self.categories for question in question_bank[category]]
+        category_codes = np.array([code for code, category in enumerate(self.categories)
+                                   for _ in question_bank[category]], dtype=np.int64)
+        difficulty_codes = np.array([DIFFICULTY_CODES.get(question.get('difficulty'), DIFFICULTY_CODES['medium'])
+                                     for question in self.questions], dtype=np.int64)
+        categories, difficulties = len(self.categories), len(DIFFICULTIES)
+        buckets = [np.flatnonzero((category_codes == category) & (difficulty_codes == difficulty))
+                   for category in range(categories) for difficulty in range(difficulties)]
+        buckets += [np.flatnonzero(category_codes == category) for category in range(categories)]
+        buckets += [np.flatnonzero(difficulty_codes == difficulty) for difficulty in range(difficulties)]
+        buckets.append(np.arange(len(self.questions)))
+        self.question_members, self.question_offsets, self.question_sizes = _flatten(buckets)
+
+        tip_categories = list(activity_database)
+        self.tips = [tip for category in tip_categories for tip in activity_database[category]]
+        tip_codes = np.array([code for code, category in enumerate(tip_categories)
+                              for _ in activity_database[category]], dtype=np.int64)
+        tip_buckets = [np.flatnonzero(tip_codes == code) for code in range(len(tip_categories))]
+        tip_buckets.append(np.arange(len(self.tips)))
+        self.tip_members, self.tip_offsets, self.tip_sizes = _flatten(tip_buckets)
+        everything = len(tip_categories)
+        # Indexed by question category code; the extra last entry serves couples with no favourite (-1)
+        self.tip_bucket_for_category = np.array(
+            [tip_categories.index(TIP_FOCUS[category]) if TIP_FOCUS.get(category) in tip_categories else everything
+             for category in self.categories] + [everything], dtype=np.int64
+        )
+        self.new_games = list(game_recommendations.get('new_relationship', []))[:3]
+        self.growth_games = list(game_recommendations.get('growth_focus', []))[:3]
+
+    @classmethod
+    def from_engines(cls, recommender: QuestionRecommender, tips: RecommendationEngine) -> 'DailyPlanner':
+        return cls(recommender.question_bank, tips.activity_database, tips.game_recommendations)
+
+    def question_positions(self, registry) -> Dict[int, int]:
+        """Registry question int -> position in this planner's bank, for questions already interned"""
+        positions = {}
+        for position, question in enumerate(self.questions):
+            index = registry.ids['question'].get(str(question.get('id')))
+            if index is not None:
+                positions[index] = position
+        return positions
+
+    @staticmethod
+    def _slots(keys: Sequence[str], day: date, salt: int, sizes: np.ndarray) -> np.ndarray:
+        return (stable_hashes(keys, day, salt) % np.maximum(sizes, 1).astype(np.uint64)).astype(np.int64)
+
+    def plan(self, couple_keys: Sequence[str], features: Dict[str, Any], day: date) -> List[Dict[str, Any]]:
+        """Picks for a chunk of couples; features come from couple_features() for the same keys"""
+        category, difficulty = features['category'], features['difficulty']
+        categories, difficulties = len(self.categories), len(DIFFICULTIES)
+        favourite = np.maximum(category, 0)
+        exact = favourite * difficulties + difficulty
+        by_category = categories * difficulties + favourite
+        by_difficulty = categories * difficulties + categories + difficulty
+        whole_bank = categories * difficulties + categories + difficulties
+        bucket = np.where(category >= 0, np.where(self.question_sizes[exact] > 0, exact, by_category), by_difficulty)
+        bucket = np.where(self.question_sizes[bucket] > 0, bucket, whole_bank)
+        sizes = self.question_sizes[bucket]
+        slots = self._slots(couple_keys, day, QUESTION_SALT, sizes)
+        if self.questions:
+            picks = self.question_members[self.question_offsets[bucket] + slots]
+        else:
+            picks = np.full(len(couple_keys), -1, dtype=np.int64)
+
+        # A couple whose pick was answered before steps on through its bucket to the next unanswered one
+        for row, answered in features['answered'].items():
+            answered = set(answered)
+            if picks[row] not in answered:
+                continue
+            start, size = self.question_offsets[bucket[row]], sizes[row]
+            for step in range(1, size):
+                candidate = self.question_members[start + (slots[row] + step) % size]
+                if candidate not in answered:
+                    picks[row] = candidate
+                    break
+
+        tip_bucket = self.tip_bucket_for_category[category]
+        tip_slots = self._slots(couple_keys, day, TIP_SALT, self.tip_sizes[tip_bucket])
+        tip_picks = self.tip_members[self.tip_offsets[tip_bucket] + tip_slots] if self.tips else None
+        new_relationship = features['games_played'] < NEW_RELATIONSHIP_GAMES
+
+        return [{
+            'couple_key': key,
+            'day': day,
+            'question': self.questions[picks[row]] if picks[row] >= 0 else None,
+            'tip': self.tips[tip_picks[row]] if tip_picks is not None else None,
+            'games': self.new_games if new_relationship[row] else self.growth_games
+        } for row, key in enumerate(couple_keys)]
+
+def couple_features(engine: AdaptiveLearningEngine, planner: DailyPlanner, couple_keys: Sequence[str],
+                    question_positions: Dict[int, int]) -> Dict[str, Any]:
+    """Per-couple inputs to DailyPlanner.plan from the adaptive engine's profiles of both partners
+
+    A partner the engine has never seen is left out; couples with neither partner known get the
+    defaults: no favourite category, medium, no games.
+    """
+    count = len(couple_keys)
+    registry, state = engine.registry, engine.user_state
+    members = np.full((count, 2), -1, dtype=np.int64)
+    for row, key in enumerate(couple_keys):
+        pair = registry.couple_members(key)
+        if pair is not None:
+            members[row] = pair
+    valid = (members >= 0) & (members < state.size)
+    safe = np.where(valid, members, 0)
+    known = np.flatnonzero(valid.any(axis=1))
+
+    games = np.where(valid, state.columns['games_played'][safe], 0).sum(axis=1).astype(np.int64)
+    # The easier of the two partners' optimal difficulties, since they answer together
+    optimal = engine._optimal_difficulties(safe.ravel()).reshape(-1, 2)
+    difficulty = np.where(valid, optimal, len(DIFFICULTIES)).min(axis=1)
+    difficulty = np.where(valid.any(axis=1), difficulty, DIFFICULTY_CODES['medium']).astype(np.int64)
+
+    category = np.full(count, -1, dtype=np.int64)
+    answered: Dict[int, List[int]] = {}
+    category_codes = {name: code for code, name in enumerate(planner.categories)}
+    for row, pair in zip(known.tolist(), members[known].tolist()):
+        plays: Dict[str, int] = {}
+        seen: List[int] = []
+        for user in pair:
+            if not engine.has_profile(user):
+                continue
+            for name, played in engine.preferred_categories(user).items():
+                plays[name] = plays.get(name, 0) + played
+            seen.extend(question_positions[index] for index in engine.answered.get(user).tolist()
+                        if index in question_positions)
+        ranked = [name for name in sorted(plays, key=plays.get, reverse=True) if name in category_codes]
+        if ranked:
+            category[row] = category_codes[ranked[0]]
+        if seen:
+            answered[row] = seen
+    return {'category': category, 'difficulty': difficulty, 'games_played': games, 'answered': answered}
+
+# The planner each pool worker received when it started
+_worker_planner: Optional[DailyPlanner] = None
+
+def _init_worker(planner: DailyPlanner):
+    global _worker_planner
+    _worker_planner = planner
+
+def _plan_chunk(couple_keys: Sequence[str], features: Dict[str, Any], day: date) -> List[Dict[str, Any]]:
+    return _worker_planner.plan(couple_keys, features, day)
+
+async def stored_keys(session: AsyncSession, day: date) -> Set[str]:
+    """Couples that already have picks for day"""
+    result = await session.execute(select(DailyPick.couple_key).where(DailyPick.day == day))
+    return set(result.scalars())
+
+async def upsert_daily_picks(session: AsyncSession, rows: List[Dict[str, Any]]):
+    """Insert or replace picks by (couple_key, day) without committing"""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    rows = [dict(row, computed_at=now) for row in rows]
+    dialect = session.bind.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in rows:
+            await session.merge(DailyPick(**row))
+        return
+    statement = dialect_insert(DailyPick)
+    statement = statement.on_conflict_do_update(
+        index_elements=['couple_key', 'day'],
+        set_={column: statement.excluded[column] for column in ('question', 'tip', 'games', 'computed_at')}
+    )
+    await session.execute(statement, rows)
+
+async def load_daily_pick(session: AsyncSession, couple_key: str, day: date) -> Optional[Dict[str, Any]]:
+    record = await session.get(DailyPick, (couple_key, day))
+    if record is None:
+        return None
+    return {'couple_key': record.couple_key, 'day': record.day, 'question': record.question,
+            'tip': record.tip, 'games': record.games}
+
+@asynccontextmanager
+async def run_lock(lock_path: Optional[str]):
+    """Held for a whole run; raises RunInProgress if another process holds it
+
+    On Postgres this is a session advisory lock, so it covers every worker, replica and cron job
+    using the database. SQLite databases are local files, so there it is a flock on lock_path.
+    """
+    await db.init()
+    if db.engine.dialect.name == 'postgresql':
+        async with db.engine.connect() as connection:
+            acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': RUN_LOCK_KEY})).scalar()
+            # Session-level, so it outlives this transaction; don't sit idle in one for the whole run
+            await connection.commit()
+            if not acquired:
+                raise RunInProgress("A daily pick run is already in progress in another process")
+            try:
+                yield
+            finally:
+                # The connection goes back to the pool, which would keep the lock otherwise
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': RUN_LOCK_KEY})
+                await connection.commit()
+        return
+    if fcntl is None or not lock_path:
+        yield
+        return
+    with open(lock_path, 'a') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RunInProgress("A daily pick run is already in progress in another process") from None
+        yield
+
+class DailyPickJob:
+    """Plans one day's picks for every couple in the registry, a chunk at a time"""
+
+    def __init__(self, engine: AdaptiveLearningEngine, recommender: QuestionRecommender, tips: RecommendationEngine,
+                 workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                 publisher: Optional[MemcachedPublisher] = None, lock_path: Optional[str] = None):
+        self.engine = engine
+        self.recommender = recommender
+        self.tips = tips
+        # 0 plans on a thread instead (e.g. under uvicorn --workers, whose daemonic workers cannot fork a pool)
+        self.workers = workers if workers is not None else int(os.environ.get('DAILY_BATCH_WORKERS', os.cpu_count() or 1))
+        self.chunk_size = chunk_size or int(os.environ.get('DAILY_BATCH_CHUNK_SIZE', 5000))
+        self.publisher = publisher
+        # Run lock file when the database is SQLite ('' disables it)
+        self.lock_path = lock_path if lock_path is not None else os.environ.get('DAILY_BATCH_LOCK_PATH', 'echo_ml_daily.lock')
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.running = False
+
+    async def run(self, day: date, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Plan and store picks for day for every couple without them yet (at most `limit` of them)"""
+        if self.running:
+            raise RunInProgress("A daily pick run is already in progress")
+        self.running = True
+        try:
+            async with run_lock(self.lock_path):
+                return await self._run(day, limit)
+        finally:
+            self.running = False
+
+    async def _run(self, day: date, limit: Optional[int]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        await db.init()
+        couples = list(self.engine.registry.keys['couple'])
+        async with db.session_factory() as session:
+            done = await stored_keys(session, day)
+        todo = [key for key in couples if key not in done]
+        if limit is not None:
+            todo = todo[:limit]
+
+        planner = DailyPlanner.from_engines(self.recommender, self.tips)
+        positions = planner.question_positions(self.engine.registry)
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(planner,)) \
+            if self.workers > 0 else None
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        planned = chunks = 0
+        published_before = self.publisher.published if self.publisher else 0
+        try:
+            for start in range(0, len(todo), self.chunk_size):
+                keys = todo[start:start + self.chunk_size]
+                features = await asyncio.to_thread(couple_features, self.engine, planner, keys, positions)
+                if pool is not None:
+                    pending.append(loop.run_in_executor(pool, _plan_chunk, keys, features, day))
+                else:
+                    pending.append(asyncio.ensure_future(asyncio.to_thread(planner.plan, keys, features, day)))
+                chunks += 1
+                # Gather the next chunk's features while the pool plans; keep each worker busy but no more
+                if len(pending) > max(self.workers, 1):
+                    planned += await self._store(await pending.popleft())
+            while pending:
+                planned += await self._store(await pending.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        seconds = time.perf_counter() - started
+        metrics.observe_engine('DailyPickJob.run', seconds)
+        self.last_run = {
+            'day': day.isoformat(),
+            'couples': len(couples),
+            'already_done': len(done),
+            'planned': planned,
+            'remaining': len(couples) - len(done) - planned,
+            'chunks': chunks,
+            'published': (self.publisher.published - published_before) if self.publisher else 0,
+            'workers': self.workers,
+            'seconds': round(seconds, 3),
+            'couples_per_second': round(planned / seconds, 1) if seconds > 0 else 0.0,
+            'finished_at': datetime.utcnow().isoformat()
+        }
+        return self.last_run
+
+    async def _store(self, rows: List[Dict[str, Any]]) -> int:
+        # One transaction per chunk: a crash loses at most the chunks in flight
+        async with db.session_factory() as session:
+            await upsert_daily_picks(session, rows)
+            await session.commit()
+        # The table is the record; a memcached failure is counted by the publisher and does not fail the run
+        if self.publisher is not None:
+            await self.publisher.publish_daily(rows)
+        return len(rows)
+
+class DailyPicks:
+    """Lookups for request handlers: LRU, then the daily_picks table, then planning the one couple"""
+
+    def __init__(self, engine: AdaptiveLearningEngine, recommender: QuestionRecommender, tips: RecommendationEngine,
+                 max_entries: int = 100000, publisher: Optional[MemcachedPublisher] = None):
+        self.job = DailyPickJob(engine, recommender, tips, publisher=publisher)
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, date], Dict[str, Any]]" = OrderedDict()
+        self._planner: Optional[DailyPlanner] = None
+        self._planner_bank: Optional[Tuple] = None
+        self.hits = 0
+        self.stored = 0
+        self.planned = 0
+
+    def planner(self) -> DailyPlanner:
+        """Planner for on-demand picks, rebuilt when the question bank changes"""
+        bank = tuple((category, len(questions)) for category, questions in self.job.recommender.question_bank.items())
+        if self._planner is None or bank != self._planner_bank:
+            self._planner = DailyPlanner.from_engines(self.job.recommender, self.job.tips)
+            self._planner_bank = bank
+        return self._planner
+
+    async def get(self, user_id: str, partner_id: str, day: date) -> Dict[str, Any]:
+        couple_key = f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
+        entry = self.entries.get((couple_key, day))
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end((couple_key, day))
+            return entry
+
+        entry = None
+        try:
+            await db.init()
+            async with db.session_factory() as session:
+                entry = await load_daily_pick(session, couple_key, day)
+        except Exception as e:
+            print(f"Error loading daily picks: {e}")
+        if entry is not None:
+            self.stored += 1
+            entry['precomputed'] = True
+        else:
+            # Not in the batch (a new couple, or the job has not run): plan just this couple, the same way
+            self.planned += 1
+            planner = self.planner()
+            features = couple_features(self.job.engine, planner, [couple_key], planner.question_positions(self.job.engine.registry))
+            entry = dict(planner.plan([couple_key], features, day)[0], precomputed=False)
+        # The backend only asks when its memcached read missed (evicted, or not batched yet)
+        if self.job.publisher is not None:
+            self.job.publisher.publish_later(self.job.publisher.daily_items([entry]))
+
+        entry['day'] = entry['day'].isoformat()
+        self.entries[(couple_key, day)] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'stored': self.stored,
+            'planned_on_demand': self.planned,
+            'running': self.job.running,
+            'last_run': self.job.last_run
+        }
+
+async def _run_from_files(day: date, limit: Optional[int], workers: Optional[int], chunk_size: Optional[int]) -> Dict[str, Any]:
+    """Engine state from ID_REGISTRY_PATH and SNAPSHOT_PATH, as the service last saved it"""
+    from .interning import IdRegistry
+    from .snapshots import SnapshotStore
+
+    registry = IdRegistry(os.environ.get('ID_REGISTRY_PATH', 'echo_ml_ids.tsv') or None)
+    engine = AdaptiveLearningEngine(registry=registry)
+    recommender = QuestionRecommender()
+    snapshot_path = os.environ.get('SNAPSHOT_PATH', 'echo_ml_state.snap')
+    if snapshot_path:
+        store = SnapshotStore(snapshot_path, registry=registry)
+        store.register('adaptive', engine)
+        store.register('recommender', recommender)
+        print(f"Restored {store.restore()['restored']} from {snapshot_path}")
+    publisher = MemcachedPublisher()
+    job = DailyPickJob(engine, recommender, RecommendationEngine(), workers=workers, chunk_size=chunk_size,
+                       publisher=publisher)
+    try:
+        return await job.run(day, limit=limit)
+    finally:
+        registry.close()
+        await publisher.drain()
+        await db.dispose()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute daily picks for every known couple (resumes a partial run)')
+    parser.add_argument('--day', type=date.fromisoformat, default=datetime.utcnow().date() + timedelta(days=1),
+                        help='Day to plan (default tomorrow, UTC)')
+    parser.add_argument('--limit', type=int, help='Plan at most this many couples')
+    parser.add_argument('--workers', type=int, help='Process pool size (default DAILY_BATCH_WORKERS or the CPU count; 0 = no pool)')
+    parser.add_argument('--chunk-size', type=int, help='Couples per chunk (default DAILY_BATCH_CHUNK_SIZE or 5000)')
+    args = parser.parse_args()
+    report = asyncio.run(_run_from_files(args.day, args.limit, args.workers, args.chunk_size))
+    print(f"Planned {report['planned']} couples for {report['day']} in {report['seconds']}s "
+          f"({report['couples_per_second']}/s; {report['already_done']} already done, {report['remaining']} remaining)")
@@ -0,0 +1,210 @@
+import copy
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+class DuplicateIndex:
+    """Near-duplicate clusters over question texts
+
+    Texts are vectorized once into an L2-normalized sparse TF-IDF matrix, so a sparse dot
+    product is the cosine similarity. Pairs at or above the threshold are found one block of
+    rows at a time (never a dense N x N), pruned with prefix filtering, and joined into clusters
+    with connected components.
+    Lookups afterwards are dict/array reads: cluster_of and is_excluded are O(1).
+    """
+
+    def __init__(self, threshold: Optional[float] = None, block_size: int = 4096, max_block_products: int = 2_000_000):
+        self.threshold = threshold if threshold is not None else float(os.environ.get('QUESTION_DEDUP_THRESHOLD', 0.8))
+        # Rows per block, and the cap on candidate products one block may generate
+        self.block_size = block_size
+        self.max_block_products = max_block_products
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.cluster_ids = np.zeros(0, dtype=np.int64)
+        self.cluster_count = 0
+
+    def build(self, questions: Iterable[Dict[str, Any]]) -> 'DuplicateIndex':
+        """Index questions (dicts with 'id' and 'text'), replacing anything indexed before"""
+        questions = [q for q in questions if q.get('id') is not None]
+        self.ids = [str(q['id']) for q in questions]
+        self.positions = {question_id: position for position, question_id in enumerate(self.ids)}
+        if not questions:
+            self.vectorizer, self.matrix = None, None
+            self.cluster_ids = np.zeros(0, dtype=np.int64)
+            self.cluster_count = 0
+            return self
+
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, stop_words='english')
+        try:
+            self.matrix = self.vectorizer.fit_transform([q.get('text', '') for q in questions]).tocsr()
+        except ValueError:
+            # Every text was empty or stop words only; nothing can be a near-duplicate
+            self.vectorizer, self.matrix = None, None
+            self.cluster_ids = np.arange(len(questions), dtype=np.int64)
+            self.cluster_count = len(questions)
+            return self
+
+        rows, cols = self._similar_pairs(self.matrix, self.matrix, upper_only=True)
+        count = len(self.ids)
+        graph = sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(count, count))
+        self.cluster_count, labels = connected_components(graph, directed=False)
+        self.cluster_ids = labels.astype(np.int64)
+        return self
+
+    def copy(self) -> 'DuplicateIndex':
+        """Index sharing this one's arrays, with its own id lists, so add() leaves this one untouched"""
+        index = copy.copy(self)
+        index.ids = list(self.ids)
+        index.positions = dict(self.positions)
+        return index
+
+    def add(self, questions: Iterable[Dict[str, Any]]) -> List[int]:
+        """Index more questions (e.g. generated ones) against the fitted vocabulary; returns their cluster ids
+
+        A new question joins the cluster of its most similar indexed question when that is at or
+        above the threshold, otherwise it starts a cluster of its own. Words outside the
+        vocabulary are ignored until the next build().
+        """
+        questions = [q for q in questions if q.get('id') is not None and str(q['id']) not in self.positions]
+        if not questions:
+            return []
+        if self.vectorizer is None:
+            return self._add_unclustered(questions)
+
+        vectors = self.vectorizer.transform([q.get('text', '') for q in questions]).tocsr()
+        similarities = (vectors @ self.matrix.T).tocsr()
+        # Near-duplicates among the new questions themselves: the earliest match wins
+        earlier: Dict[int, int] = {}
+        for row, col in zip(*self._similar_pairs(vectors, vectors, upper_only=True)):
+            earlier[int(col)] = min(int(row), earlier.get(int(col), int(row)))
+
+        assigned: List[int] = []
+        for offset in range(vectors.shape[0]):
+            start, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            scores = similarities.data[start:end]
+            if scores.size and scores.max() >= self.threshold:
+                cluster = int(self.cluster_ids[similarities.indices[start + int(scores.argmax())]])
+            elif offset in earlier:
+                cluster = assigned[earlier[offset]]
+            else:
+                cluster = self.cluster_count
+                self.cluster_count += 1
+            assigned.append(cluster)
+
+        for question in questions:
+            self.positions[str(question['id'])] = len(self.ids)
+            self.ids.append(str(question['id']))
+        self.cluster_ids = np.concatenate([self.cluster_ids, np.asarray(assigned, dtype=np.int64)])
+        self.matrix = sparse.vstack([self.matrix, vectors], format='csr')
+        return assigned
+
+    def cluster_of(self, question_id: str) -> Optional[int]:
+        position = self.positions.get(question_id)
+        return int(self.cluster_ids[position]) if position is not None else None
+
+    def siblings(self, question_id: str) -> List[str]:
+        """Other question ids in the same near-duplicate cluster"""
+        cluster = self.cluster_of(question_id)
+        if cluster is None:
+            return []
+        return [self.ids[position] for position in np.flatnonzero(self.cluster_ids == cluster)
+                if self.ids[position] != question_id]
+
+    def clusters_for(self, question_ids: Iterable[str]) -> Set[int]:
+        """Cluster ids covering question_ids, for O(1) sibling exclusion with is_excluded"""
+        clusters = set()
+        for question_id in question_ids:
+            position = self.positions.get(question_id)
+            if position is not None:
+                clusters.add(int(self.cluster_ids[position]))
+        return clusters
+
+    def is_excluded(self, question_id: str, excluded_clusters: Set[int]) -> bool:
+        position = self.positions.get(question_id)
+        return position is not None and int(self.cluster_ids[position]) in excluded_clusters
+
+    def duplicate_groups(self) -> List[List[str]]:
+        """Clusters with more than one member"""
+        groups: Dict[int, List[str]] = {}
+        for question_id, cluster in zip(self.ids, self.cluster_ids.tolist()):
+            groups.setdefault(cluster, []).append(question_id)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = np.bincount(self.cluster_ids) if self.cluster_ids.size else np.zeros(0, dtype=np.int64)
+        return {
+            'questions': len(self.ids),
+            'clusters': self.cluster_count,
+            'duplicate_clusters': int((sizes > 1).sum()),
+            'largest_cluster': int(sizes.max()) if sizes.size else 0,
+            'threshold': self.threshold,
+            'vocabulary': len(self.vectorizer.vocabulary_) if self.vectorizer is not None else 0
+        }
+
+    def _similar_pairs(self, left: sparse.csr_matrix, right: sparse.csr_matrix, upper_only: bool = False):
+        """(row, col) pairs with left[row] . right[col] >= threshold
+
+        Candidates come from probing each right row's prefix (its rarest terms, enough that the
+        rest cannot reach the threshold on their own), so pairs sharing only common words are
+        never materialized. Left rows are processed in blocks sized by how many products they
+        can generate, which bounds memory regardless of how skewed the vocabulary is.
+        """
+        prefix_t = self._prefix(right).T.tocsr()
+        document_frequency = np.diff(prefix_t.indptr)
+        costs = np.add.reduceat(np.append(document_frequency[left.indices], 0), left.indptr[:-1]) \
+            if left.nnz else np.zeros(left.shape[0], dtype=np.int64)
+        costs[np.diff(left.indptr) == 0] = 0
+
+        row_parts, col_parts = [], []
+        start = 0
+        while start < left.shape[0]:
+            # Extend the block until it would exceed the product budget (always at least one row)
+            cumulative = np.cumsum(costs[start:start + self.block_size])
+            end = start + max(1, int(np.searchsorted(cumulative, self.max_block_products, side='right')))
+            candidates = (left[start:end] @ prefix_t).tocoo()
+            rows, cols = candidates.row + start, candidates.col
+            if upper_only:
+                upper = rows < cols
+                rows, cols = rows[upper], cols[upper]
+            if rows.size:
+                exact = np.asarray(left[rows].multiply(right[cols]).sum(axis=1)).ravel()
+                keep = exact >= self.threshold
+                row_parts.append(rows[keep])
+                col_parts.append(cols[keep])
+            start = end
+        if not row_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(row_parts), np.concatenate(col_parts)
+
+    def _prefix(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        """Each row restricted to its rarest terms; the dropped common terms have norm below the threshold"""
+        document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        keep = np.zeros(matrix.nnz, dtype=bool)
+        limit = self.threshold ** 2
+        for row in range(matrix.shape[0]):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            if start == end:
+                continue
+            # Most common terms first; they can be dropped while their squared weight stays under threshold^2
+            order = np.argsort(-document_frequency[matrix.indices[start:end]], kind='stable')
+            dropped = int(np.searchsorted(np.cumsum(matrix.data[start:end][order] ** 2), limit, side='left'))
+            keep[start + order[dropped:]] = True
+        prefix = sparse.csr_matrix((np.where(keep, matrix.data, 0.0), matrix.indices.copy(), matrix.indptr.copy()), shape=matrix.shape)
+        prefix.eliminate_zeros()
+        return prefix
+
+    def _add_unclustered(self, questions: List[Dict[str, Any]]) -> List[int]:
+        assigned = []
+        for question in questions:
+            cluster = self.cluster_count
+            self.cluster_count += 1
+            self.positions[str(question['id'])] = len(self.ids)
+            self.ids.append(str(question['id']))
+            self.cluster_ids = np.append(self.cluster_ids, cluster)
+            assigned.append(cluster)
+        return assigned
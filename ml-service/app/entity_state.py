@@ -0,0 +1,312 @@
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple, Union
+import numpy as np
+
+FieldSpec = Union[Any, Tuple[Any, Tuple[int, ...], Any]]
+
+class EntityArrays:
+    """Per-entity numeric state as NumPy columns indexed by interned id
+
+    Each field is one array with a row per entity (optionally with a fixed-size tail, e.g.
+    one slot per difficulty), so a pass over every user is a vectorized expression over a
+    column. Capacity doubles as ids grow; rows that were never written hold the field's default.
+
+    share() moves the columns (and the row count) into shared memory, so processes forked
+    afterwards read and write the same arrays instead of copy-on-write duplicates.
+    """
+
+    def __init__(self, fields: Dict[str, FieldSpec], capacity: int = 1024):
+        # name -> (dtype, tail shape, default)
+        self.fields: Dict[str, Tuple[np.dtype, Tuple[int, ...], Any]] = {}
+        for name, spec in fields.items():
+            dtype, shape, default = spec if isinstance(spec, tuple) else (spec, (), 0)
+            self.fields[name] = (np.dtype(dtype), tuple(shape), default)
+        self.capacity = max(1, capacity)
+        # Rows in use; a one-element array so it can live in shared memory with the columns
+        self._size = np.zeros(1, dtype=np.int64)
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.full((self.capacity,) + shape, default, dtype=dtype)
+            for name, (dtype, shape, default) in self.fields.items()
+        }
+        self._segments: List[shared_memory.SharedMemory] = []
+
+    @property
+    def size(self) -> int:
+        return int(self._size[0])
+
+    @size.setter
+    def size(self, value: int):
+        self._size[0] = value
+
+    @property
+    def shared(self) -> bool:
+        return bool(self._segments)
+
+    def ensure(self, index: int):
+        """Make row `index` (and every row below it) addressable"""
+        if index < self.size:
+            return
+        if index >= self.capacity:
+            if self.shared:
+                # Shared segments cannot grow in place; this process continues on private copies
+                print(f"EntityArrays: row {index} is past the shared capacity {self.capacity}; growing privately")
+                self.detach()
+            capacity = self.capacity
+            while capacity <= index:
+                capacity *= 2
+            for name, (dtype, shape, default) in self.fields.items():
+                grown = np.full((capacity,) + shape, default, dtype=dtype)
+                grown[:self.size] = self.columns[name][:self.size]
+                self.columns[name] = grown
+            self.capacity = capacity
+        # Another process may have raised it meanwhile, so never lower it
+        self.size = max(self.size, index + 1)
+
+    def share(self, capacity: int):
+        """Move the columns into shared memory sized for `capacity` rows
+
+        Call before forking: children inherit the mappings. Growth beyond `capacity` falls back
+        to private arrays in the process that needs it. Updates from several processes are not
+        locked against each other (the same as from several threads).
+        """
+        capacity = max(capacity, self.size, 1)
+        size = self.size
+        segments, columns = [], {}
+        for name, (dtype, shape, default) in self.fields.items():
+            nbytes = capacity * int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            segment = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            column = np.ndarray((capacity,) + shape, dtype=dtype, buffer=segment.buf)
+            # Fresh segments are zeroed, so only non-zero defaults need writing (and touching)
+            if default != 0:
+                column[size:] = default
+            column[:size] = self.columns[name][:size]
+            segments.append(segment)
+            columns[name] = column
+        counter = shared_memory.SharedMemory(create=True, size=8)
+        shared_size = np.ndarray((1,), dtype=np.int64, buffer=counter.buf)
+        shared_size[0] = size
+        segments.append(counter)
+
+        self.release()
+        self.columns, self._size, self._segments = columns, shared_size, segments
+        self.capacity = capacity
+
+    def detach(self):
+        """Continue on private copies of the columns (other processes keep the shared segments)"""
+        self.columns = {name: column.copy() for name, column in self.columns.items()}
+        self._size = self._size.copy()
+        self._segments = []
+
+    def release(self):
+        """Unlink shared segments (the process that called share() does this once every user has exited)"""
+        for segment in self._segments:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Live view of a column over the rows in use"""
+        return self.columns[name][:self.size]
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """One entity's values (defaults for ids never written)"""
+        if index >= self.size:
+            return {name: np.full(shape, default, dtype=dtype) if shape else dtype.type(default)
+                    for name, (dtype, shape, default) in self.fields.items()}
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def add(self, name: str, indexes: Any, values: Any):
+        """columns[name][indexes] += values, accumulating repeated indexes"""
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if indexes.size:
+            self.ensure(int(indexes.max()))
+            np.add.at(self.columns[name], indexes, values)
+
+    def export(self) -> Dict[str, np.ndarray]:
+        """Copies of the rows in use, one array per field"""
+        size = self.size
+        return {name: column[:size].copy() for name, column in self.columns.items()}
+
+    def restore(self, columns: Dict[str, np.ndarray]):
+        """Adopt exported columns as they are (e.g. memory-mapped); they are copied only when they grow"""
+        rows = None
+        for name, (dtype, shape, default) in self.fields.items():
+            column = columns.get(name)
+            if column is None or column.dtype != dtype or column.shape[1:] != shape:
+                raise ValueError(f"Column {name!r} is missing or has the wrong dtype/shape")
+            if rows is not None and len(column) != rows:
+                raise ValueError("Columns have different lengths")
+            rows = len(column)
+        if not rows:
+            return
+        self.columns = {name: columns[name] for name in self.fields}
+        self.capacity = self.size = rows
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {'rows': self.size, 'capacity': self.capacity, 'bytes': self.nbytes, 'shared': self.shared}
+
+class EntitySets:
+    """Per-entity sets of ints (e.g. the questions each user answered) packed into one pool
+
+    Entity i's members are pool[start[i]:start[i] + length[i]], unordered, inside a slab of
+    room[i] slots. A set that outgrows its slab is copied to a slab twice its size at the end
+    of the pool; old slabs are not reused, so the pool stays within about twice the members.
+    This is the concatenated-with-offsets layout snapshots store ragged arrays in, kept live.
+
+    share() moves the pool and the per-entity columns into shared memory, like
+    EntityArrays.share(), with a lock that serializes writers across the forked processes.
+    A process that runs out of shared pool continues on private copies.
+    """
+
+    def __init__(self, capacity: int = 1024, pool_capacity: int = 4096, dtype: Any = np.int32):
+        self.slabs = EntityArrays({'start': np.int64, 'length': np.int64, 'room': np.int64}, capacity)
+        self.pool = np.zeros(max(1, pool_capacity), dtype=dtype)
+        # Pool slots handed out; a one-element array so it can live in shared memory
+        self._used = np.zeros(1, dtype=np.int64)
+        self._segments: List[shared_memory.SharedMemory] = []
+        # Writers hold it (callers updating related state can too); reads never wait
+        self.lock = threading.RLock()
+
+    @property
+    def shared(self) -> bool:
+        return bool(self._segments)
+
+    def get(self, index: int) -> np.ndarray:
+        """A copy of the entity's members (empty for entities never written)"""
+        if index >= self.slabs.size:
+            return np.zeros(0, dtype=self.pool.dtype)
+        columns = self.slabs.columns
+        # Length before start: a writer moves a set by filling the new slab, then start, then length
+        length = int(columns['length'][index])
+        start = int(columns['start'][index])
+        return self.pool[start:start + length].copy()
+
+    def add(self, index: int, values: Any) -> int:
+        """Add values not already in the entity's set; returns how many were new"""
+        values = np.unique(np.asarray(values, dtype=self.pool.dtype))
+        if not values.size:
+            return 0
+        with self.lock:
+            new = values[~np.isin(values, self.get(index))]
+            if new.size:
+                self._write(index, new, keep=True)
+            return int(new.size)
+
+    def replace(self, index: int, values: Any):
+        """Make values the entity's members (kept in the order given)"""
+        with self.lock:
+            self._write(index, np.asarray(values, dtype=self.pool.dtype), keep=False)
+
+    def _write(self, index: int, values: np.ndarray, keep: bool):
+        self.slabs.ensure(index)
+        columns = self.slabs.columns
+        start, length, room = (int(columns[name][index]) for name in ('start', 'length', 'room'))
+        kept = length if keep else 0
+        needed = kept + len(values)
+        if needed > room:
+            room = max(needed, 2 * room, 4)
+            slab = self._allocate(room)
+            self.pool[slab:slab + kept] = self.pool[start:start + kept]
+            columns = self.slabs.columns
+            columns['room'][index] = room
+            columns['start'][index] = start = slab
+        self.pool[start + kept:start + needed] = values
+        columns['length'][index] = needed
+
+    def _allocate(self, slots: int) -> int:
+        used = int(self._used[0])
+        if used + slots > len(self.pool):
+            if self.shared:
+                print(f"EntitySets: the shared pool of {len(self.pool)} slots is full; growing privately")
+                self._detach()
+            capacity = len(self.pool)
+            while capacity < used + slots:
+                capacity *= 2
+            grown = np.zeros(capacity, dtype=self.pool.dtype)
+            grown[:used] = self.pool[:used]
+            self.pool = grown
+        self._used[0] = used + slots
+        return used
+
+    def _detach(self):
+        """Continue on private copies (other processes keep the shared segments)"""
+        self.pool = self.pool.copy()
+        self._used = self._used.copy()
+        self.slabs.detach()
+        self._segments = []
+        self.lock = threading.RLock()
+
+    def share(self, capacity: int, pool_capacity: int):
+        """Move the sets into shared memory sized for `capacity` entities and `pool_capacity` slots (call before forking)"""
+        used = int(self._used[0])
+        pool_capacity = max(pool_capacity, used, 1)
+        segment = shared_memory.SharedMemory(create=True, size=pool_capacity * self.pool.dtype.itemsize)
+        pool = np.ndarray((pool_capacity,), dtype=self.pool.dtype, buffer=segment.buf)
+        pool[:used] = self.pool[:used]
+        counter = shared_memory.SharedMemory(create=True, size=8)
+        shared_used = np.ndarray((1,), dtype=np.int64, buffer=counter.buf)
+        shared_used[0] = used
+        self.slabs.share(capacity)
+
+        self.release_pool()
+        self.pool, self._used, self._segments = pool, shared_used, [segment, counter]
+        # Inherited by the forked workers, so it serializes their writers too
+        self.lock = multiprocessing.RLock()
+
+    def release_pool(self):
+        for segment in self._segments:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    def release(self):
+        """Unlink shared segments (the process that called share() does this once every user has exited)"""
+        self.slabs.release()
+        self.release_pool()
+
+    def export(self) -> Dict[str, np.ndarray]:
+        """Entities with members, their offsets into one concatenated array, and that array (no slack)"""
+        with self.lock:
+            lengths = self.slabs['length'].copy()
+            entities = np.flatnonzero(lengths > 0)
+            offsets = np.zeros(len(entities) + 1, dtype=np.int64)
+            np.cumsum(lengths[entities], out=offsets[1:])
+            values = np.zeros(int(offsets[-1]), dtype=self.pool.dtype)
+            starts = self.slabs['start']
+            for entity, offset, end in zip(entities.tolist(), offsets.tolist(), offsets[1:].tolist()):
+                values[offset:end] = self.pool[starts[entity]:starts[entity] + end - offset]
+        return {'entities': entities.astype(np.int64), 'offsets': offsets, 'values': values}
+
+    def restore(self, arrays: Dict[str, np.ndarray]):
+        """Adopt exported sets; the values array is used as the pool as it is (e.g. memory-mapped)"""
+        entities, offsets, values = arrays['entities'], arrays['offsets'], arrays['values']
+        if len(offsets) != len(entities) + 1 or (len(offsets) and offsets[-1] != len(values)):
+            raise ValueError("Set offsets do not match their entities and values")
+        if values.dtype != self.pool.dtype:
+            raise ValueError(f"Set values have dtype {values.dtype}, expected {self.pool.dtype}")
+        slabs = EntityArrays(self.slabs.fields)
+        if len(entities):
+            slabs.ensure(int(entities.max()))
+            lengths = np.diff(offsets)
+            slabs.columns['start'][entities] = offsets[:-1]
+            slabs.columns['length'][entities] = lengths
+            slabs.columns['room'][entities] = lengths
+        self.slabs = slabs
+        self.pool = values if len(values) else np.zeros(1, dtype=self.pool.dtype)
+        self._used = np.array([len(values)], dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.slabs.nbytes + self.pool.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entities': self.slabs.size, 'pool_used': int(self._used[0]), 'pool_capacity': len(self.pool),
+                'bytes': self.nbytes, 'shared': self.shared}
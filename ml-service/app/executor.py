@@ -0,0 +1,202 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from .metrics import metrics
+
+# Engines built inside each worker process, keyed by registered name
+_worker_engines: Dict[str, Any] = {}
+
+# Modules the forkserver imports once so pool workers start without re-importing them
+FORKSERVER_PRELOAD = ['app.sentiment']
+
+def process_context() -> multiprocessing.context.BaseContext:
+    """Start method for the process pool
+
+    A forked child copies the parent's lock state as it was mid-request (thread pool, event loop,
+    logging), so pool workers come from a forkserver, or are spawned where there is none.
+    """
+    method = os.environ.get('ENGINE_PROCESS_START_METHOD')
+    if not method:
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+def _timed_call(submitted_at: float, fn: Callable, args: Tuple, kwargs: Dict) -> Tuple[float, float, Any]:
+    """Run fn in a pool worker, reporting how long it queued and how long it ran"""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return started_at - submitted_at, time.time() - started_at, result
+
+def _call_worker_engine(name: str, factory: Callable, method: str, args: Tuple, kwargs: Dict) -> Any:
+    """Call a method on this worker process's own copy of an engine"""
+    engine = _worker_engines.get(name)
+    if engine is None:
+        engine = _worker_engines[name] = factory()
+    return getattr(engine, method)(*args, **kwargs)
+
+class PoolStats:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_run_time = 0.0
+
+    def queue_depth(self) -> int:
+        """Tasks waiting for a free worker"""
+        return max(0, self.in_flight - self.workers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.completed or 1
+        return {
+            'workers': self.workers,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'avg_queue_wait_ms': round(self.total_queue_wait / finished * 1000, 3),
+            'max_queue_wait_ms': round(self.max_queue_wait * 1000, 3),
+            'avg_run_time_ms': round(self.total_run_time / finished * 1000, 3)
+        }
+
+class EngineExecutor:
+    """Dispatches CPU-bound engine calls off the event loop to a thread or process pool chosen per engine"""
+
+    def __init__(self, thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+        cpus = os.cpu_count() or 1
+        self.enabled = os.environ.get('ENGINE_EXECUTOR_ENABLED', '1') != '0'
+        self.pool_sizes = {
+            'thread': thread_workers or int(os.environ.get('ENGINE_THREAD_WORKERS', min(8, cpus + 2))),
+            'process': process_workers or int(os.environ.get('ENGINE_PROCESS_WORKERS', max(1, min(4, cpus - 1))))
+        }
+        self.pools: Dict[str, Executor] = {}
+        self.stats = {name: PoolStats(size) for name, size in self.pool_sizes.items()}
+        self.engines: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, name: str, engine: Any, pool: str = 'thread'):
+        """Register an engine instance (thread pool) or a picklable factory (process pool)
+
+        ENGINE_POOL_<NAME> overrides the pool choice at deploy time.
+        """
+        pool = os.environ.get(f"ENGINE_POOL_{name.upper()}", pool)
+        if pool not in self.pool_sizes:
+            raise ValueError(f"Unknown pool '{pool}' for engine '{name}'")
+        if pool == 'process' and not isinstance(engine, type):
+            raise ValueError(f"Engine '{name}' must be registered as a class to run in the process pool")
+        if pool == 'thread' and isinstance(engine, type):
+            engine = engine()
+        self.engines[name] = {'engine': engine, 'pool': pool}
+
+    def pool_for(self, name: str) -> str:
+        return self.engines[name]['pool']
+
+    def _get_pool(self, pool: str) -> Executor:
+        if pool not in self.pools:
+            if pool == 'process':
+                self.pools[pool] = ProcessPoolExecutor(max_workers=self.pool_sizes[pool], mp_context=process_context())
+            else:
+                self.pools[pool] = ThreadPoolExecutor(max_workers=self.pool_sizes[pool], thread_name_prefix='engine')
+        return self.pools[pool]
+
+    async def start(self):
+        """Create the pools the registered engines use at startup, not on the first request
+
+        One no-op call on the process pool starts the forkserver and a first worker, so a
+        pool that cannot start shows up in the startup log.
+        """
+        if not self.enabled:
+            return
+        pools = {registration['pool'] for registration in self.engines.values()}
+        for pool in sorted(pools):
+            self._get_pool(pool)
+        if 'process' in pools:
+            try:
+                await self.run_in_pool('process', os.getpid)
+            except Exception as e:
+                print(f"Error starting the engine process pool: {e}")
+
+    async def run_in_pool(self, pool: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the named pool, or inline when the executor is disabled"""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        _, result = await self._submit(pool, fn, args, kwargs)
+        return result
+
+    async def _submit(self, pool: str, fn: Callable, args: Tuple, kwargs: Dict) -> Tuple[float, Any]:
+        stats = self.stats[pool]
+        stats.submitted += 1
+        stats.in_flight += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth())
+        loop = asyncio.get_running_loop()
+        try:
+            queue_wait, run_time, result = await loop.run_in_executor(
+                self._get_pool(pool), _timed_call, time.time(), fn, args, kwargs
+            )
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+        stats.completed += 1
+        stats.total_queue_wait += queue_wait
+        stats.max_queue_wait = max(stats.max_queue_wait, queue_wait)
+        stats.total_run_time += run_time
+        return run_time, result
+
+    async def call(self, name: str, method: str, *args, **kwargs) -> Any:
+        """Call engine.method(*args, **kwargs) on the pool registered for that engine"""
+        registration = self.engines[name]
+        engine, pool = registration['engine'], registration['pool']
+
+        if pool == 'process':
+            if not self.enabled:
+                return _call_worker_engine(name, engine, method, args, kwargs)
+            # Timing decorators fire inside the worker process, so record the call here instead
+            run_time, result = await self._submit(
+                pool, _call_worker_engine, (name, engine, method, args, kwargs), {}
+            )
+            metrics.observe_engine(f"{engine.__name__}.{method}", run_time)
+            return result
+
+        return await self.run_in_pool(pool, getattr(engine, method), *args, **kwargs)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Per-pool queue metrics"""
+        return {
+            'enabled': self.enabled,
+            'engines': {name: registration['pool'] for name, registration in self.engines.items()},
+            'pools': {name: stats.snapshot() for name, stats in self.stats.items()}
+        }
+
+    def metric_families(self):
+        """Pool queue gauges for the /metrics endpoint"""
+        families = [
+            ('ml_executor_queue_depth', 'gauge', 'Engine tasks waiting for a pool worker', 'queue_depth'),
+            ('ml_executor_in_flight', 'gauge', 'Engine tasks submitted and not yet finished', 'in_flight'),
+            ('ml_executor_completed_total', 'counter', 'Engine tasks completed', 'completed'),
+            ('ml_executor_failed_total', 'counter', 'Engine tasks that raised', 'failed'),
+            ('ml_executor_queue_wait_seconds_total', 'counter', 'Total time tasks waited for a worker', 'total_queue_wait')
+        ]
+        for name, metric_type, help_text, attribute in families:
+            samples = []
+            for pool, stats in self.stats.items():
+                value = stats.queue_depth() if attribute == 'queue_depth' else getattr(stats, attribute)
+                samples.append(({'pool': pool}, value))
+            yield name, metric_type, help_text, samples
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.pools = {}
@@ -0,0 +1,228 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[^\sa-z0-9']")
+# Words that end a keyphrase candidate besides the stop list (fillers common in spoken answers)
+PHRASE_BREAKS = frozenset(ENGLISH_STOP_WORDS) | {
+    'really', 'just', 'like', 'think', 'guess', 'maybe', 'probably', 'actually', 'basically', 'lot',
+    'things', 'thing', 'stuff', 'kind', 'sort', 'pretty', 'don\'t', 'i\'m', 'it\'s', 'that\'s', 'you\'re',
+    'we\'re', 'i\'d', 'i\'ve', 'can\'t', 'yes', 'no', 'ok', 'okay', 'yeah'
+}
+MAX_PHRASE_WORDS = 3
+KEYPHRASES_PER_ANSWER = 3
+
+FOLLOW_UP_TEMPLATES = {
+    'communication': [
+        "You mentioned {phrase} - can you tell me more about why that's important to you?",
+        "How would you help your partner understand your perspective on {phrase}?",
+        "What would you want me to know about your feelings regarding {phrase}?"
+    ],
+    'intimacy': [
+        "When you think about {phrase}, what emotions come up?",
+        "How can we create more moments like {phrase}?",
+        "What would make {phrase} even more meaningful for us?"
+    ],
+    'fun': [
+        "What excites you most about {phrase}?",
+        "How could we make {phrase} even more enjoyable together?",
+        "What other activities give you the same feeling as {phrase}?"
+    ]
+}
+# Used when an answer has no usable keyphrase (empty, or only filler words)
+GENERIC_FOLLOW_UPS = {
+    'communication': "Can you tell me more about why that answer matters to you?",
+    'intimacy': "What would make the experience you described even more meaningful?",
+    'fun': "What would make that even more fun for us to do together?"
+}
+
+def answer_key(answer: str) -> str:
+    """Cache key for an answer: hash of its whitespace- and case-normalized text"""
+    return hashlib.sha1(' '.join(answer.lower().split()).encode('utf-8')).hexdigest()
+
+def follow_up_id(text: str) -> str:
+    """Content-addressed id: the same follow-up text always gets the same id"""
+    return f"followup_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+
+def extract_keyphrases(answer: str, limit: int = KEYPHRASES_PER_ANSWER) -> List[str]:
+    """Keyphrases of one answer, best first (RAKE-style)
+
+    Candidates are runs of up to MAX_PHRASE_WORDS content words between stop words and
+    punctuation; each is scored by the sum of its words' degree/frequency ratios, so longer
+    phrases made of words that co-occur with others rank above isolated common words.
+    """
+    candidates: List[Tuple[str, ...]] = []
+    current: List[str] = []
+    for token in WORD_PATTERN.findall(answer.lower().replace('’', "'")):
+        if token in PHRASE_BREAKS or not token[0].isalnum() or token.isdigit():
+            if current:
+                candidates.append(tuple(current))
+                current = []
+            continue
+        current.append(token)
+        if len(current) == MAX_PHRASE_WORDS:
+            candidates.append(tuple(current))
+            current = []
+    if current:
+        candidates.append(tuple(current))
+    if not candidates:
+        return []
+
+    frequency: Dict[str, int] = {}
+    degree: Dict[str, int] = {}
+    for phrase in candidates:
+        for word in phrase:
+            frequency[word] = frequency.get(word, 0) + 1
+            degree[word] = degree.get(word, 0) + len(phrase)
+
+    scored: Dict[str, Tuple[float, int]] = {}
+    for position, phrase in enumerate(candidates):
+        text = ' '.join(phrase)
+        if text not in scored and any(len(word) > 2 for word in phrase):
+            scored[text] = (sum(degree[word] / frequency[word] for word in phrase), -position)
+    return [text for text, _ in sorted(scored.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+class FollowUpEngine:
+    """Batched follow-up questions from a session's answers
+
+    Keyphrases are extracted once per distinct answer and cached by answer hash (LRU), so a
+    repeated answer costs a dict lookup. Follow-ups are built from templates with
+    content-addressed ids, which makes identical follow-ups cacheable and comparable across
+    requests, and each couple's recently seen follow-up ids are remembered so the same
+    question is not asked twice.
+    """
+
+    def __init__(self, templates: Optional[Dict[str, List[str]]] = None, cache_size: Optional[int] = None,
+                 max_couples: Optional[int] = None, seen_per_couple: Optional[int] = None):
+        self.templates = templates or FOLLOW_UP_TEMPLATES
+        self.cache_size = cache_size if cache_size is not None else int(os.environ.get('FOLLOW_UP_KEYPHRASE_CACHE', 20000))
+        self.max_couples = max_couples if max_couples is not None else int(os.environ.get('FOLLOW_UP_MAX_COUPLES', 50000))
+        self.seen_per_couple = seen_per_couple if seen_per_couple is not None else int(os.environ.get('FOLLOW_UP_SEEN_PER_COUPLE', 500))
+        # answer hash -> keyphrases, most recently used last
+        self.keyphrase_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        # couple_id -> follow-up ids already served (insertion-ordered, oldest dropped first)
+        self.seen: "OrderedDict[Hashable, Dict[str, None]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.skipped_seen = 0
+
+    def keyphrases(self, answer: str) -> List[str]:
+        key = answer_key(answer)
+        with self._lock:
+            cached = self.keyphrase_cache.get(key)
+            if cached is not None:
+                self.keyphrase_cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+        phrases = extract_keyphrases(answer)
+        with self._lock:
+            self.cache_misses += 1
+            self.keyphrase_cache[key] = phrases
+            while len(self.keyphrase_cache) > self.cache_size:
+                self.keyphrase_cache.popitem(last=False)
+        return phrases
+
+    def generate(self, answers: Iterable[Dict[str, Any]], couple_id: Optional[Hashable] = None,
+                 per_answer: int = 1, limit: Optional[int] = None) -> List[Dict]:
+        """Follow-ups for a whole session in one call
+
+        answers are {'question': {...}, 'answer': str} dicts. Each answer yields up to per_answer
+        follow-ups, skipping any the couple has already been served and duplicates within the
+        batch; the returned ids are recorded as seen for the couple.
+        """
+        with self._lock:
+            seen = set(self.seen.get(couple_id, ())) if couple_id is not None else set()
+
+        follow_ups: List[Dict] = []
+        for answer_data in answers:
+            if limit is not None and len(follow_ups) >= limit:
+                break
+            if not isinstance(answer_data, dict) or 'answer' not in answer_data or 'question' not in answer_data:
+                continue
+            answer = answer_data['answer']
+            if not isinstance(answer, str):
+                continue
+            question = answer_data['question'] if isinstance(answer_data['question'], dict) else {}
+            made = 0
+            for text, category in self._candidates(question, answer):
+                if made >= per_answer or (limit is not None and len(follow_ups) >= limit):
+                    break
+                question_id = follow_up_id(text)
+                if question_id in seen:
+                    self.skipped_seen += 1
+                    continue
+                seen.add(question_id)
+                made += 1
+                follow_ups.append({
+                    'id': question_id,
+                    'text': text,
+                    'category': category,
+                    'type': 'open_ended',
+                    'difficulty': 'medium',
+                    'generated': True,
+                    'is_follow_up': True,
+                    'follows': question.get('id')
+                })
+
+        if couple_id is not None and follow_ups:
+            self.mark_seen(couple_id, [question['id'] for question in follow_ups])
+        return follow_ups
+
+    def mark_seen(self, couple_id: Hashable, question_ids: Iterable[str]):
+        with self._lock:
+            seen = self.seen.get(couple_id)
+            if seen is None:
+                seen = self.seen[couple_id] = {}
+            for question_id in question_ids:
+                seen.pop(question_id, None)
+                seen[question_id] = None
+            while len(seen) > self.seen_per_couple:
+                del seen[next(iter(seen))]
+            self.seen.move_to_end(couple_id)
+            while len(self.seen) > self.max_couples:
+                self.seen.popitem(last=False)
+
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Keyphrase cache and seen follow-ups, least recently used first"""
+        with self._lock:
+            return {}, {
+                'keyphrases': [[key, phrases] for key, phrases in self.keyphrase_cache.items()],
+                'seen': [[couple_id, list(seen)] for couple_id, seen in self.seen.items()]
+            }
+
+    def restore_state(self, arrays: Dict[str, Any], meta: Dict[str, Any]):
+        keyphrase_cache = OrderedDict((key, phrases) for key, phrases in meta['keyphrases'][-self.cache_size:])
+        seen = OrderedDict(
+            (couple_id, dict.fromkeys(question_ids[-self.seen_per_couple:]))
+            for couple_id, question_ids in meta['seen'][-self.max_couples:]
+        )
+        with self._lock:
+            self.keyphrase_cache, self.seen = keyphrase_cache, seen
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'cached_answers': len(self.keyphrase_cache),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'couples': len(self.seen),
+            'skipped_seen': self.skipped_seen
+        }
+
+    def _candidates(self, question: Dict, answer: str):
+        """(text, category) follow-ups for an answer, in preference order
+
+        Keyphrases in rank order, each with the templates rotated by the answer hash, so the same
+        answer always leads with the same follow-up while different answers spread across templates.
+        """
+        category = question.get('category', 'general')
+        templates = self.templates.get(category, self.templates['communication'])
+        offset = int(answer_key(answer)[:8], 16) % len(templates)
+        for phrase in self.keyphrases(answer):
+            for step in range(len(templates)):
+                yield templates[(offset + step) % len(templates)].format(phrase=f"'{phrase}'"), category
+        yield GENERIC_FOLLOW_UPS.get(category, GENERIC_FOLLOW_UPS['communication']), category
@@ -1,6 +1,7 @@
 from typing import Dict, List, Any
 from datetime import datetime
 import uuid
+from .metrics import timed
 
 class GameResultsManager:
     def __init__(self):
@@ -12,6 +13,7 @@ class GameResultsManager:
             self.game_sessions = {}
             self.couple_results = {}
     
+    @timed('GameResultsManager.create_game_session')
     def create_game_session(self, couple_id: str, game_type: str, questions: List[Dict]) -> str:
         """Create new game session"""
         try:
@@ -32,6 +34,7 @@ class GameResultsManager:
         
         return session_id
     
+    @timed('GameResultsManager.submit_response')
     def submit_response(self, session_id: str, user_id: str, question_id: str, response: Any) -> bool:
         """Submit user response to question"""
         try:
@@ -52,6 +55,7 @@ class GameResultsManager:
         
         return True
     
+    @timed('GameResultsManager.complete_game_session')
     def complete_game_session(self, session_id: str) -> Dict[str, Any]:
         """Complete game session and generate results"""
         try:
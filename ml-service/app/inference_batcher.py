@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, float('inf')]
+
+class InferenceBatcher:
+    """Collects single-row predictions from concurrent requests into one vectorized predict_proba call"""
+
+    def __init__(self, model_getter: Callable[[], Any], window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None, executor: Optional[Any] = None):
+        # model_getter returns the fitted model, or None while it is untrained
+        self.model_getter = model_getter
+        # EngineExecutor used to keep predict_proba off the event loop
+        self.executor = executor
+        self.window_ms = window_ms if window_ms is not None else float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 3))
+        self.max_batch = max_batch if max_batch is not None else int(os.environ.get('INFERENCE_BATCH_MAX_ROWS', 64))
+        self._pending: List[Tuple[Sequence[float], asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Batch runs in flight; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    async def predict_proba(self, row: Sequence[float]) -> Optional[Dict[Any, float]]:
+        """Queue one feature row and wait for its class probabilities; None if no model is available"""
+        if self.model_getter() is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_ms / 1000.0, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hand everything queued so far to one batch run"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Sequence[float], asyncio.Future, float]]):
+        """Run one predict_proba over the batch and fan results back out"""
+        started = time.perf_counter()
+        results: List[Optional[Dict[Any, float]]] = [None] * len(batch)
+        try:
+            model = self.model_getter()
+            if model is not None:
+                features = np.asarray([row for row, _, _ in batch], dtype=float)
+                if self.executor is not None:
+                    probabilities = await self.executor.run_in_pool('thread', model.predict_proba, features)
+                else:
+                    probabilities = model.predict_proba(features)
+                classes = list(model.classes_)
+                results = [dict(zip(classes, map(float, proba))) for proba in probabilities]
+        except Exception as e:
+            self.errors += 1
+            print(f"Error running batched inference: {e}")
+
+        self._record_batch(len(batch), [started - enqueued for _, _, enqueued in batch])
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_batch(self, size: int, waits: List[float]):
+        """Track batch size distribution and the queueing latency added by batching"""
+        self.batches += 1
+        self.rows += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_counts[bucket] += 1
+                break
+
+        for wait in waits:
+            wait_ms = wait * 1000.0
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def metric_families(self, model: str):
+        """Batch size and added-latency series for the /metrics endpoint"""
+        labels = {'model': model}
+        yield 'ml_inference_batches_total', 'counter', 'Batched predict_proba calls', [(labels, self.batches)]
+        yield 'ml_inference_rows_total', 'counter', 'Rows scored through the batcher', [(labels, self.rows)]
+        yield 'ml_inference_max_batch_size', 'gauge', 'Largest batch seen', [(labels, self.max_batch_seen)]
+        yield ('ml_inference_added_latency_seconds_total', 'counter', 'Total queueing delay added by batching',
+               [(labels, self.total_wait_ms / 1000.0)])
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching metrics: batch sizes and added latency"""
+        return {
+            'window_ms': self.window_ms,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'rows': self.rows,
+            'errors': self.errors,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch_seen,
+            'batch_size_histogram': {f"le_{bucket}": count for bucket, count in self.batch_size_counts.items()},
+            'avg_added_latency_ms': round(self.total_wait_ms / self.rows, 3) if self.rows else 0.0,
+            'max_added_latency_ms': round(self.max_wait_ms, 3)
+        }
@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: registries work there, but cannot be shared between processes
+    fcntl = None
+
+NAMESPACES = ('user', 'couple', 'question', 'category', 'topic')
+
+class IdRegistry:
+    """Dense integer ids for user, couple and question ids (and category and topic names)
+
+    Each namespace hands out 0, 1, 2, ... in first-seen order, so the ints index straight
+    into NumPy arrays (see entity_state.EntityArrays). With a path, every new assignment is
+    appended to a log (namespace<TAB>id<TAB>json key) that is replayed on start, so an id
+    keeps its int across restarts. New ints are assigned under a file lock after applying
+    whatever other processes appended first, so registries on the same path (uvicorn workers,
+    replicas on one volume) never hand out the same int twice. share() also makes get() read
+    the log for ids another process interned; without fcntl (Windows) there is no lock, and a
+    log must have a single writer. A log that does not replay is moved aside and the registry
+    starts empty (`rebuilt`), which makes snapshots of the old ints unusable.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.ids: Dict[str, Dict[str, int]] = {namespace: {} for namespace in NAMESPACES}
+        self.keys: Dict[str, List[str]] = {namespace: [] for namespace in NAMESPACES}
+        # (user_id, partner_id) in either order -> couple int, so hot paths skip building the key string
+        self.couples: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._log = None
+        # Bytes and lines of the log applied so far (shared registries read on from here)
+        self._offset = 0
+        self._lines = 0
+        self.shared = False
+        self.rebuilt = False
+        if path and os.path.exists(path):
+            try:
+                self._replay(path)
+            except ValueError as e:
+                self._rebuild(e)
+
+    def share(self):
+        """Coordinate with other processes appending to the same log (call before forking)"""
+        if not self.path:
+            raise ValueError("A shared IdRegistry needs a log path")
+        if fcntl is None:
+            raise RuntimeError("Sharing an IdRegistry between processes needs flock (fcntl), which this platform lacks")
+        self.close()
+        self.shared = True
+
+    def intern(self, namespace: str, key: Any) -> int:
+        key = str(key)
+        index = self.ids[namespace].get(key)
+        if index is not None:
+            return index
+        with self._lock:
+            return self._assign(namespace, [key])[0]
+
+    def intern_many(self, namespace: str, keys: Iterable[Any]) -> np.ndarray:
+        """Ints for many keys at once; new keys are assigned (and logged) in one write"""
+        ids = self.ids[namespace]
+        keys = [str(key) for key in keys]
+        result = np.fromiter((ids.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        missing = np.flatnonzero(result < 0)
+        if missing.size:
+            with self._lock:
+                assigned = self._assign(namespace, [keys[position] for position in missing])
+            result[missing] = assigned
+        return result
+
+    def get(self, namespace: str, key: Any) -> Optional[int]:
+        """Int for a key already interned, without assigning one"""
+        key = str(key)
+        index = self.ids[namespace].get(key)
+        if index is None and self.shared:
+            # Possibly interned by another process since this one last read the log
+            with self._lock, self._file_lock(fcntl.LOCK_SH):
+                self._catch_up()
+            index = self.ids[namespace].get(key)
+        return index
+
+    def key(self, namespace: str, index: int) -> str:
+        if index >= len(self.keys[namespace]) and self.shared:
+            # An int another process assigned (e.g. read from shared state) after this one last read the log
+            with self._lock, self._file_lock(fcntl.LOCK_SH):
+                self._catch_up()
+        return self.keys[namespace][index]
+
+    def size(self, namespace: str) -> int:
+        return len(self.keys[namespace])
+
+    def couple(self, user_id: str, partner_id: str) -> int:
+        """Couple int for two users in either order"""
+        index = self.couples.get((user_id, partner_id))
+        if index is None:
+            index = self.intern('couple', f"{min(user_id, partner_id)}_{max(user_id, partner_id)}")
+            self.couples[(user_id, partner_id)] = self.couples[(partner_id, user_id)] = index
+        return index
+
+    def couple_members(self, couple_key: str) -> Optional[Tuple[int, int]]:
+        """User ints of a couple key built by couple(), -1 for a partner never interned as a user
+
+        User ids may contain '_' themselves, so each split point is tried (halves in (min, max)
+        order); a split where both halves are known users wins over one where only one is.
+        None when no split names a known user.
+        """
+        users = self.ids['user']
+        partial = None
+        cut = couple_key.find('_')
+        while cut >= 0:
+            first, second = couple_key[:cut], couple_key[cut + 1:]
+            if first <= second:
+                pair = (users.get(first, -1), users.get(second, -1))
+                if min(pair) >= 0:
+                    return pair
+                if partial is None and max(pair) >= 0:
+                    partial = pair
+            cut = couple_key.find('_', cut + 1)
+        return partial
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'rebuilt': self.rebuilt,
+            **{namespace: len(keys) for namespace, keys in self.keys.items()}
+        }
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def _assign(self, namespace: str, keys: List[str]) -> List[int]:
+        """Assign ints to keys (caller holds the lock); keys interned meanwhile keep their int"""
+        if self.path and fcntl is not None:
+            with self._file_lock(fcntl.LOCK_EX):
+                self._catch_up()
+                return self._assign_locked(namespace, keys)
+        return self._assign_locked(namespace, keys)
+
+    def _assign_locked(self, namespace: str, keys: List[str]) -> List[int]:
+        ids, names = self.ids[namespace], self.keys[namespace]
+        assigned, lines = [], []
+        for key in keys:
+            index = ids.get(key)
+            if index is None:
+                index = ids[key] = len(names)
+                names.append(key)
+                lines.append(f"{namespace}\t{index}\t{json.dumps(key)}\n")
+            assigned.append(index)
+        if lines and self.path:
+            if self._log is None:
+                self._log = open(self.path, 'a', encoding='utf-8')
+                if self._log.tell() and not _ends_with_newline(self.path):
+                    lines.insert(0, '\n')
+            self._log.write(''.join(lines))
+            self._log.flush()
+            # Everything before this append has been applied (shared registries catch up under the lock first)
+            self._offset = self._log.tell()
+            self._lines += len(lines)
+        return assigned
+
+    @contextmanager
+    def _file_lock(self, mode: int):
+        """flock on the log, so only one process appends (and nobody reads a half-written line)"""
+        with open(self.path, 'a') as handle:
+            fcntl.flock(handle, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _rebuild(self, error: ValueError):
+        """Start over from an empty registry when the log does not replay (e.g. two unlocked writers)"""
+        self.rebuilt = True
+        if fcntl is None:
+            self._set_aside(error)
+            return
+        with self._file_lock(fcntl.LOCK_EX):
+            # Workers starting together all fail the replay; the first sets the log aside, the rest
+            # read the fresh log it left (possibly empty, possibly with new ids already)
+            self._reset()
+            try:
+                self._replay(self.path)
+            except ValueError as e:
+                self._set_aside(e)
+
+    def _set_aside(self, error: ValueError):
+        corrupt = f"{self.path}.corrupt"
+        print(f"Id registry log {self.path} is inconsistent ({error}); moving it to {corrupt} and starting a new registry")
+        self._reset()
+        os.replace(self.path, corrupt)
+
+    def _reset(self):
+        self.ids = {namespace: {} for namespace in NAMESPACES}
+        self.keys = {namespace: [] for namespace in NAMESPACES}
+        self.couples = {}
+        self._offset = self._lines = 0
+
+    def _catch_up(self):
+        """Apply lines other processes appended since this one last read the log"""
+        if os.path.getsize(self.path) > self._offset:
+            self._replay(self.path)
+
+    def _replay(self, path: str):
+        with open(path, 'rb') as f:
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # A partial last line: a write cut short by a crash; a later append starts a new line
+                    print(f"Skipping unreadable id registry line {path}:{self._lines + 1}")
+                    break
+                self._offset += len(raw)
+                self._lines += 1
+                try:
+                    namespace, index, key = raw.decode('utf-8').rstrip('\n').split('\t', 2)
+                    # Keys without escapes (nearly all of them) are just the quoted string
+                    if len(key) >= 2 and key[0] == key[-1] == '"' and '\\' not in key and '"' not in key[1:-1]:
+                        index, key = int(index), key[1:-1]
+                    else:
+                        index, key = int(index), json.loads(key)
+                except ValueError:
+                    print(f"Skipping unreadable id registry line {path}:{self._lines}")
+                    continue
+                names = self.keys.setdefault(namespace, [])
+                self.ids.setdefault(namespace, {})
+                if index != len(names):
+                    raise ValueError(f"{path}:{self._lines}: expected id {len(names)} for {namespace}, found {index}")
+                self.ids[namespace][key] = index
+                names.append(key)
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
@@ -2,6 +2,7 @@ import json
 from datetime import datetime
 from typing import Dict, List, Any
 import random
+from .metrics import timed
 
 class LearningEngine:
     def __init__(self):
@@ -74,6 +75,7 @@ class LearningEngine:
             ]
         }
     
+    @timed('LearningEngine.learn_from_interaction')
     def learn_from_interaction(self, user_id: str, interaction_data: Dict[str, Any]):
         """Learn from user interactions to improve question generation"""
         if user_id not in self.user_preferences:
@@ -147,6 +149,7 @@ class LearningEngine:
             return 'medium'
         return 'light'
     
+    @timed('LearningEngine.get_adaptive_questions')
     def get_adaptive_questions(self, user_id: str, count: int = 5) -> List[Dict[str, Any]]:
         """Get multiple adaptive questions"""
         questions = []
@@ -0,0 +1,158 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'sentiment_lexicon.tsv')
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*|[.,!?;:]")
+# Clause boundaries; negation and boosters do not carry across them
+SEPARATORS = frozenset('.,!?;:')
+# Negated valence is flipped and damped ("not happy" is milder than "sad")
+NEGATION_SCALAR = -0.74
+# Tokens after a negator within which the next term is negated
+NEGATION_WINDOW = 3
+# Marks a trie node that ends a phrase; never a token
+_ENTRY = ''
+
+class LexiconEntry:
+    __slots__ = ('kind', 'value', 'emotions')
+
+    def __init__(self, kind: str, value: float, emotions: Tuple[str, ...] = ()):
+        self.kind = kind
+        self.value = value
+        self.emotions = emotions
+
+class LexiconScore:
+    """Result of one pass over a text"""
+    __slots__ = ('positive', 'negative', 'positive_hits', 'negative_hits', 'word_count', 'emotions')
+
+    def __init__(self):
+        self.positive = 0.0
+        self.negative = 0.0
+        self.positive_hits = 0
+        self.negative_hits = 0
+        self.word_count = 0
+        self.emotions: Dict[str, int] = {}
+
+    @property
+    def hits(self) -> int:
+        return self.positive_hits + self.negative_hits
+
+class CompiledLexicon:
+    """Sentiment lexicon compiled into a token trie, scored in one left-to-right pass
+
+    Entries are single words or multi-word phrases (longest match wins), negators that flip
+    the next term within a few words, and boosters/dampeners that scale the next term. The trie is built
+    once and only read afterwards, so one instance is shared by every sentiment path.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, float, Tuple[str, ...]]]):
+        self.root: Dict[str, dict] = {}
+        self.size = 0
+        self.max_phrase_tokens = 0
+        emotions = set()
+        for kind, phrase, value, entry_emotions in entries:
+            tokens = TOKEN_PATTERN.findall(phrase.lower())
+            if not tokens:
+                continue
+            node = self.root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_ENTRY] = LexiconEntry(kind, float(value), tuple(entry_emotions))
+            self.size += 1
+            self.max_phrase_tokens = max(self.max_phrase_tokens, len(tokens))
+            emotions.update(entry_emotions)
+        self.emotion_names = tuple(sorted(emotions))
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledLexicon':
+        """Read a lexicon file: kind<TAB>phrase<TAB>value<TAB>emotions per line, '#' comments"""
+        return cls(_read_entries(path))
+
+    def score(self, text: str) -> LexiconScore:
+        result = LexiconScore()
+        if not text:
+            return result
+
+        tokens = TOKEN_PATTERN.findall(text.lower().replace('’', "'"))
+        root = self.root
+        count = len(tokens)
+        negate_left = 0
+        boost = 0.0
+        index = 0
+        while index < count:
+            token = tokens[index]
+            if token in SEPARATORS:
+                negate_left = 0
+                boost = 0.0
+                index += 1
+                continue
+
+            node = root.get(token)
+            entry = None
+            if node is not None:
+                # Longest phrase starting here
+                entry = node.get(_ENTRY)
+                end = position = index + 1
+                while position < count:
+                    node = node.get(tokens[position])
+                    if node is None:
+                        break
+                    position += 1
+                    if _ENTRY in node:
+                        entry = node[_ENTRY]
+                        end = position
+
+            if entry is None:
+                result.word_count += 1
+                if negate_left:
+                    negate_left -= 1
+                index += 1
+                continue
+
+            result.word_count += end - index
+            index = end
+            if entry.kind == 'negator':
+                negate_left = NEGATION_WINDOW
+                continue
+            if entry.kind == 'booster':
+                boost += entry.value
+                continue
+
+            valence = entry.value * max(0.0, 1.0 + boost)
+            boost = 0.0
+            negated = negate_left > 0
+            if negated:
+                valence *= NEGATION_SCALAR
+                negate_left = 0
+            if valence > 0:
+                result.positive += valence
+                result.positive_hits += 1
+            elif valence < 0:
+                result.negative -= valence
+                result.negative_hits += 1
+            if not negated:
+                for emotion in entry.emotions:
+                    result.emotions[emotion] = result.emotions.get(emotion, 0) + 1
+        return result
+
+def _read_entries(path: str) -> List[Tuple[str, str, float, Tuple[str, ...]]]:
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 2 or fields[0] not in ('term', 'negator', 'booster'):
+                raise ValueError(f"{path}:{line_number}: expected kind<TAB>phrase[<TAB>value[<TAB>emotions]]")
+            value = float(fields[2]) if len(fields) > 2 and fields[2] else 0.0
+            emotions = tuple(e.strip() for e in fields[3].split(',') if e.strip()) if len(fields) > 3 else ()
+            entries.append((fields[0], fields[1], value, emotions))
+    return entries
+
+@lru_cache(maxsize=None)
+def load_lexicon(path: Optional[str] = None) -> CompiledLexicon:
+    """The shared compiled lexicon (SENTIMENT_LEXICON_PATH, or the bundled file); built once per process"""
+    return CompiledLexicon.load(path or os.environ.get('SENTIMENT_LEXICON_PATH') or DEFAULT_LEXICON_PATH)
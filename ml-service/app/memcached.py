@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from fastapi.encoders import jsonable_encoder
+
+# memcached reads an expiry above 30 days as an absolute unix time
+MAX_RELATIVE_TTL = 30 * 24 * 3600
+MAX_KEY_LENGTH = 250
+
+# Keys agreed with the Node backend; couple is "<min id>_<max id>", day is YYYY-MM-DD (UTC)
+def daily_key(couple_key: str, day: date) -> str:
+    return f"ml:daily:{couple_key}:{day.isoformat()}"
+
+def games_key(couple_key: str, day: date) -> str:
+    return f"ml:games:{couple_key}:{day.isoformat()}"
+
+def compatibility_key(couple_key: str) -> str:
+    return f"ml:compatibility:{couple_key}"
+
+def valid_key(key: bytes) -> bool:
+    """Text-protocol keys: at most 250 bytes, no spaces or control characters"""
+    return 0 < len(key) <= MAX_KEY_LENGTH and all(byte > 32 and byte != 127 for byte in key)
+
+def seconds_until_end_of(day: date) -> int:
+    """TTL for a per-day entry: it expires when the day (UTC) is over"""
+    remaining = (datetime.combine(day + timedelta(days=1), datetime.min.time()) - datetime.utcnow()).total_seconds()
+    return max(1, min(int(remaining), MAX_RELATIVE_TTL))
+
+class MemcachedError(Exception):
+    pass
+
+class MemcachedPool:
+    """Up to `size` pooled text-protocol connections to one memcached server
+
+    Connections are opened on first use and reused; one that fails mid-command is closed
+    instead of going back to the pool, since its replies can no longer be matched to commands.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 4, timeout: float = 3.0):
+        self.host = host
+        self.port = port
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections_opened = 0
+
+    def _bind_loop(self):
+        # Streams belong to the loop that opened them (the CLI and benchmarks call asyncio.run more than once)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.size)
+
+    async def _execute(self, payload: bytes, read_reply) -> Any:
+        self._bind_loop()
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+                    self.connections_opened += 1
+                reader, writer = connection
+                writer.write(payload)
+                result = await asyncio.wait_for(self._drain_and_read(writer, reader, read_reply), self.timeout)
+            except BaseException:
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+            return result
+
+    @staticmethod
+    async def _drain_and_read(writer: asyncio.StreamWriter, reader: asyncio.StreamReader, read_reply) -> Any:
+        await writer.drain()
+        return await read_reply(reader)
+
+    async def set_many(self, items: Sequence[Tuple[bytes, bytes, int]]) -> int:
+        """Pipeline `set` for every (key, value, ttl) in one write and read the replies; returns how many were stored"""
+        payload = b''.join(b'set %s 0 %d %d\r\n%s\r\n' % (key, ttl, len(value), value) for key, value, ttl in items)
+
+        async def read_reply(reader: asyncio.StreamReader) -> int:
+            stored = 0
+            for _ in items:
+                line = await reader.readline()
+                if line == b'STORED\r\n':
+                    stored += 1
+                elif not line or line.startswith((b'ERROR', b'CLIENT_ERROR', b'SERVER_ERROR')):
+                    raise MemcachedError(line.decode('utf-8', 'replace').strip() or 'connection closed')
+            return stored
+
+        return await self._execute(payload, read_reply)
+
+    async def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, bytes]:
+        """Values for the keys that are present, from one multi-key `get`"""
+
+        async def read_reply(reader: asyncio.StreamReader) -> Dict[bytes, bytes]:
+            values = {}
+            while True:
+                line = await reader.readline()
+                if line == b'END\r\n':
+                    return values
+                if not line.startswith(b'VALUE '):
+                    raise MemcachedError(line.decode('utf-8', 'replace').strip() or 'connection closed')
+                _, key, _, length = line.split()[:4]
+                values[key] = (await reader.readexactly(int(length) + 2))[:-2]
+
+        return await self._execute(b'get ' + b' '.join(keys) + b'\r\n', read_reply)
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+class MemcachedPublisher:
+    """Writes precomputed ML results into the backend's memcached so its reads skip this service
+
+    Values are JSON stored with flags 0, which the backend's client returns as a string for
+    JSON.parse. Items are sent in pipelined batches of `batch_size` sets, spread over the pool's
+    connections. Without MEMCACHED_URL the publisher is disabled and every call is a no-op.
+    """
+
+    def __init__(self, url: Optional[str] = None, pool_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 compatibility_ttl: Optional[int] = None, timeout: Optional[float] = None):
+        url = url if url is not None else os.environ.get('MEMCACHED_URL', '')
+        servers = [server.strip() for server in url.split(',') if server.strip()]
+        if len(servers) > 1:
+            # Keys would have to be placed on the same server as the backend's client hashes them to
+            print(f"MEMCACHED_URL lists {len(servers)} servers; publishing to {servers[0]} only")
+        self.server = servers[0] if servers else None
+        self.batch_size = batch_size if batch_size is not None else int(os.environ.get('MEMCACHED_BATCH_SIZE', 500))
+        self.compatibility_ttl = compatibility_ttl if compatibility_ttl is not None \
+            else int(os.environ.get('MEMCACHED_TTL_COMPATIBILITY', 6 * 3600))
+        self.pool: Optional[MemcachedPool] = None
+        if self.server:
+            host, _, port = self.server.rpartition(':') if ':' in self.server else (self.server, '', '11211')
+            self.pool = MemcachedPool(
+                host, int(port),
+                size=pool_size if pool_size is not None else int(os.environ.get('MEMCACHED_POOL_SIZE', 4)),
+                timeout=timeout if timeout is not None else float(os.environ.get('MEMCACHED_TIMEOUT_MS', 3000)) / 1000
+            )
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.published = 0
+        self.failed = 0
+        self.skipped = 0
+        # Values json could not encode (not stored)
+        self.unencodable = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    async def publish(self, items: Sequence[Tuple[str, Any, int]]) -> int:
+        """Store (key, JSON-serializable value, ttl seconds) items; returns how many were stored"""
+        if not self.enabled or not items:
+            return 0
+        encoded = []
+        for key, value, ttl in items:
+            key_bytes = key.encode('utf-8')
+            if not valid_key(key_bytes):
+                self.skipped += 1
+                continue
+            try:
+                value_bytes = json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+            except (TypeError, ValueError) as e:
+                # The backend JSON.parses every value; storing a repr in its place would only fail there
+                self.unencodable += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Error encoding {key} for memcached: {self.last_error}")
+                continue
+            encoded.append((key_bytes, value_bytes, min(int(ttl), MAX_RELATIVE_TTL)))
+
+        batches = [encoded[start:start + self.batch_size] for start in range(0, len(encoded), self.batch_size)]
+        results = await asyncio.gather(*[self.pool.set_many(batch) for batch in batches], return_exceptions=True)
+        stored = 0
+        for batch, result in zip(batches, results):
+            self.batches += 1
+            if isinstance(result, BaseException):
+                self.failed += len(batch)
+                self.last_error = f"{type(result).__name__}: {result}"
+                print(f"Error publishing to memcached: {self.last_error}")
+            else:
+                stored += result
+                self.failed += len(batch) - result
+        self.published += stored
+        return stored
+
+    def publish_later(self, items: Sequence[Tuple[str, Any, int]]):
+        """publish() without making the caller wait for memcached (request handlers)"""
+        if not self.enabled or not items:
+            return
+        task = asyncio.get_running_loop().create_task(self.publish(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def daily_items(rows: Sequence[Dict[str, Any]]) -> List[Tuple[str, Any, int]]:
+        """Items for planned daily picks: the whole pick, and the games on their own, until the day is over"""
+        items = []
+        for row in rows:
+            ttl = seconds_until_end_of(row['day'])
+            items.append((daily_key(row['couple_key'], row['day']),
+                          {'question': row['question'], 'tip': row['tip'], 'games': row['games']}, ttl))
+            items.append((games_key(row['couple_key'], row['day']), row['games'], ttl))
+        return items
+
+    async def publish_daily(self, rows: Sequence[Dict[str, Any]]) -> int:
+        return await self.publish(self.daily_items(rows))
+
+    def publish_compatibility(self, user_id: str, partner_id: str, result: Any):
+        """Publish a compatibility result (the route's response model or a dict) as the JSON object it serves"""
+        couple_key = f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
+        self.publish_later([(compatibility_key(couple_key), jsonable_encoder(result), self.compatibility_ttl)])
+
+    async def drain(self):
+        """Finish background publishes and close the pool; called on shutdown"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        if self.pool is not None:
+            await self.pool.close()
+
+    def metric_families(self):
+        """Publish counters for the /metrics endpoint"""
+        yield 'ml_memcached_published_total', 'counter', 'Results stored in memcached', [({}, self.published)]
+        yield 'ml_memcached_failed_total', 'counter', 'Results memcached did not store', [({}, self.failed)]
+        yield 'ml_memcached_batches_total', 'counter', 'Pipelined set batches sent', [({}, self.batches)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'server': self.server,
+            'published': self.published,
+            'failed': self.failed,
+            'skipped_keys': self.skipped,
+            'unencodable_values': self.unencodable,
+            'batches': self.batches,
+            'batch_size': self.batch_size,
+            'connections_opened': self.pool.connections_opened if self.pool else 0,
+            'in_progress': len(self._tasks),
+            'last_error': self.last_error
+        }
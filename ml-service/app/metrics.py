@@ -0,0 +1,187 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, tuned for sub-millisecond engine calls up to slow requests
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect plus three increments"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Prometheus-style cumulative bucket counts, ending with +Inf"""
+        total = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets.append((repr(bound), total))
+        buckets.append(('+Inf', total + self.counts[-1]))
+        return buckets
+
+class MetricsRegistry:
+    def __init__(self):
+        self.route_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.route_status: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.engine_latency: Dict[str, Histogram] = {}
+        self.engine_errors: Dict[str, int] = {}
+        self.collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route)
+        histogram = self.route_latency.get(key)
+        if histogram is None:
+            histogram = self.route_latency.setdefault(key, Histogram())
+        histogram.observe(seconds)
+        status_key = (method, route, status)
+        with self._lock:
+            self.route_status[status_key] = self.route_status.get(status_key, 0) + 1
+
+    def observe_engine(self, name: str, seconds: float, failed: bool = False):
+        histogram = self.engine_latency.get(name)
+        if histogram is None:
+            histogram = self.engine_latency.setdefault(name, Histogram())
+        histogram.observe(seconds)
+        if failed:
+            with self._lock:
+                self.engine_errors[name] = self.engine_errors.get(name, 0) + 1
+
+    def timed(self, name: str) -> Callable:
+        """Decorator recording call latency (and failures) for an engine method"""
+        def decorator(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    self.observe_engine(name, time.perf_counter() - started, failed)
+            return wrapper
+        return decorator
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Register a callback contributing extra families (pool queues, cache hits) at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Render everything in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        lines.append('# HELP ml_http_request_duration_seconds Request latency by route')
+        lines.append('# TYPE ml_http_request_duration_seconds histogram')
+        for (method, route), histogram in sorted(self.route_latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            _render_histogram(lines, 'ml_http_request_duration_seconds', labels, histogram)
+
+        lines.append('# HELP ml_http_requests_total Requests by route and status code')
+        lines.append('# TYPE ml_http_requests_total counter')
+        for (method, route, status), count in sorted(self.route_status.items()):
+            lines.append(f'ml_http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        lines.append('# HELP ml_http_requests_in_flight Requests currently being handled')
+        lines.append('# TYPE ml_http_requests_in_flight gauge')
+        for route, count in sorted(self.in_flight.items()):
+            lines.append(f'ml_http_requests_in_flight{{route="{_escape(route)}"}} {count}')
+
+        lines.append('# HELP ml_engine_call_duration_seconds Engine method latency')
+        lines.append('# TYPE ml_engine_call_duration_seconds histogram')
+        for name, histogram in sorted(self.engine_latency.items()):
+            _render_histogram(lines, 'ml_engine_call_duration_seconds', f'engine="{name}"', histogram)
+
+        lines.append('# HELP ml_engine_call_errors_total Engine method calls that raised')
+        lines.append('# TYPE ml_engine_call_errors_total counter')
+        for name, count in sorted(self.engine_errors.items()):
+            lines.append(f'ml_engine_call_errors_total{{engine="{name}"}} {count}')
+
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    label_text = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _render_histogram(lines: List[str], name: str, labels: str, histogram: Histogram):
+    for bound, count in histogram.cumulative():
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status codes and in-flight counts"""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+        self.known_paths: Optional[set] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        if self.known_paths is None:
+            # Static route paths; anything else is grouped to keep label cardinality bounded
+            self.known_paths = {route.path for route in scope['app'].routes if '{' not in route.path}
+
+        path = scope['path']
+        in_flight_route = path if path in self.known_paths else 'other'
+        registry = self.registry
+        registry.in_flight[in_flight_route] = registry.in_flight.get(in_flight_route, 0) + 1
+
+        status_holder = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status_holder[0] = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight[in_flight_route] -= 1
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or in_flight_route
+            registry.observe_request(scope['method'], route_path, status_holder[0], elapsed)
+
+# Process-wide registry shared by the middleware, engine decorators and /metrics
+metrics = MetricsRegistry()
+timed = metrics.timed
@@ -6,6 +6,9 @@ class CompatibilityRequest(BaseModel):
     user1_answers: Dict[str, Any]
     user2_answers: Dict[str, Any]
     question_weights: Optional[Dict[str, float]] = None
+    # When both are given the result is also published to memcached for the couple
+    user_id: Optional[str] = None
+    partner_id: Optional[str] = None
 
 class CompatibilityResponse(BaseModel):
     compatibility_score: float
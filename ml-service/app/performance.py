@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import FromClause
+from .database import performance_source
+
+# Aggregations over UserPerformance that run in the database, so callers fetch a handful of
+# grouped rows instead of a user's full game history. Every query filters on user_id first
+# (and created_at when a window is given) to stay on the (user_id, created_at) / (user_id,
+# category) indexes and, on Postgres, to prune monthly partitions.
+
+def _user_filter(source: FromClause, user_id: str, since: Optional[datetime], until: Optional[datetime]) -> List:
+    conditions = [source.c.user_id == user_id]
+    if since is not None:
+        conditions.append(source.c.created_at >= since)
+    if until is not None:
+        conditions.append(source.c.created_at < until)
+    return conditions
+
+def _day(session: AsyncSession, column):
+    if session.bind.dialect.name == 'postgresql':
+        return func.date_trunc('day', column)
+    return func.date(column)
+
+async def performance_summary(session: AsyncSession, user_id: str, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None) -> Dict[str, Any]:
+    """Games played, average score and average engagement"""
+    source = await performance_source(session, since, until)
+    row = (await session.execute(
+        select(
+            func.count().label('games_played'),
+            func.avg(source.c.score).label('avg_score'),
+            func.avg(source.c.engagement_score).label('avg_engagement'),
+            func.max(source.c.created_at).label('last_played')
+        ).where(*_user_filter(source, user_id, since, until))
+    )).one()
+    return {
+        'games_played': row.games_played,
+        'avg_score': float(row.avg_score or 0.0),
+        'avg_engagement': float(row.avg_engagement or 0.0),
+        'last_played': row.last_played
+    }
+
+async def score_by_difficulty(session: AsyncSession, user_id: str, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+    """Average score and games played per difficulty"""
+    source = await performance_source(session, since, until)
+    result = await session.execute(
+        select(
+            source.c.difficulty,
+            func.avg(source.c.score).label('avg_score'),
+            func.count().label('games_played')
+        )
+        .where(*_user_filter(source, user_id, since, until), source.c.difficulty.is_not(None))
+        .group_by(source.c.difficulty)
+    )
+    return {
+        row.difficulty: {'avg_score': float(row.avg_score or 0.0), 'games_played': row.games_played}
+        for row in result
+    }
+
+async def category_counts(session: AsyncSession, user_id: str, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> Dict[str, int]:
+    """Games played per category"""
+    source = await performance_source(session, since, until)
+    result = await session.execute(
+        select(source.c.category, func.count().label('games_played'))
+        .where(*_user_filter(source, user_id, since, until), source.c.category.is_not(None))
+        .group_by(source.c.category)
+    )
+    return {row.category: row.games_played for row in result}
+
+async def engagement_trend(session: AsyncSession, user_id: str, window_days: int = 7,
+                           since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Daily average engagement with a rolling average over the previous window_days active days"""
+    source = await performance_source(session, since, until)
+    day = _day(session, source.c.created_at)
+    daily = (
+        select(
+            day.label('day'),
+            func.avg(source.c.engagement_score).label('engagement'),
+            func.count().label('games_played')
+        )
+        .where(*_user_filter(source, user_id, since, until))
+        .group_by(day)
+        .subquery()
+    )
+    result = await session.execute(
+        select(
+            daily.c.day,
+            daily.c.engagement,
+            daily.c.games_played,
+            func.avg(daily.c.engagement).over(order_by=daily.c.day, rows=(-(window_days - 1), 0)).label('rolling')
+        ).order_by(daily.c.day)
+    )
+    return [
+        {
+            'day': str(row.day)[:10],
+            'engagement': float(row.engagement or 0.0),
+            'rolling_engagement': float(row.rolling or 0.0),
+            'games_played': row.games_played
+        }
+        for row in result
+    ]
+
+async def recent_engagement(session: AsyncSession, user_id: str, limit: int = 5) -> List[float]:
+    """Engagement scores of the latest games, oldest first"""
+    source = await performance_source(session)
+    result = await session.execute(
+        select(source.c.engagement_score)
+        .where(source.c.user_id == user_id, source.c.engagement_score.is_not(None))
+        .order_by(source.c.created_at.desc())
+        .limit(limit)
+    )
+    return [float(value) for value in reversed(result.scalars().all())]
+
+async def learning_aggregates(session: AsyncSession, user_id: str, since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Everything AdaptiveLearningEngine.insights_from_aggregates needs, in four small queries"""
+    summary = await performance_summary(session, user_id, since)
+    if not summary['games_played']:
+        return {'games_played': 0}
+    return {
+        **summary,
+        'difficulty_performance': await score_by_difficulty(session, user_id, since),
+        'category_counts': await category_counts(session, user_id, since),
+        'recent_engagement': await recent_engagement(session, user_id)
+    }
@@ -0,0 +1,129 @@
+"""Preload mode: build engine state once, then fork uvicorn workers that share it
+
+    python -m app.preload --workers 4 --port 7860
+
+`uvicorn --workers N` starts each worker from scratch, so every process imports the ML stack
+and builds its own question banks, templates, lexicon and models. Here a master process
+imports the app, runs its preload_engines() hook (read-only indexes, lexicon, snapshot
+restore, model training, shared-memory state), moves everything allocated so far out of the
+garbage collector with gc.freeze() and only then forks. Workers inherit those pages
+copy-on-write, and since the collector never touches frozen objects their reference counts
+are the only writes that unshare a page. Workers accept on one socket bound by the master,
+and a worker that dies is replaced.
+"""
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+class PreloadMaster:
+    def __init__(self, app_path: str, workers: int, host: str, port: int, log_level: str = 'info'):
+        module_name, _, attribute = app_path.partition(':')
+        self.module_name = module_name
+        self.attribute = attribute or 'app'
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.log_level = log_level
+        self.module = None
+        self.socket: Optional[socket.socket] = None
+        # pid -> worker number
+        self.children: Dict[int, int] = {}
+        self.stopping = False
+
+    def preload(self):
+        """Import the app and build its state, then freeze it out of the GC"""
+        started = time.perf_counter()
+        self.module = importlib.import_module(self.module_name)
+        hook = getattr(self.module, 'preload_engines', None)
+        if hook is not None:
+            hook()
+        gc.collect()
+        gc.freeze()
+        print(f"Preloaded {self.module_name} in {time.perf_counter() - started:.2f}s "
+              f"({gc.get_freeze_count()} objects frozen)")
+
+    def bind(self):
+        self.socket = socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+    def spawn(self, worker: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = worker
+            return
+        # Worker: uvicorn installs its own SIGTERM/SIGINT handling
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            hook = getattr(self.module, 'preload_worker_started', None)
+            if hook is not None:
+                hook(worker)
+            config = uvicorn.Config(getattr(self.module, self.attribute), log_level=self.log_level)
+            uvicorn.Server(config).run(sockets=[self.socket])
+        except BaseException as e:
+            print(f"Worker {worker} failed: {e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        self.preload()
+        self.bind()
+        for worker in range(self.workers):
+            self.spawn(worker)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Serving on {self.host}:{self.port} with {self.workers} preloaded workers (master pid {os.getpid()})")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker = self.children.pop(pid, None)
+            if worker is not None and not self.stopping:
+                print(f"Worker {worker} (pid {pid}) exited with status {status}; restarting it")
+                # A worker that fails on startup would otherwise be respawned in a tight loop
+                time.sleep(1)
+                self.spawn(worker)
+
+        self.socket.close()
+        hook = getattr(self.module, 'preload_finished', None)
+        if hook is not None:
+            hook()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app from a preloaded master that forks its workers')
+    parser.add_argument('app', nargs='?', default='main:app', help='module:attribute of the ASGI app')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 4)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 7860)))
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+    PreloadMaster(args.app, args.workers, args.host, args.port, args.log_level).run()
+
+if __name__ == '__main__':
+    main()
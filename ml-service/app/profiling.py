@@ -0,0 +1,194 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN_ENV = 'ML_ADMIN_TOKEN'
+PROFILE_HEADER = 'x-profile'
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """FastAPI dependency guarding profiling endpoints; they stay disabled until ML_ADMIN_TOKEN is set"""
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def sample_stacks(seconds: float, interval: float = 0.005, max_depth: int = 64) -> str:
+    """Statistical stack sampler over every thread except this one
+
+    Returns collapsed stacks ("outer;inner count" per line), ready for flamegraph.pl or speedscope.
+    """
+    own_thread = threading.get_ident()
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            labels = []
+            while frame is not None and len(labels) < max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(thread_names.get(thread_id, str(thread_id)))
+            stacks[';'.join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common()) + '\n'
+
+class ProfileStore:
+    """Keeps the most recent per-request cProfile reports"""
+
+    def __init__(self, max_reports: int = 20):
+        self.max_reports = max_reports
+        self.reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # cProfile hooks the interpreter globally, so only one request is profiled at a time
+        self.active = threading.Lock()
+
+    def add(self, profile_id: str, method: str, path: str, profiler: cProfile.Profile, elapsed: float):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(40)
+
+        self.reports[profile_id] = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'created_at': time.time(),
+            'stats': output.getvalue()
+        }
+        while len(self.reports) > self.max_reports:
+            self.reports.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self.reports.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [{key: value for key, value in report.items() if key != 'stats'}
+                for report in reversed(self.reports.values())]
+
+class ProfilingMiddleware:
+    """Wraps a single request in cProfile when it carries `X-Profile: 1` and a valid admin token
+
+    The report id comes back in the X-Profile-Id header. Other coroutines that run on the
+    event loop while the request is suspended are included in its profile.
+    """
+
+    def __init__(self, app, store: Optional['ProfileStore'] = None):
+        self.app = app
+        self.store = store or profile_store
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.store.active.acquire(blocking=False):
+            await self.app(scope, receive, self._with_header(send, b'x-profile-skipped', b'busy'))
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, self._with_header(send, b'x-profile-id', profile_id.encode()))
+            finally:
+                profiler.disable()
+            self.store.add(profile_id, scope['method'], scope['path'], profiler, time.perf_counter() - started)
+        finally:
+            self.store.active.release()
+
+    @staticmethod
+    def _wants_profile(scope) -> bool:
+        expected = os.environ.get(ADMIN_TOKEN_ENV)
+        if not expected:
+            return False
+        headers = dict(scope['headers'])
+        token = headers.get(b'x-admin-token', b'').decode('latin-1')
+        return headers.get(PROFILE_HEADER.encode()) == b'1' and hmac.compare_digest(token, expected)
+
+    @staticmethod
+    def _with_header(send, name: bytes, value: bytes):
+        async def send_with_header(message):
+            if message['type'] == 'http.response.start':
+                message = dict(message)
+                message['headers'] = list(message.get('headers', [])) + [(name, value)]
+            await send(message)
+        return send_with_header
+
+class MemoryTracker:
+    """tracemalloc snapshots diffed against a baseline, to find growth in engine state"""
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_taken_at: Optional[float] = None
+
+    def take_baseline(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.baseline = self._snapshot()
+        self.baseline_taken_at = time.time()
+        current, peak = tracemalloc.get_traced_memory()
+        return {'tracing': True, 'traced_bytes': current, 'peak_bytes': peak, 'taken_at': self.baseline_taken_at}
+
+    def diff(self, limit: int = 25, group_by: str = 'lineno', engines_only: bool = False) -> Dict[str, Any]:
+        """Top allocation growth since the baseline; engines_only keeps frames in app/"""
+        if self.baseline is None:
+            raise ValueError("No baseline snapshot; take one first")
+
+        current = self._snapshot()
+        baseline = self.baseline
+        if engines_only:
+            engine_filter = [tracemalloc.Filter(True, os.path.join(os.path.dirname(__file__), '*'))]
+            current = current.filter_traces(engine_filter)
+            baseline = baseline.filter_traces(engine_filter)
+
+        differences = current.compare_to(baseline, group_by)
+        return {
+            'baseline_taken_at': self.baseline_taken_at,
+            'total_growth_bytes': sum(stat.size_diff for stat in differences),
+            'top': [
+                {
+                    'location': str(stat.traceback[0]) if group_by != 'traceback' else stat.traceback.format(),
+                    'size_diff_bytes': stat.size_diff,
+                    'size_bytes': stat.size,
+                    'count_diff': stat.count_diff
+                }
+                for stat in differences[:limit]
+            ]
+        }
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.baseline_taken_at = None
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ])
+
+profile_store = ProfileStore()
+memory_tracker = MemoryTracker()
@@ -1,10 +1,13 @@
 import random
-from typing import Dict, List, Any
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import zlib
+from typing import Dict, Hashable, List, Any, Tuple
 import numpy as np
+from .follow_ups import FollowUpEngine
+from .metrics import timed
 
 class QuestionGenerator:
+    STATE_VERSION = 1
+
     def __init__(self):
         self.question_templates = {
             'communication': [
@@ -65,7 +68,18 @@ class QuestionGenerator:
         }
         
         self.used_combinations = set()
+        # Keyphrase cache and per-couple seen follow-ups
+        self.follow_ups = FollowUpEngine()
+    
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        arrays, follow_ups = self.follow_ups.export_state()
+        return arrays, {'used_combinations': list(self.used_combinations), 'follow_ups': follow_ups}
+
+    def restore_state(self, arrays: Dict[str, Any], meta: Dict[str, Any]):
+        self.follow_ups.restore_state(arrays, meta['follow_ups'])
+        self.used_combinations = set(meta['used_combinations'])
     
+    @timed('QuestionGenerator.generate_questions')
     def generate_questions(self, user_profile: Dict, partner_profile: Dict, count: int = 5) -> List[Dict]:
         """Generate new questions based on user profiles"""
         questions = []
@@ -107,8 +121,8 @@ class QuestionGenerator:
             template = random.choice(templates)
             question_text = self._fill_template(template, user_profile, partner_profile)
             
-            # Check if this combination was used recently
-            combination_key = f"{category}_{template}_{hash(question_text)}"
+            # Check if this combination was used recently (crc32, unlike hash(), is the same in every process)
+            combination_key = f"{category}_{template}_{zlib.crc32(question_text.encode('utf-8'))}"
             if combination_key not in self.used_combinations:
                 self.used_combinations.add(combination_key)
                 
@@ -185,53 +199,18 @@ class QuestionGenerator:
         else:
             return 'medium'
     
-    def generate_follow_up_questions(self, previous_answers: List[Dict], count: int = 3) -> List[Dict]:
-        """Generate follow-up questions based on previous answers"""
-        follow_ups = []
-        
-        for i, answer_data in enumerate(previous_answers[-count:]):
-            if 'answer' in answer_data and 'question' in answer_data:
-                follow_up = self._create_follow_up(answer_data['question'], answer_data['answer'])
-                if follow_up:
-                    follow_ups.append(follow_up)
-        
-        return follow_ups
-    
-    def _create_follow_up(self, original_question: Dict, answer: str) -> Dict:
-        """Create a follow-up question based on the original question and answer"""
-        category = original_question.get('category', 'general')
-        
-        follow_up_templates = {
-            'communication': [
-                f"You mentioned '{answer[:30]}...' - can you tell me more about why that's important?",
-                f"How would you help your partner understand your perspective on '{answer[:20]}...'?",
-                f"What would you want me to know about your feelings regarding '{answer[:25]}...'?"
-            ],
-            'intimacy': [
-                f"When you think about '{answer[:30]}...', what emotions come up?",
-                f"How can we create more moments like what you described: '{answer[:25]}...'?",
-                f"What would make the experience you mentioned even more meaningful?"
-            ],
-            'fun': [
-                f"What excites you most about '{answer[:30]}...'?",
-                f"How could we make '{answer[:25]}...' even more enjoyable together?",
-                f"What other activities give you the same feeling as '{answer[:20]}...'?"
-            ]
-        }
-        
-        templates = follow_up_templates.get(category, follow_up_templates['communication'])
-        question_text = random.choice(templates)
-        
-        return {
-            'id': f"followup_{hash(question_text)}_{random.randint(100, 999)}",
-            'text': question_text,
-            'category': category,
-            'type': 'open_ended',
-            'difficulty': 'medium',
-            'generated': True,
-            'is_follow_up': True
-        }
+    @timed('QuestionGenerator.generate_follow_up_questions')
+    def generate_follow_up_questions(self, previous_answers: List[Dict], count: int = 3,
+                                     couple_id: Hashable = None, per_answer: int = 1) -> List[Dict]:
+        """Generate follow-up questions for the last `count` answers in one batch
+
+        Pass count=len(previous_answers) for a whole session; with couple_id, follow-ups the
+        couple has already been served are skipped.
+        """
+        return self.follow_ups.generate(previous_answers[-count:] if count > 0 else [],
+                                        couple_id=couple_id, per_answer=per_answer)
     
+    @timed('QuestionGenerator.generate_contextual_questions')
     def generate_contextual_questions(self, topics: List[str], sentiment: str, user_id: str, partner_id: str, count: int = 3) -> List[Dict]:
         """Generate questions based on conversation context"""
         contextual_templates = {
@@ -1,8 +1,14 @@
 import random
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple
+from .dedup_index import DuplicateIndex
 from .models import QuestionRecommendationResponse
+from .retrieval import QuestionRetriever
+from .metrics import timed
 
 class QuestionRecommender:
+    STATE_VERSION = 1
+
     def __init__(self):
         self.question_bank = {
             'communication': [
@@ -129,21 +135,43 @@ class QuestionRecommender:
             'established_couples': {'deep': 0.25, 'communication': 0.25, 'intimacy': 0.2, 'fun': 0.15, 'memories': 0.15},
             'struggling_couples': {'communication': 0.4, 'deep': 0.25, 'intimacy': 0.2, 'fun': 0.1, 'memories': 0.05}
         }
+        
+        # Near-duplicate clusters and content embeddings over the bank, rebuilt when the bank changes.
+        # Readers on the engine thread pool hold no lock, so a change builds new index objects and
+        # swaps them in; _index_lock only keeps two writers from doing that at once.
+        self.dedup_index = DuplicateIndex()
+        self.retriever = QuestionRetriever()
+        self._indexed_bank = None
+        self._index_lock = threading.Lock()
     
+    @timed('QuestionRecommender.recommend')
     def recommend(self, user_id: str, answered_questions: List[str], 
-                 preferences: Dict[str, Any] = None) -> QuestionRecommendationResponse:
+                 preferences: Dict[str, Any] = None, partner_id: str = None) -> QuestionRecommendationResponse:
         
         # Determine couple type based on answered questions and preferences
         couple_type = self._determine_couple_type(answered_questions, preferences or {})
         
+        # Filter out already answered questions and near-duplicates of them
+        answered = set(answered_questions)
+        index = self.duplicate_index()
+        excluded_clusters = index.clusters_for(answered)
+        
+        # Couples with engagement history get questions closest to what they enjoyed
+        couple_id = self._couple_id(user_id, partner_id)
+        if self.retriever.has_profile(couple_id):
+            recommended = self._retrieve(couple_id, answered, excluded_clusters, (preferences or {}).get('category'), count=5)
+            if recommended:
+                reasoning = self._generate_reasoning(couple_type, recommended)
+                reasoning.insert(0, "Picked to match the questions you've enjoyed together")
+                return QuestionRecommendationResponse(recommended_questions=recommended, reasoning=reasoning)
+        
         # Get category weights for this couple type
         weights = self.category_weights.get(couple_type, self.category_weights['established_couples'])
         
-        # Filter out already answered questions
         available_questions = []
         for category, questions in self.question_bank.items():
             for question in questions:
-                if question['id'] not in answered_questions:
+                if question['id'] not in answered and not index.is_excluded(question['id'], excluded_clusters):
                     available_questions.append(question)
         
         if not available_questions:
@@ -161,6 +189,82 @@ class QuestionRecommender:
             reasoning=reasoning
         )
     
+    @timed('QuestionRecommender.record_engagement')
+    def record_engagement(self, user_id: str, partner_id: str, question_ids: List[str], engagement_score: float = 1.0):
+        """Update the couple's content profile from questions they engaged with"""
+        self._sync_indexes()
+        self.retriever.record_engagement(self._couple_id(user_id, partner_id), question_ids, engagement_score)
+    
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Couple content profiles; the bank's indexes are rebuilt on first use"""
+        return self.retriever.export_state()
+
+    def restore_state(self, arrays: Dict[str, Any], meta: Dict[str, Any]):
+        self.retriever.restore_state(arrays, meta)
+    
+    @timed('QuestionRecommender.add_questions')
+    def add_questions(self, questions: List[Dict[str, Any]]) -> int:
+        """Add questions to the bank and both indexes incrementally, without a rebuild"""
+        self._sync_indexes()
+        with self._index_lock:
+            known = self.retriever.positions
+            new_questions = [q for q in questions if q.get('id') is not None and str(q['id']) not in known]
+            if not new_questions:
+                return 0
+            bank = {category: list(bank_questions) for category, bank_questions in self.question_bank.items()}
+            for question in new_questions:
+                bank.setdefault(question.get('category', 'general'), []).append(question)
+            dedup_index, retriever = self.dedup_index.copy(), self.retriever.copy()
+            dedup_index.add(new_questions)
+            retriever.add(new_questions)
+            self.question_bank, self.dedup_index, self.retriever = bank, dedup_index, retriever
+            self._indexed_bank = self._bank_signature()
+        return len(new_questions)
+    
+    def _retrieve(self, couple_id: str, answered: set, excluded_clusters: set, category: str, count: int) -> List[Dict]:
+        """Top questions for the couple's profile, at most one per near-duplicate cluster"""
+        index = self.dedup_index
+        selected, seen_clusters = [], set(excluded_clusters)
+        # Over-fetch so dropped siblings still leave enough candidates
+        for question, _ in self.retriever.recommend(couple_id, k=count * 4, exclude=answered, category=category):
+            cluster = index.cluster_of(str(question['id']))
+            if cluster in seen_clusters:
+                continue
+            if cluster is not None:
+                seen_clusters.add(cluster)
+            selected.append(question)
+            if len(selected) >= count:
+                break
+        return selected
+    
+    @staticmethod
+    def _couple_id(user_id: str, partner_id: str = None) -> str:
+        if not partner_id:
+            return user_id
+        return f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
+    
+    def _bank_signature(self):
+        return (id(self.question_bank), tuple((category, len(questions)) for category, questions in self.question_bank.items()))
+    
+    def _sync_indexes(self):
+        """Rebuild the dedup index and embeddings if the bank was replaced or resized outside add_questions"""
+        if self._bank_signature() == self._indexed_bank:
+            return
+        with self._index_lock:
+            signature = self._bank_signature()
+            if signature == self._indexed_bank:
+                return
+            questions = [q for questions in self.question_bank.values() for q in questions]
+            dedup_index = self.dedup_index.copy().build(questions)
+            retriever = self.retriever.copy().build(questions)
+            self.dedup_index, self.retriever = dedup_index, retriever
+            self._indexed_bank = signature
+    
+    def duplicate_index(self) -> DuplicateIndex:
+        """Near-duplicate index over the question bank"""
+        self._sync_indexes()
+        return self.dedup_index
+    
     def _determine_couple_type(self, answered_questions: List[str], preferences: Dict[str, Any]) -> str:
         total_answered = len(answered_questions)
         
@@ -228,6 +332,7 @@ class QuestionRecommender:
         
         return reasoning
     
+    @timed('QuestionRecommender.get_daily_question')
     def get_daily_question(self, preferences: Dict[str, Any] = None) -> Dict[str, Any]:
         """Get a single daily question based on preferences"""
         
@@ -249,6 +354,7 @@ class QuestionRecommender:
         
         return random.choice(all_questions) if all_questions else {}
     
+    @timed('QuestionRecommender.adaptive_question_selection')
     def adaptive_question_selection(self, user_performance: Dict[str, Any], 
                                   interaction_history: List[Dict]) -> List[Dict]:
         """Select questions based on user performance and engagement patterns"""
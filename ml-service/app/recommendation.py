@@ -1,8 +1,7 @@
 from typing import Dict, List, Tuple
 import random
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from .metrics import timed
 
 class RecommendationEngine:
     def __init__(self):
@@ -59,6 +58,7 @@ class RecommendationEngine:
             'growth_focus': ['love_language', 'relationship_goals', 'couple_trivia']
         }
     
+    @timed('RecommendationEngine.recommend_games')
     def recommend_games(self, user_preferences: Dict, interaction_history: List[Dict]) -> List[str]:
         # Analyze user preferences and history to recommend games
         played_games = [interaction.get('game_type') for interaction in interaction_history]
@@ -86,6 +86,7 @@ class RecommendationEngine:
         
         return filtered_recommendations[:3] if filtered_recommendations else recommended[:3]
     
+    @timed('RecommendationEngine.generate_personalized_recommendations')
     def generate_personalized_recommendations(self, 
                                            compatibility_score: float,
                                            category_scores: Dict[str, float]) -> List[str]:
@@ -109,6 +110,7 @@ class RecommendationEngine:
         
         return recommendations
     
+    @timed('RecommendationEngine.get_daily_tip')
     def get_daily_tip(self, focus_category: str = None) -> str:
         if focus_category and focus_category in self.activity_database:
             return random.choice(self.activity_database[focus_category])
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .adaptive_learning import SELECTION_POLICIES, AdaptiveLearningEngine
+from .database import db, performance_source
+from .question_recommender import QuestionRecommender
+
+def replay_policies(events: Iterable[Dict[str, Any]], candidates: List[Dict], policies: Sequence[str] = SELECTION_POLICIES,
+                    k: int = 5, seed: Optional[int] = 7) -> Dict[str, Dict[str, Any]]:
+    """Offline replay of logged games against question selection policies
+
+    events are logged games in time order: user_id, partner_id (optional), question_ids that
+    were answered, engagement_score, and the score/difficulty/category fed to profiles. For
+    each game every policy picks k of the candidates as it would have online; picks that match
+    an answered question earn the game's logged engagement, and only those matches are fed
+    back to the bandit. Profiles always see the full game, since that part does not depend
+    on what the policy picked.
+
+    The estimate is unbiased when the logging policy picked questions uniformly at random; a
+    log from a biased policy favours policies that resemble it, so compare policies on the same log.
+    """
+    engines = {policy: AdaptiveLearningEngine(selection_policy=policy) for policy in policies}
+    for engine in engines.values():
+        engine.bandit.rng = np.random.default_rng(seed)
+    results = {policy: {'events': 0, 'matched_events': 0, 'matched_questions': 0, 'total_reward': 0.0}
+               for policy in policies}
+
+    for event in events:
+        user_id = event['user_id']
+        partner_id = event.get('partner_id') or user_id
+        answered = dict.fromkeys(str(question_id) for question_id in event.get('question_ids') or [])
+        reward = event.get('engagement_score')
+        game_data = {
+            'score': event.get('score') or 0,
+            'difficulty': event.get('difficulty') or 'medium',
+            'category': event.get('category') or 'general',
+            'engagement_score': reward if reward is not None else 0.5,
+            'question_ids': list(answered),
+            'responses': {question_id: True for question_id in answered}
+        }
+        for policy, engine in engines.items():
+            stats = results[policy]
+            stats['events'] += 1
+            segment = engine.user_segment(user_id)
+            picked = engine.select_questions(user_id, partner_id, candidates, count=k, policy=policy)
+            matched = [str(question['id']) for question in picked if str(question.get('id')) in answered]
+            if matched and reward is not None:
+                stats['matched_events'] += 1
+                stats['matched_questions'] += len(matched)
+                stats['total_reward'] += float(reward)
+                engine.bandit.update(segment, engine.registry.intern_many('question', matched), reward)
+            engine.record_game_session(user_id, partner_id, game_data, update_bandit=False)
+
+    for stats in results.values():
+        stats['mean_reward'] = round(stats['total_reward'] / stats['matched_events'], 4) if stats['matched_events'] else None
+        stats['match_rate'] = round(stats['matched_events'] / stats['events'], 4) if stats['events'] else None
+        stats['total_reward'] = round(stats['total_reward'], 4)
+    return results
+
+async def load_logged_events(session: AsyncSession, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Logged games from user_performance, oldest first; the question ids are the keys of `answers`"""
+    source = await performance_source(session, start, end)
+    query = select(
+        source.c.user_id, source.c.score, source.c.difficulty, source.c.category,
+        source.c.engagement_score, source.c.answers, source.c.created_at
+    ).order_by(source.c.created_at)
+    if start is not None:
+        query = query.where(source.c.created_at >= start)
+    if end is not None:
+        query = query.where(source.c.created_at < end)
+
+    events = []
+    result = await session.stream(query)
+    async for row in result.mappings():
+        answers = row['answers']
+        if isinstance(answers, str):
+            answers = json.loads(answers)
+        if not isinstance(answers, dict) or not answers:
+            continue
+        events.append({**row, 'question_ids': list(answers.keys())})
+    return events
+
+def default_candidates(events: List[Dict[str, Any]]) -> List[Dict]:
+    """The recommender's question bank, plus bare entries for logged question ids outside it"""
+    bank = [question for questions in QuestionRecommender().question_bank.values() for question in questions]
+    known = {str(question['id']) for question in bank}
+    extra = sorted({str(question_id) for event in events for question_id in event['question_ids']} - known)
+    return bank + [{'id': question_id} for question_id in extra]
+
+async def _replay_logged(start: Optional[datetime], end: Optional[datetime], k: int) -> Dict[str, Any]:
+    await db.init()
+    try:
+        async with db.session_factory() as session:
+            events = await load_logged_events(session, start, end)
+    finally:
+        await db.dispose()
+    return replay_policies(events, default_candidates(events), k=k)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay logged games from user_performance against the question selection policies')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only games at or after this time (ISO format)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Only games before this time (ISO format)')
+    parser.add_argument('--k', type=int, default=5, help='Questions each policy picks per game')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_replay_logged(args.since, args.until, args.k)), indent=2))
@@ -0,0 +1,93 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import Request, Response
+
+class ResponseCache:
+    """LRU cache of pre-serialized JSON responses with ETag / If-None-Match support"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Tuple[bytes, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(route: str, **params: Any) -> Tuple:
+        """Normalize request parameters so equivalent requests share an entry"""
+        normalized = []
+        for name in sorted(params):
+            value = params[name]
+            if isinstance(value, str):
+                value = value.strip().lower()
+            normalized.append((name, value))
+        return (route, tuple(normalized))
+
+    @staticmethod
+    def serialize(payload: Any) -> bytes:
+        # Same encoding FastAPI's JSONResponse uses
+        return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Tuple[bytes, str]:
+        """Return (body, etag) for key, building and serializing the payload once on a miss"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        body = self.serialize(builder())
+        entry = (body, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def respond(self, request: Request, key: Hashable, builder: Callable[[], Any]) -> Response:
+        """Serve the cached payload, or 304 when the client already holds the current ETag"""
+        body, etag = self.get_or_build(key, builder)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if self._etag_matches(request.headers.get('if-none-match'), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or any(tag.replace('W/', '', 1) == etag for tag in candidates)
+
+    def invalidate(self, route: Optional[str] = None):
+        """Drop cached responses, e.g. after the question bank reloads; all routes when route is None"""
+        self.invalidations += 1
+        if route is None:
+            self.entries.clear()
+            return
+        for key in [key for key in self.entries if key[0] == route]:
+            del self.entries[key]
+
+    def metric_families(self):
+        """Cache counters for the /metrics endpoint"""
+        yield 'ml_response_cache_hits_total', 'counter', 'Cached responses served', [({}, self.hits)]
+        yield 'ml_response_cache_misses_total', 'counter', 'Responses built and cached', [({}, self.misses)]
+        yield 'ml_response_cache_not_modified_total', 'counter', '304 responses sent', [({}, self.not_modified)]
+        yield 'ml_response_cache_entries', 'gauge', 'Cached responses held', [({}, len(self.entries))]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'not_modified': self.not_modified,
+            'invalidations': self.invalidations
+        }
@@ -0,0 +1,168 @@
+import copy
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+class QuestionRetriever:
+    """Content-based question retrieval over a precomputed sparse embedding matrix
+
+    Question texts are hashed once into L2-normalized sparse rows (no vocabulary to fit, so
+    new questions are embedded without refitting). Each couple has a sparse profile vector,
+    a decayed sum of the questions they engaged with. A request is one sparse mat-vec over
+    the profile's non-zero features plus top-k by argpartition.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, decay: Optional[float] = None, max_profile_features: int = 512):
+        self.vectorizer = HashingVectorizer(n_features=n_features, ngram_range=(1, 2), stop_words='english',
+                                            alternate_sign=False, norm='l2')
+        # Weight kept by a couple's profile each time a new engagement is folded in
+        self.decay = decay if decay is not None else float(os.environ.get('RETRIEVAL_PROFILE_DECAY', 0.9))
+        self.max_profile_features = max_profile_features
+        # Column-major so a request only touches the columns its profile uses
+        self.matrix = sparse.csc_matrix((0, n_features))
+        # Recently added rows, folded into self.matrix once they grow past compact_threshold()
+        self.pending = sparse.csr_matrix((0, n_features))
+        self.questions: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.category_codes = np.zeros(0, dtype=np.int32)
+        self.profiles: Dict[str, Dict[int, float]] = {}
+
+    def build(self, questions: Iterable[Dict[str, Any]]) -> 'QuestionRetriever':
+        """Embed the whole bank, replacing anything indexed before (couple profiles are kept)"""
+        questions = [q for q in questions if q.get('id') is not None]
+        self.questions = []
+        self.positions = {}
+        self.category_codes = np.zeros(0, dtype=np.int32)
+        self.matrix = sparse.csc_matrix((0, self.vectorizer.n_features))
+        self.pending = sparse.csr_matrix((0, self.vectorizer.n_features))
+        self._register(questions)
+        self.matrix = self._embed(questions).tocsc()
+        return self
+
+    def copy(self) -> 'QuestionRetriever':
+        """Retriever sharing this one's matrices and couple profiles, so build() or add() on it leaves this one untouched"""
+        retriever = copy.copy(self)
+        retriever.questions = list(self.questions)
+        retriever.positions = dict(self.positions)
+        retriever.categories = dict(self.categories)
+        return retriever
+
+    def add(self, questions: Iterable[Dict[str, Any]]) -> int:
+        """Embed new questions without touching existing rows; returns how many were added"""
+        questions = [q for q in questions if q.get('id') is not None and str(q['id']) not in self.positions]
+        if not questions:
+            return 0
+        self._register(questions)
+        self.pending = sparse.vstack([self.pending, self._embed(questions)], format='csr')
+        if self.pending.shape[0] > self.compact_threshold():
+            self.compact()
+        return len(questions)
+
+    def compact_threshold(self) -> int:
+        return max(1024, self.matrix.shape[0] // 10)
+
+    def compact(self):
+        """Fold pending rows into the column-major matrix"""
+        if self.pending.shape[0]:
+            self.matrix = sparse.vstack([self.matrix, self.pending], format='csc')
+            self.pending = sparse.csr_matrix((0, self.vectorizer.n_features))
+
+    def record_engagement(self, couple_id: str, question_ids: Iterable[str], engagement: float = 1.0):
+        """Fold engaged questions into the couple's profile; unknown ids are ignored"""
+        texts = [self.questions[self.positions[question_id]].get('text', '')
+                 for question_id in question_ids if question_id in self.positions]
+        if not texts or engagement <= 0:
+            return
+        vectors = self.vectorizer.transform(texts).tocsr()
+        summed = np.asarray(vectors.sum(axis=0)).ravel()
+        features = np.flatnonzero(summed)
+
+        profile = {feature: weight * self.decay for feature, weight in self.profiles.get(couple_id, {}).items()}
+        for feature, value in zip(features.tolist(), (summed[features] * (engagement / len(texts))).tolist()):
+            profile[feature] = profile.get(feature, 0.0) + value
+        if len(profile) > self.max_profile_features:
+            profile = dict(sorted(profile.items(), key=lambda item: item[1], reverse=True)[:self.max_profile_features])
+        # Replaced rather than mutated, so concurrent readers always see a complete profile
+        self.profiles[couple_id] = profile
+
+    def has_profile(self, couple_id: str) -> bool:
+        return bool(self.profiles.get(couple_id))
+
+    def recommend(self, couple_id: str, k: int = 5, exclude: Optional[Set[str]] = None,
+                  category: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k (question, score) by cosine to the couple's profile; empty when there is no profile"""
+        profile = self.profiles.get(couple_id)
+        if not profile or not self.questions:
+            return []
+
+        scores = self.scores(profile)
+        if exclude:
+            positions = [self.positions[question_id] for question_id in exclude if question_id in self.positions]
+            scores[positions] = -np.inf
+        if category is not None:
+            code = self.categories.get(category)
+            if code is not None:
+                scores[self.category_codes != code] = -np.inf
+
+        k = min(k, scores.size)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.questions[position], float(scores[position])) for position in top if np.isfinite(scores[position])]
+
+    def scores(self, profile: Dict[int, float]) -> np.ndarray:
+        """Dot product of every question with the profile, touching only the profile's columns"""
+        features = np.fromiter(profile.keys(), dtype=np.int64, count=len(profile))
+        weights = np.fromiter(profile.values(), dtype=np.float64, count=len(profile))
+        norm = np.linalg.norm(weights)
+        if norm:
+            weights = weights / norm
+        scores = self.matrix[:, features] @ weights
+        if self.pending.shape[0]:
+            scores = np.concatenate([scores, self.pending[:, features] @ weights])
+        return np.asarray(scores, dtype=np.float64).ravel()
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Couple profiles as one CSR-style triple (the embeddings are rebuilt from the bank instead)"""
+        couples = list(self.profiles)
+        profiles = [self.profiles[couple_id] for couple_id in couples]
+        arrays = {
+            'profile_offsets': np.cumsum([0] + [len(profile) for profile in profiles], dtype=np.int64),
+            'profile_features': np.fromiter((feature for profile in profiles for feature in profile), dtype=np.int64),
+            'profile_weights': np.fromiter((weight for profile in profiles for weight in profile.values()), dtype=np.float64)
+        }
+        return arrays, {'couples': couples, 'n_features': self.vectorizer.n_features}
+
+    def restore_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        if meta['n_features'] != self.vectorizer.n_features:
+            raise ValueError(f"Profiles were hashed into {meta['n_features']} features, not {self.vectorizer.n_features}")
+        offsets = arrays['profile_offsets'].tolist()
+        features, weights = arrays['profile_features'].tolist(), arrays['profile_weights'].tolist()
+        self.profiles = {
+            couple_id: dict(zip(features[offsets[position]:offsets[position + 1]], weights[offsets[position]:offsets[position + 1]]))
+            for position, couple_id in enumerate(meta['couples'])
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'questions': len(self.questions),
+            'pending_rows': self.pending.shape[0],
+            'nonzeros': self.matrix.nnz + self.pending.nnz,
+            'profiles': len(self.profiles)
+        }
+
+    def _embed(self, questions: List[Dict[str, Any]]) -> sparse.csr_matrix:
+        return self.vectorizer.transform([q.get('text', '') for q in questions]).tocsr()
+
+    def _register(self, questions: List[Dict[str, Any]]):
+        codes = []
+        for question in questions:
+            self.positions[str(question['id'])] = len(self.questions)
+            self.questions.append(question)
+            category = question.get('category')
+            codes.append(self.categories.setdefault(category, len(self.categories)))
+        self.category_codes = np.concatenate([self.category_codes, np.asarray(codes, dtype=np.int32)])
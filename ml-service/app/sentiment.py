@@ -1,65 +1,34 @@
-import re
-from typing import Dict, List
+from typing import Any, Dict, List
+from .lexicon import CompiledLexicon, load_lexicon
 from .models import SentimentResponse
+from .metrics import timed
+
+# Valence of an ordinary sentiment word, so scores stay comparable to one-point-per-word counting
+TYPICAL_VALENCE = 2.5
 
 class SentimentAnalyzer:
-    def __init__(self):
-        # Simple sentiment lexicon for relationship context
-        self.positive_words = {
-            'love', 'happy', 'joy', 'amazing', 'wonderful', 'great', 'fantastic',
-            'excited', 'grateful', 'blessed', 'perfect', 'beautiful', 'awesome',
-            'incredible', 'thrilled', 'delighted', 'content', 'peaceful', 'warm',
-            'caring', 'supportive', 'understanding', 'romantic', 'sweet', 'kind'
-        }
-        
-        self.negative_words = {
-            'sad', 'angry', 'frustrated', 'disappointed', 'hurt', 'upset', 'mad',
-            'annoyed', 'worried', 'stressed', 'anxious', 'confused', 'lonely',
-            'tired', 'exhausted', 'overwhelmed', 'distant', 'cold', 'harsh',
-            'critical', 'judgmental', 'impatient', 'selfish', 'rude', 'mean'
-        }
-        
-        self.emotion_keywords = {
-            'joy': ['happy', 'joyful', 'excited', 'thrilled', 'delighted', 'elated'],
-            'love': ['love', 'adore', 'cherish', 'treasure', 'romantic', 'affection'],
-            'gratitude': ['grateful', 'thankful', 'blessed', 'appreciate', 'lucky'],
-            'sadness': ['sad', 'disappointed', 'hurt', 'lonely', 'melancholy'],
-            'anger': ['angry', 'mad', 'frustrated', 'annoyed', 'irritated', 'furious'],
-            'anxiety': ['worried', 'anxious', 'nervous', 'stressed', 'concerned', 'tense'],
-            'surprise': ['surprised', 'shocked', 'amazed', 'astonished', 'stunned'],
-            'trust': ['trust', 'secure', 'safe', 'confident', 'reliable', 'dependable']
-        }
+    def __init__(self, lexicon: CompiledLexicon = None):
+        # Phrase- and negation-aware lexicon shared with the rest of the service
+        self.lexicon = lexicon or load_lexicon()
+        self.emotion_names = ['joy', 'love', 'gratitude', 'sadness', 'anger', 'anxiety', 'surprise', 'trust']
     
+    @timed('SentimentAnalyzer.analyze')
     def analyze(self, text: str) -> SentimentResponse:
         if not text or not isinstance(text, str):
             return SentimentResponse(
                 sentiment='neutral',
                 confidence=0.5,
-                emotions={emotion: 0.0 for emotion in self.emotion_keywords.keys()}
+                emotions={emotion: 0.0 for emotion in self.emotion_names}
             )
         
-        try:
-            # Clean and tokenize text
-            words = self._tokenize(text.lower())
-        except Exception:
-            # Return neutral sentiment on tokenization error
-            return SentimentResponse(
-                sentiment='neutral',
-                confidence=0.5,
-                emotions={emotion: 0.0 for emotion in self.emotion_keywords.keys()}
-            )
+        score = self.lexicon.score(text)
+        words = score.word_count
         
-        # Calculate sentiment scores
-        positive_score = sum(1 for word in words if word in self.positive_words)
-        negative_score = sum(1 for word in words if word in self.negative_words)
-        
-        total_sentiment_words = positive_score + negative_score
-        
-        if total_sentiment_words == 0 or len(words) == 0:
+        if score.hits == 0 or words == 0:
             sentiment = 'neutral'
             confidence = 0.5
         else:
-            sentiment_score = (positive_score - negative_score) / len(words)
+            sentiment_score = (score.positive - score.negative) / (TYPICAL_VALENCE * words)
             
             if sentiment_score > 0.1:
                 sentiment = 'positive'
@@ -71,11 +40,10 @@ class SentimentAnalyzer:
                 sentiment = 'neutral'
                 confidence = 0.6
         
-        # Analyze emotions
-        try:
-            emotions = self._analyze_emotions(words)
-        except Exception:
-            emotions = {emotion: 0.0 for emotion in self.emotion_keywords.keys()}
+        emotions = {
+            emotion: round(score.emotions.get(emotion, 0) / max(words, 1), 2)
+            for emotion in self.emotion_names
+        }
         
         return SentimentResponse(
             sentiment=sentiment,
@@ -83,23 +51,7 @@ class SentimentAnalyzer:
             emotions=emotions
         )
     
-    def _tokenize(self, text: str) -> List[str]:
-        # Simple tokenization
-        text = re.sub(r'[^\w\s]', '', text)
-        return text.split()
-    
-    def _analyze_emotions(self, words: List[str]) -> Dict[str, float]:
-        if not words or not isinstance(words, list):
-            return {emotion: 0.0 for emotion in self.emotion_keywords.keys()}
-        
-        emotions = {}
-        
-        for emotion, keywords in self.emotion_keywords.items():
-            score = sum(1 for word in words if word in keywords)
-            emotions[emotion] = round(score / max(len(words), 1), 2)
-        
-        return emotions
-    
+    @timed('SentimentAnalyzer.analyze_relationship_communication')
     def analyze_relationship_communication(self, messages: List[str]) -> Dict[str, any]:
         """Analyze communication patterns in relationship messages"""
         total_messages = len(messages)
@@ -158,4 +110,47 @@ class SentimentAnalyzer:
             'emotional_balance': round(emotional_balance, 2),
             'emotion_breakdown': all_emotions,
             'suggestions': suggestions
-        }
\ No newline at end of file
+        }
+
+def score_communication(messages: List[str]) -> Dict[str, Any]:
+    """Lexicon-based communication scoring; runs on the sentiment engine's pool, so it lives here rather than in main"""
+    # Same compiled lexicon as SentimentAnalyzer (phrases, negation, intensifiers)
+    lexicon = load_lexicon()
+    
+    positive_count = 0
+    negative_count = 0
+    total_words = 0
+    
+    for message in messages:
+        if isinstance(message, str):
+            score = lexicon.score(message)
+            total_words += score.word_count
+            positive_count += score.positive_hits
+            negative_count += score.negative_hits
+    
+    # Calculate scores
+    if total_words > 0:
+        positive_ratio = positive_count / total_words
+        negative_ratio = negative_count / total_words
+        communication_health = max(0.3, min(0.9, 0.5 + positive_ratio - negative_ratio))
+    else:
+        communication_health = 0.5
+    
+    # Determine overall sentiment
+    if positive_count > negative_count:
+        sentiment = 'positive'
+    elif negative_count > positive_count:
+        sentiment = 'negative'
+    else:
+        sentiment = 'neutral'
+    
+    return {
+        'overall_sentiment': sentiment,
+        'communication_health': communication_health,
+        'emotional_balance': min(0.9, communication_health + 0.1),
+        'suggestions': [
+            'Keep up the positive communication!' if sentiment == 'positive' else 'Try using more positive language',
+            'Share more about your feelings',
+            'Ask open-ended questions to deepen conversations'
+        ]
+    }
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class SingleFlight:
+    """Coalesces concurrent identical computations into one in-flight call
+
+    The first caller for a key starts the computation; callers that arrive before it finishes
+    await the same task and get the same result (or exception) instead of queueing duplicate
+    work on the executor. Nothing is kept once the call completes, so this is not a cache:
+    a request arriving afterwards computes again. Results are shared between callers, so they
+    must be treated as read-only.
+
+    Coalescing happens on the event loop around the awaitable, so it works the same whether
+    the engine runs on the thread pool, the process pool or inline.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.environ.get('SINGLE_FLIGHT_ENABLED', '1') != '0'
+        self.in_flight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        # Per call name: computations started, callers that joined one, computations that raised
+        self.executions: Dict[str, int] = defaultdict(int)
+        self.merged: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Digest of the request content; callers normalize what the computation ignores (e.g. pair order)"""
+        encoded = json.dumps(parts, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+    async def run(self, name: str, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await factory(), or the identical computation already in flight for (name, key)"""
+        if not self.enabled:
+            return await factory()
+
+        flight_key = (name, key)
+        task = self.in_flight.get(flight_key)
+        if task is not None:
+            self.merged[name] += 1
+        else:
+            self.executions[name] += 1
+            task = asyncio.ensure_future(factory())
+            self.in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._finished(name, flight_key, done))
+        # A caller that is cancelled (client went away) must not cancel the others' computation
+        return await asyncio.shield(task)
+
+    def _finished(self, name: str, flight_key: Tuple[str, Hashable], task: asyncio.Future):
+        if self.in_flight.get(flight_key) is task:
+            del self.in_flight[flight_key]
+        # Retrieving the exception also stops asyncio warning about it when every caller was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            self.failures[name] += 1
+
+    def metric_families(self):
+        """Coalescing counters for the /metrics endpoint"""
+        names = sorted(set(self.executions) | set(self.merged))
+        yield ('ml_single_flight_executions_total', 'counter', 'Computations started by single-flight calls',
+               [({'call': name}, self.executions[name]) for name in names])
+        yield ('ml_single_flight_merged_total', 'counter', 'Calls that joined an identical computation in flight',
+               [({'call': name}, self.merged[name]) for name in names])
+        yield ('ml_single_flight_failures_total', 'counter', 'Coalesced computations that raised',
+               [({'call': name}, self.failures[name]) for name in names])
+        yield 'ml_single_flight_in_flight', 'gauge', 'Distinct computations in flight', [({}, len(self.in_flight))]
+
+    def stats(self) -> Dict[str, Any]:
+        calls = {}
+        for name in sorted(set(self.executions) | set(self.merged)):
+            executions, merged = self.executions[name], self.merged[name]
+            calls[name] = {
+                'executions': executions,
+                'merged': merged,
+                'failures': self.failures[name],
+                'merge_rate': round(merged / (executions + merged), 3) if executions + merged else 0.0
+            }
+        return {'enabled': self.enabled, 'in_flight': len(self.in_flight), 'calls': calls}
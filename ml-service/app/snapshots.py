@@ -0,0 +1,303 @@
+import asyncio
+import gc
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .interning import IdRegistry
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: every process may write, so run a single one there
+    fcntl = None
+
+# File layout: prelude | JSON header | padding | arrays (each ALIGNMENT-aligned) | trailer
+MAGIC = b'ECHOSNAP'
+END_MAGIC = b'ECHOEND\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# magic, format version, flags (unused), header length, header crc32
+PRELUDE = struct.Struct('<8sIIQI4x')
+# end magic, bytes before the trailer (a truncated file cannot end in a valid trailer)
+TRAILER = struct.Struct('<8sQ')
+
+class SnapshotError(Exception):
+    """A snapshot file that cannot be used (missing, truncated, corrupt or from another format)"""
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+class SnapshotStore:
+    """Engine state saved to one binary file and memory-mapped back on start
+
+    Engines are registered under a name and implement:
+
+        STATE_VERSION: int
+        export_state() -> (arrays: Dict[str, np.ndarray], meta: JSON-serializable dict)
+        restore_state(arrays, meta)
+
+    Arrays are written raw and contiguous, so restoring maps the file (copy-on-write) and
+    hands each engine NumPy views without parsing or copying; pages are read as they are
+    touched. Every array carries a crc32 and the JSON header has its own, and a trailer
+    records the length, so a truncated or corrupt file is rejected as a whole before any
+    engine is touched. A new snapshot is written to a temporary file of its own and renamed
+    over the old one, which is kept as `<path>.prev` and used when the newest fails its checks.
+    Any number of processes may restore, but only the one holding the writer claim (an
+    exclusive flock on `<path>.lock`, see claim_writer) writes.
+
+    A section whose STATE_VERSION changed since it was written is skipped (that engine starts
+    cold), and with a registry the snapshot is only used if the interned ids it refers to
+    still map to the same ints.
+    """
+
+    def __init__(self, path: str, registry: Optional[IdRegistry] = None, verify: bool = True):
+        self.path = path
+        self.registry = registry
+        self.verify = verify
+        self.engines: Dict[str, Any] = {}
+        # One write at a time; a periodic save never races the one at shutdown
+        self._write_lock = threading.Lock()
+        # Open lock file while this process holds the writer claim
+        self._claim = None
+        self.last_save: Optional[Dict[str, Any]] = None
+        self.last_restore: Optional[Dict[str, Any]] = None
+
+    @property
+    def previous_path(self) -> str:
+        return self.path + '.prev'
+
+    @property
+    def lock_path(self) -> str:
+        return self.path + '.lock'
+
+    def claim_writer(self) -> bool:
+        """Become the one process that writes this snapshot; True while this process holds the claim
+
+        Workers of one service (uvicorn --workers, replicas on one volume) all call this; the first
+        keeps the flock until it exits, the rest get False and can try again later. Forked children
+        inherit a parent's claim, so claim in the worker, not in a preloading master.
+        """
+        if fcntl is None or self._claim is not None:
+            return True
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._claim = handle
+        return True
+
+    def register(self, name: str, engine: Any):
+        self.engines[name] = engine
+
+    def collect(self) -> Dict[str, Any]:
+        """Copy every engine's state (cheap; call where the engines are mutated, e.g. the event loop)"""
+        sections = {}
+        # Like restore: exporting builds many small containers, and a collection midway would walk the whole heap
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for name, engine in self.engines.items():
+                arrays, meta = engine.export_state()
+                sections[name] = {'version': engine.STATE_VERSION, 'arrays': arrays, 'meta': meta}
+        finally:
+            if collecting:
+                gc.enable()
+        return {'sections': sections, 'ids': self._id_fingerprint()}
+
+    def write(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Write collected state to disk atomically; returns what was written
+
+        Raises SnapshotError when another process holds the writer claim.
+        """
+        if not self.claim_writer():
+            raise SnapshotError(f"Another process is the writer of {self.path}")
+        started = time.perf_counter()
+        header = {'format_version': FORMAT_VERSION, 'created_at': time.time(), 'ids': state['ids'], 'sections': {}}
+        blocks: List[Tuple[int, np.ndarray]] = []
+        offset = 0
+        for name, section in state['sections'].items():
+            described = {}
+            for key, array in section['arrays'].items():
+                array = np.ascontiguousarray(array)
+                if array.dtype.hasobject:
+                    raise TypeError(f"Snapshot array {name}.{key} has object dtype")
+                offset = _aligned(offset)
+                described[key] = {
+                    'dtype': array.dtype.str,
+                    'shape': list(array.shape),
+                    'offset': offset,
+                    'nbytes': array.nbytes,
+                    'crc32': zlib.crc32(array)
+                }
+                blocks.append((offset, array))
+                offset += array.nbytes
+            header['sections'][name] = {'version': section['version'], 'meta': section['meta'], 'arrays': described}
+
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        data_start = _aligned(PRELUDE.size + len(header_bytes))
+        with self._write_lock:
+            # Next to the snapshot so the rename stays on one filesystem
+            descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                                     prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as f:
+                    f.write(PRELUDE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes), zlib.crc32(header_bytes)))
+                    f.write(header_bytes)
+                    for block_offset, array in blocks:
+                        f.write(b'\0' * (data_start + block_offset - f.tell()))
+                        f.write(array)
+                    f.write(TRAILER.pack(END_MAGIC, f.tell()))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    size = f.tell()
+                if os.path.exists(self.path):
+                    os.replace(self.path, self.previous_path)
+                os.replace(temporary, self.path)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                raise
+
+        self.last_save = {
+            'path': self.path,
+            'bytes': size,
+            'sections': list(header['sections']),
+            'seconds': round(time.perf_counter() - started, 4),
+            'at': header['created_at']
+        }
+        return self.last_save
+
+    def save(self) -> Dict[str, Any]:
+        return self.write(self.collect())
+
+    async def save_async(self) -> Dict[str, Any]:
+        """Collect on the calling (event loop) thread, write from a worker thread"""
+        state = self.collect()
+        return await asyncio.to_thread(self.write, state)
+
+    def load(self, path: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, np.ndarray]]]:
+        """Header and per-section arrays (copy-on-write views of the mapped file); raises SnapshotError"""
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < PRELUDE.size + TRAILER.size:
+                    raise SnapshotError(f"{path} is truncated ({size} bytes)")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except OSError as e:
+            raise SnapshotError(f"Cannot open {path}: {e}") from e
+
+        magic, version, _, header_length, header_crc = PRELUDE.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        end_magic, data_end = TRAILER.unpack_from(mapped, size - TRAILER.size)
+        if end_magic != END_MAGIC or data_end != size - TRAILER.size:
+            raise SnapshotError(f"{path} is truncated or was not completely written")
+        if PRELUDE.size + header_length > data_end:
+            raise SnapshotError(f"{path} has a header past the end of the data")
+        header_bytes = mapped[PRELUDE.size:PRELUDE.size + header_length]
+        if zlib.crc32(header_bytes) != header_crc:
+            raise SnapshotError(f"{path} has a corrupt header")
+        header = json.loads(header_bytes)
+
+        data_start = _aligned(PRELUDE.size + header_length)
+        sections: Dict[str, Dict[str, np.ndarray]] = {}
+        for name, section in header['sections'].items():
+            arrays = {}
+            for key, described in section['arrays'].items():
+                start = data_start + described['offset']
+                if start + described['nbytes'] > data_end:
+                    raise SnapshotError(f"{path}: {name}.{key} runs past the end of the data")
+                dtype = np.dtype(described['dtype'])
+                array = np.frombuffer(mapped, dtype=dtype, count=described['nbytes'] // dtype.itemsize, offset=start)
+                if self.verify and zlib.crc32(array) != described['crc32']:
+                    raise SnapshotError(f"{path}: {name}.{key} failed its checksum")
+                arrays[key] = array.reshape(described['shape'])
+            sections[name] = arrays
+        return header, sections
+
+    def restore(self) -> Dict[str, Any]:
+        """Restore registered engines from the newest usable snapshot; engines stay cold if there is none"""
+        started = time.perf_counter()
+        report: Dict[str, Any] = {'path': None, 'restored': [], 'skipped': {}, 'rejected': {}}
+        # Decoding and restoring allocate millions of acyclic containers; collections midway would only rescan them
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for path in (self.path, self.previous_path):
+                if not os.path.exists(path):
+                    continue
+                if self.registry is not None and self.registry.rebuilt:
+                    # Every int in the snapshot referred to the log that was set aside
+                    print(f"Ignoring snapshot {path}: the id registry was rebuilt")
+                    report['rejected'][path] = 'the id registry was rebuilt'
+                    continue
+                try:
+                    header, sections = self.load(path)
+                    self._check_ids(header.get('ids') or {})
+                except (SnapshotError, ValueError, KeyError, TypeError) as e:
+                    print(f"Ignoring snapshot {path}: {e}")
+                    report['rejected'][path] = str(e)
+                    continue
+                report['path'] = path
+                report['created_at'] = header['created_at']
+                self._restore_sections(header, sections, report)
+                break
+        finally:
+            if collecting:
+                gc.enable()
+
+        report['seconds'] = round(time.perf_counter() - started, 4)
+        self.last_restore = report
+        return report
+
+    def _restore_sections(self, header: Dict[str, Any], sections: Dict[str, Dict[str, np.ndarray]], report: Dict[str, Any]):
+        for name, section in header['sections'].items():
+            engine = self.engines.get(name)
+            if engine is None:
+                report['skipped'][name] = 'no engine registered'
+            elif section['version'] != engine.STATE_VERSION:
+                report['skipped'][name] = f"state version {section['version']}, engine expects {engine.STATE_VERSION}"
+            else:
+                try:
+                    engine.restore_state(sections[name], section['meta'])
+                    report['restored'].append(name)
+                except Exception as e:
+                    print(f"Error restoring {name} from snapshot: {e}")
+                    report['skipped'][name] = str(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'writer': self._claim is not None or fcntl is None,
+            'engines': list(self.engines),
+            'last_save': self.last_save,
+            'last_restore': self.last_restore
+        }
+
+    def _id_fingerprint(self) -> Dict[str, Any]:
+        """Size and newest key per namespace; ids are append-only, so both matching means every int still does"""
+        if self.registry is None:
+            return {}
+        fingerprint = {}
+        for namespace in self.registry.keys:
+            size = self.registry.size(namespace)
+            fingerprint[namespace] = [size, self.registry.key(namespace, size - 1) if size else None]
+        return fingerprint
+
+    def _check_ids(self, fingerprint: Dict[str, Any]):
+        if self.registry is None:
+            return
+        for namespace, (size, last_key) in fingerprint.items():
+            if size and (self.registry.size(namespace) < size or self.registry.key(namespace, size - 1) != last_key):
+                raise SnapshotError(f"the id registry no longer matches the snapshot's {namespace} ids")
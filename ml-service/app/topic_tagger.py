@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Topics understood by QuestionGenerator.generate_contextual_questions
+TOPIC_KEYWORDS = {
+    'work': [
+        'work', 'job', 'boss', 'office', 'career', 'meeting', 'deadline', 'promotion', 'coworker',
+        'colleague', 'shift', 'project', 'overtime', 'interview', 'salary', 'commute'
+    ],
+    'family': [
+        'family', 'mom', 'mum', 'dad', 'mother', 'father', 'parents', 'sister', 'brother', 'kids',
+        'children', 'grandma', 'grandpa', 'in-laws', 'cousin', 'aunt', 'uncle', 'baby'
+    ],
+    'future': [
+        'future', 'someday', 'one day', 'plans', 'goal', 'goals', 'dream', 'dreams', 'retire',
+        'retirement', 'wedding', 'marry', 'move in', 'buy a house', 'next year', 'save up', 'savings'
+    ],
+    'feelings': [
+        'feel', 'feeling', 'feelings', 'sad', 'happy', 'upset', 'angry', 'anxious', 'lonely',
+        'stressed', 'hurt', 'scared', 'i miss you', 'love you', 'overwhelmed', 'frustrated', 'worried'
+    ],
+    'activities': [
+        'movie', 'dinner', 'date night', 'hike', 'hiking', 'trip', 'travel', 'vacation', 'gym',
+        'concert', 'game night', 'cook', 'cooking', 'walk', 'beach', 'restaurant', 'weekend', 'party'
+    ]
+}
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over lowercase phrases; one pass over a text finds every occurrence
+
+    Matches are reported only on word boundaries, so 'work' does not fire inside 'network'.
+    """
+
+    def __init__(self, phrases: Dict[str, Any]):
+        # phrase -> payload returned on match
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, Any]]] = [[]]
+        for phrase, payload in phrases.items():
+            self._insert(phrase.lower(), payload)
+        self._link()
+
+    def _insert(self, phrase: str, payload: Any):
+        state = 0
+        for char in phrase:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            state = next_state
+        self.outputs[state].append((len(phrase), payload))
+
+    def _link(self):
+        """Breadth-first failure links; each state inherits the outputs of its failure state"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def scan(self, text: str) -> List[Any]:
+        """Payloads of every whole-word phrase occurrence in text"""
+        text = text.lower()
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        matches = []
+        state = 0
+        length = len(text)
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                # Phrase must end at a word boundary and start at one
+                if index + 1 < length and text[index + 1].isalnum():
+                    continue
+                for phrase_length, payload in outputs[state]:
+                    start = index - phrase_length + 1
+                    if start == 0 or not text[start - 1].isalnum():
+                        matches.append(payload)
+        return matches
+
+class TopicTagger:
+    """Streaming topic tagging for couples' chat messages
+
+    Each message is scanned once by the automaton. Per-couple topic weights decay with a
+    half-life, so recent conversations dominate without re-reading history, and the number of
+    couples tracked is capped (least recently active couples are dropped first).
+    """
+
+    STATE_VERSION = 1
+
+    def __init__(self, topics: Optional[Dict[str, List[str]]] = None, half_life_hours: Optional[float] = None,
+                 max_couples: Optional[int] = None):
+        self.topics = topics or TOPIC_KEYWORDS
+        self.automaton = PhraseAutomaton({
+            phrase: topic for topic, phrases in self.topics.items() for phrase in phrases
+        })
+        half_life = half_life_hours if half_life_hours is not None else float(os.environ.get('TOPIC_HALF_LIFE_HOURS', 72))
+        self.half_life_seconds = half_life * 3600
+        self.max_couples = max_couples if max_couples is not None else int(os.environ.get('TOPIC_TAGGER_MAX_COUPLES', 50000))
+        # couple_id -> (topic weights, last update time), most recently active last
+        self.couples: "OrderedDict[Hashable, Tuple[Dict[str, float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.messages_scanned = 0
+        self.couples_evicted = 0
+
+    def tag(self, text: str) -> Dict[str, int]:
+        """Topic hit counts for one message"""
+        counts: Dict[str, int] = {}
+        for topic in self.automaton.scan(text):
+            counts[topic] = counts.get(topic, 0) + 1
+        return counts
+
+    def observe(self, couple_id: Hashable, messages: Iterable[str], now: Optional[float] = None) -> Dict[str, int]:
+        """Tag new messages, fold them into the couple's decayed weights; returns this batch's hits"""
+        batch: Dict[str, int] = {}
+        scanned = 0
+        for message in messages:
+            if not isinstance(message, str):
+                continue
+            scanned += 1
+            for topic, count in self.tag(message).items():
+                batch[topic] = batch.get(topic, 0) + count
+
+        now = time.time() if now is None else now
+        with self._lock:
+            self.messages_scanned += scanned
+            weights = self._decayed(couple_id, now)
+            for topic, count in batch.items():
+                weights[topic] = weights.get(topic, 0.0) + count
+            self.couples[couple_id] = (weights, now)
+            self.couples.move_to_end(couple_id)
+            while len(self.couples) > self.max_couples:
+                self.couples.popitem(last=False)
+                self.couples_evicted += 1
+        return batch
+
+    def topic_weights(self, couple_id: Hashable, now: Optional[float] = None) -> Dict[str, float]:
+        with self._lock:
+            return self._decayed(couple_id, time.time() if now is None else now)
+
+    def top_topics(self, couple_id: Hashable, count: int = 3, min_weight: float = 0.5) -> List[str]:
+        """Heaviest recent topics for the couple, strongest first"""
+        weights = self.topic_weights(couple_id)
+        ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)
+        return [topic for topic, weight in ranked[:count] if weight >= min_weight]
+
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        with self._lock:
+            couples = [[couple_id, dict(weights), updated_at] for couple_id, (weights, updated_at) in self.couples.items()]
+        return {}, {'couples': couples, 'messages_scanned': self.messages_scanned, 'couples_evicted': self.couples_evicted}
+
+    def restore_state(self, arrays: Dict[str, Any], meta: Dict[str, Any]):
+        """Weights keep decaying from their saved update times, so downtime counts as elapsed time"""
+        couples = OrderedDict((couple_id, (weights, updated_at)) for couple_id, weights, updated_at in meta['couples'])
+        while len(couples) > self.max_couples:
+            couples.popitem(last=False)
+        with self._lock:
+            self.couples = couples
+            self.messages_scanned = meta['messages_scanned']
+            self.couples_evicted = meta['couples_evicted']
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'couples': len(self.couples),
+            'max_couples': self.max_couples,
+            'couples_evicted': self.couples_evicted,
+            'messages_scanned': self.messages_scanned,
+            'automaton_states': len(self.automaton.goto)
+        }
+
+    def _decayed(self, couple_id: Hashable, now: float) -> Dict[str, float]:
+        entry = self.couples.get(couple_id)
+        if entry is None:
+            return {}
+        weights, updated_at = entry
+        factor = 0.5 ** (max(0.0, now - updated_at) / self.half_life_seconds) if self.half_life_seconds > 0 else 1.0
+        # Weights that decayed to noise are dropped so each couple stays at most len(topics) entries
+        return {topic: weight * factor for topic, weight in weights.items() if weight * factor >= 0.01}
@@ -0,0 +1,129 @@
+"""Offline replay of the heuristic vs Thompson-sampling question selection on a synthetic log.
+
+Users come in hidden types; each type scores best on one difficulty and finds a different
+set of questions engaging. The log is produced by a uniformly random policy (so replay is an
+unbiased estimate), and app.replay.replay_policies scores each policy by the engagement of
+the logged games whose answered questions it would also have picked.
+
+    python benchmarks/bandit_replay.py --users 300 --games 20000 --bank 60 --k 5
+
+Also times a single Thompson selection over large candidate sets and a single update.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adaptive_learning import SEGMENTS, AdaptiveLearningEngine
+from app.bandit import ThompsonSelector
+from app.replay import replay_policies
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+CATEGORIES = ['communication', 'intimacy', 'fun', 'values', 'future']
+TYPES = ['open_ended', 'this_or_that', 'multiple_choice']
+
+def synthetic_log(rng: random.Random, users: int, games: int, bank_size: int, answered: int):
+    bank = [{'id': f"q{i}", 'category': rng.choice(CATEGORIES), 'difficulty': rng.choice(DIFFICULTIES),
+             'type': rng.choice(TYPES)} for i in range(bank_size)]
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    # Hidden appeal of each question to each user type (which difficulty they do best on)
+    appeal = np_rng.beta(1.0, 3.0, size=(len(DIFFICULTIES), bank_size))
+    user_types = [rng.randrange(len(DIFFICULTIES)) for _ in range(users)]
+
+    events: List[Dict[str, Any]] = []
+    for _ in range(games):
+        user = rng.randrange(users)
+        user_type = user_types[user]
+        asked = rng.sample(range(bank_size), answered)
+        difficulty = rng.choice(DIFFICULTIES)
+        engagement = float(np.clip(appeal[user_type, asked].mean() + np_rng.normal(0, 0.05), 0, 1))
+        events.append({
+            'user_id': f"user_{user}",
+            'question_ids': [bank[position]['id'] for position in asked],
+            'engagement_score': engagement,
+            'score': 0.75 if DIFFICULTIES.index(difficulty) == user_type else 0.4,
+            'difficulty': difficulty,
+            'category': rng.choice(CATEGORIES)
+        })
+    return bank, events
+
+def random_policy_reward(rng: random.Random, events: List[Dict[str, Any]], bank: List[Dict], k: int) -> Dict[str, Any]:
+    """Replay baseline: pick k questions uniformly at random"""
+    matched, total = 0, 0.0
+    for event in events:
+        picked = {question['id'] for question in rng.sample(bank, k)}
+        if picked & set(event['question_ids']):
+            matched += 1
+            total += event['engagement_score']
+    return {'matched_events': matched, 'mean_reward': round(total / matched, 4) if matched else None}
+
+def time_call(fn, repeats: int = 20) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(float(np.median(timings)) * 1000, 4)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--bank', type=int, default=60, help='Questions in the bank')
+    parser.add_argument('--answered', type=int, default=5, help='Questions answered per logged game')
+    parser.add_argument('--k', type=int, default=5, help='Questions each policy picks per game')
+    parser.add_argument('--candidates', default='1000,10000,100000',
+                        type=lambda v: [int(size) for size in v.split(',')],
+                        help='Candidate set sizes for the selection timing')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bank, events = synthetic_log(rng, args.users, args.games, args.bank, args.answered)
+
+    started = time.perf_counter()
+    replay = replay_policies(events, bank, k=args.k, seed=args.seed)
+    replay_seconds = time.perf_counter() - started
+    replay['random'] = random_policy_reward(rng, events, bank, args.k)
+
+    timings = {}
+    for size in args.candidates:
+        selector = ThompsonSelector(SEGMENTS, seed=args.seed)
+        question_ints = np.arange(size)
+        timings[str(size)] = {
+            'select_ms': time_call(lambda: selector.select(4, question_ints, args.k)),
+            'update_ms': time_call(lambda: selector.update(4, question_ints[:args.answered], 0.7))
+        }
+
+    engine = AdaptiveLearningEngine()
+    questions = [{'id': f"q{i}", 'category': rng.choice(CATEGORIES), 'difficulty': rng.choice(DIFFICULTIES),
+                  'type': rng.choice(TYPES)} for i in range(10000)]
+    engine.record_game_session('user_a', 'user_b', {'score': 0.7, 'difficulty': 'medium', 'question_ids': ['q1']})
+    select_timings = {
+        policy: time_call(lambda: engine.select_questions('user_a', 'user_b', questions, count=args.k, policy=policy))
+        for policy in ('heuristic', 'thompson')
+    }
+
+    report = {
+        'config': vars(args),
+        'replay': replay,
+        'replay_seconds': round(replay_seconds, 2),
+        'thompson_selector': timings,
+        'select_questions_10k_ms': select_timings
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
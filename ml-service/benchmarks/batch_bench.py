@@ -0,0 +1,108 @@
+"""Dashboard renders as separate ML calls against one /batch request.
+
+Each render needs adaptive questions, communication analysis, compatibility and the couple's
+daily picks (question, tip and games). The `separate` mode sends the four calls at once, as
+Promise.all would, and `batch` sends one /batch request carrying all four. --concurrency renders
+run at a time. By default every request opens a new connection, like Node's http agent without
+keepAlive; --keep-alive reuses them. Reports render latency, renders/second and HTTP requests sent.
+
+    python benchmarks/batch_bench.py --renders 400 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+
+from common import latency_summary, running_service
+
+def dashboard_operations(couple: int, day: str) -> List[Dict[str, Any]]:
+    user, partner = f"user_{couple}_a", f"user_{couple}_b"
+    return [
+        {'name': 'questions', 'op': 'questions/adaptive',
+         'params': {'user_id': user, 'partner_id': partner, 'category': 'communication', 'count': 5}},
+        {'name': 'communication', 'op': 'analyze-communication',
+         'params': {'messages': [f"I really loved our walk today {couple}", 'Not sure about the weekend plans'] * 10,
+                    'user_id': user, 'partner_id': partner}},
+        {'name': 'compatibility', 'op': 'analyze-compatibility',
+         'params': {'user1_answers': {'communication': {'q1': couple % 5 + 1}, 'values': {'q3': 4}},
+                    'user2_answers': {'communication': {'q1': 3}, 'values': {'q3': couple % 7}}}},
+        {'name': 'daily', 'op': 'daily', 'params': {'user_id': user, 'partner_id': partner, 'day': day}}
+    ]
+
+async def render(client: httpx.AsyncClient, mode: str, couple: int, day: str) -> int:
+    """One dashboard render; returns how many sub-results came back as errors"""
+    operations = dashboard_operations(couple, day)
+    if mode == 'batch':
+        response = await client.post('/batch', json={'operations': operations})
+        response.raise_for_status()
+        return sum(entry['status'] != 200 for entry in response.json()['results'].values())
+
+    async def call(operation):
+        if operation['op'] == 'daily':
+            params = operation['params']
+            return await client.get(f"/daily/{params['user_id']}/{params['partner_id']}", params={'day': params['day']})
+        return await client.post(f"/{operation['op']}", json=operation['params'])
+
+    responses = await asyncio.gather(*[call(operation) for operation in operations])
+    return sum(response.status_code != 200 for response in responses)
+
+async def run_mode(base_url: str, mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    day = datetime.utcnow().date().isoformat()
+    limits = httpx.Limits(max_connections=args.concurrency * 4,
+                          max_keepalive_connections=args.concurrency * 4 if args.keep_alive else 0)
+    latencies: List[float] = []
+    errors = 0
+    queue = asyncio.Queue()
+    for couple in range(args.renders):
+        queue.put_nowait(couple)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            couple = queue.get_nowait()
+            started = time.perf_counter()
+            errors += await render(client, mode, couple % args.couples, day)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        # Warm the caches and the lexicon once, so both modes start from the same state
+        await render(client, mode, 0, day)
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+    return {
+        'seconds': round(elapsed, 3),
+        'renders_per_second': round(args.renders / elapsed, 1),
+        'http_requests': args.renders * (1 if mode == 'batch' else 4),
+        'sub_result_errors': errors,
+        'render_latency': latency_summary(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main', help='Entry point module to serve')
+    parser.add_argument('--renders', type=int, default=400)
+    parser.add_argument('--couples', type=int, default=50, help='Distinct couples the renders cycle through')
+    parser.add_argument('--concurrency', type=int, default=8, help='Renders in flight at once')
+    parser.add_argument('--keep-alive', action='store_true', help='Reuse connections instead of one per request')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    report = {'config': vars(args)}
+    env = {'PERSIST_GAME_RESULTS': '0', 'ID_REGISTRY_PATH': '', 'SNAPSHOT_PATH': '', 'DAILY_BATCH_HOUR': ''}
+    with running_service(args.module, env=env) as base_url:
+        for mode in ('separate', 'batch'):
+            report[mode] = asyncio.run(run_mode(base_url, mode, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
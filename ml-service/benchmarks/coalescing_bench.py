@@ -0,0 +1,81 @@
+"""Duplicate dashboard calls with and without single-flight coalescing.
+
+Simulates couples whose partners open the dashboard at the same moment: each partner sends
+compatibility, relationship insights and recommendations for the couple, all concurrently,
+through the app in-process (httpx ASGI transport). Reports wall time, engine tasks run on the
+executor and the merge counters for each mode.
+
+    python benchmarks/coalescing_bench.py --couples 50 --history 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+def dashboard_requests(couple: int, history: int):
+    """The three calls each partner's dashboard makes, as (path, body) pairs"""
+    user, partner = f"user_{couple}_a", f"user_{couple}_b"
+    answers = {
+        user: {'communication': {'q1': couple % 5 + 1, 'q2': 'often'}, 'values': {'q3': 5, 'q4': 2}},
+        partner: {'communication': {'q1': 3, 'q2': 'sometimes'}, 'values': {'q3': couple % 7, 'q4': 3}}
+    }
+    interactions = [{'type': 'game', 'score': ((i + couple) % 10) / 10, 'timestamp': f"2026-09-{i % 28 + 1:02d}"} for i in range(history)]
+    answered = [f"comm_{i}" for i in range(1, 4)]
+    for me, them in ((user, partner), (partner, user)):
+        yield '/analyze-compatibility', {'user1_answers': answers[me], 'user2_answers': answers[them]}
+        yield '/insights/relationship', {'couple_id': f"{couple}", 'interaction_history': interactions}
+        yield '/questions/recommend', {'user_id': me, 'partner_id': them, 'answered_questions': answered}
+
+async def burst(couples: int, history: int) -> dict:
+    import httpx
+    import main
+
+    requests = [request for couple in range(couples) for request in dashboard_requests(couple, history)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://bench') as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[client.post(path, json=body) for path, body in requests])
+        elapsed = time.perf_counter() - started
+    return {
+        'requests': len(requests),
+        'errors': sum(response.status_code != 200 for response in responses),
+        'seconds': round(elapsed, 3),
+        'engine_tasks': main.engine_executor.stats['thread'].submitted,
+        'coalescing': main.single_flight.stats()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--couples', type=int, default=50)
+    parser.add_argument('--history', type=int, default=2000, help='Interactions per couple sent to /insights/relationship')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(asyncio.run(burst(args.couples, args.history))))
+        return
+
+    report = {'config': {'couples': args.couples, 'history': args.history}}
+    # Each mode gets a fresh process so engine state and counters start clean
+    for mode, enabled in (('without', '0'), ('with', '1')):
+        env = dict(os.environ, SINGLE_FLIGHT_ENABLED=enabled, PERSIST_GAME_RESULTS='0', ID_REGISTRY_PATH='', SNAPSHOT_PATH='')
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', '--couples', str(args.couples), '--history', str(args.history)],
+            cwd=SERVICE_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        report[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+    report['engine_tasks_saved'] = report['without']['engine_tasks'] - report['with']['engine_tasks']
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
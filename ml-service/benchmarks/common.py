@@ -0,0 +1,66 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def running_service(module: str = 'main', env: Optional[Dict[str, str]] = None,
+                    port: Optional[int] = None, timeout: float = 30.0) -> Iterator[str]:
+    """Start `uvicorn <module>:app` locally and yield its base URL once /health answers"""
+    port = port or free_port()
+    process_env = dict(os.environ, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', f"{module}:app", '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=SERVICE_DIR, env=process_env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited with code {process.returncode} during startup")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"{module} did not become healthy within {timeout}s")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+        'max_ms': round(max(latencies_ms), 2) if latencies_ms else 0.0
+    }
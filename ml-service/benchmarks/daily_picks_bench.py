@@ -0,0 +1,90 @@
+"""Throughput of the nightly daily-picks batch, and what a resumed run skips.
+
+Populates the adaptive engine with --couples couples through record_game_session, then plans
+one day for all of them into a scratch SQLite database: first an interrupted run (--interrupt
+of the couples), then the run that resumes it, then a full run for the next day with each
+pool size in --workers. For comparison it also times the per-request path the batch replaces
+(get_daily_question + get_daily_tip per couple).
+
+    python benchmarks/daily_picks_bench.py --couples 200000 --workers 0,2,4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+def populate(engine, bank_ids, categories, couples: int, rng: random.Random):
+    for couple in range(couples):
+        asked = rng.sample(bank_ids, 2)
+        engine.record_game_session(f"user_{couple}", f"partner_{couple}", {
+            'score': rng.random(), 'difficulty': rng.choice(DIFFICULTIES), 'category': rng.choice(categories),
+            'engagement_score': rng.random(), 'question_ids': asked, 'responses': {question: 'a' for question in asked}
+        })
+
+async def run(args) -> dict:
+    from app.adaptive_learning import AdaptiveLearningEngine
+    from app.daily_picks import DailyPickJob
+    from app.database import db
+    from app.interning import IdRegistry
+    from app.question_recommender import QuestionRecommender
+    from app.recommendation import RecommendationEngine
+
+    rng = random.Random(args.seed)
+    engine = AdaptiveLearningEngine(registry=IdRegistry())
+    recommender, tips = QuestionRecommender(), RecommendationEngine()
+    bank_ids = [question['id'] for questions in recommender.question_bank.values() for question in questions]
+    started = time.perf_counter()
+    populate(engine, bank_ids, list(recommender.question_bank), args.couples, rng)
+    report = {'config': {'couples': args.couples, 'chunk_size': args.chunk_size},
+              'populate_seconds': round(time.perf_counter() - started, 2)}
+
+    # The per-request path: a random draw over the flattened bank on every call
+    sample = min(args.couples, 20000)
+    started = time.perf_counter()
+    for _ in range(sample):
+        recommender.get_daily_question()
+        tips.get_daily_tip()
+    report['per_request_couples_per_second'] = round(sample / (time.perf_counter() - started), 1)
+
+    day = date(2026, 1, 1)
+    workers = [int(count) for count in args.workers.split(',')]
+    job = DailyPickJob(engine, recommender, tips, workers=workers[-1], chunk_size=args.chunk_size)
+    report['interrupted'] = await job.run(day, limit=int(args.couples * args.interrupt))
+    report['resumed'] = await job.run(day)
+    report['full_runs'] = {}
+    for offset, count in enumerate(workers, start=1):
+        job = DailyPickJob(engine, recommender, tips, workers=count, chunk_size=args.chunk_size)
+        report['full_runs'][f"workers={count}"] = await job.run(day + timedelta(days=offset))
+    await db.dispose()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--couples', type=int, default=200000)
+    parser.add_argument('--workers', default='0,2,4', help='Comma-separated pool sizes for the full runs (0 = no pool)')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--interrupt', type=float, default=0.4, help='Fraction of couples the first, interrupted run plans')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    # A scratch database, so the resume logic starts from nothing planned
+    os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'daily.db')}"
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""Micro-benchmarks for the engines in app/, driven by synthetic data at configurable scale.
+
+Each operation runs at several input sizes and reports time and peak traced memory.
+The log-log slope between successive sizes estimates the scaling exponent, so an
+O(n^2) path shows up as a slope near 2.
+
+    python benchmarks/engine_bench.py                                  # all operations, default scales
+    python benchmarks/engine_bench.py --ops sentiment.communication --scales 10,1000,100000
+    python benchmarks/engine_bench.py --save-baseline baseline.json
+    python benchmarks/engine_bench.py --baseline baseline.json --threshold 0.2
+    python benchmarks/engine_bench.py --plot curves.png                # needs matplotlib
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adaptive_learning import AdaptiveLearningEngine
+from app.compatibility import CompatibilityAnalyzer
+from app.dedup_index import DuplicateIndex
+from app.game_results import GameResultsManager
+from app.question_generator import QuestionGenerator
+from app.question_recommender import QuestionRecommender
+from app.recommendation import RecommendationEngine
+from app.sentiment import SentimentAnalyzer
+from app.topic_tagger import TopicTagger
+
+CATEGORIES = ['communication', 'intimacy', 'fun', 'deep', 'memories']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+QUESTION_TYPES = ['open_ended', 'multiple_choice', 'this_or_that']
+VOCABULARY = ['love', 'happy', 'tired', 'work', 'dinner', 'sad', 'great', 'thank', 'you', 'today', 'upset',
+              'we', 'weekend', 'grateful', 'worried', 'miss', 'home', 'talk', 'together', 'kind']
+# Larger Zipf-distributed vocabulary for question texts, so text-similarity work sees realistic overlap
+QUESTION_VOCABULARY = VOCABULARY + [f"word{k}" for k in range(5000)]
+QUESTION_WORD_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(QUESTION_VOCABULARY))]
+
+# --- synthetic data ---------------------------------------------------------------------------
+
+def synthetic_messages(rng: random.Random, count: int) -> List[str]:
+    return [' '.join(rng.choices(VOCABULARY, k=rng.randint(4, 20))) + rng.choice(['.', '!', '?'])
+            for _ in range(count)]
+
+def synthetic_questions(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [{
+        'id': f"q_{i}",
+        'text': ' '.join(rng.choices(VOCABULARY, k=8)) + '?',
+        'category': CATEGORIES[i % len(CATEGORIES)],
+        'difficulty': rng.choice(DIFFICULTIES),
+        'type': rng.choice(QUESTION_TYPES)
+    } for i in range(count)]
+
+def synthetic_question_texts(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [{'id': f"q_{i}", 'text': ' '.join(rng.choices(QUESTION_VOCABULARY, QUESTION_WORD_WEIGHTS,
+                                                          k=rng.randint(6, 14))) + '?'}
+            for i in range(count)]
+
+def synthetic_bank(rng: random.Random, count: int) -> Dict[str, List[Dict[str, Any]]]:
+    bank: Dict[str, List[Dict[str, Any]]] = {category: [] for category in CATEGORIES}
+    texts = synthetic_question_texts(rng, count)
+    for question, text in zip(synthetic_questions(rng, count), texts):
+        question['text'] = text['text']
+        bank[question['category']].append(question)
+    return bank
+
+def synthetic_session(rng: random.Random, questions: int) -> Dict[str, Any]:
+    session_questions = synthetic_questions(rng, questions)
+    responses = {}
+    for user in ('user_a', 'user_b'):
+        responses[user] = {
+            question['id']: {'answer': ' '.join(rng.choices(VOCABULARY, k=6)) if question['type'] == 'open_ended'
+                             else rng.choice(['A', 'B'])}
+            for question in session_questions
+        }
+    return {'id': 'bench', 'game_type': 'adaptive', 'questions': session_questions, 'responses': responses}
+
+def synthetic_answers(rng: random.Random, per_category: int) -> Dict[str, Dict[str, Any]]:
+    categories = ['communication', 'values', 'lifestyle', 'intimacy', 'goals', 'personality']
+    return {category: {f"q{i}": rng.randint(1, 5) for i in range(per_category)} for category in categories}
+
+def synthetic_interactions(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    games = ['this_or_that', 'love_language', 'couple_trivia', 'memory_lane', 'story_builder']
+    return [{'game_type': rng.choice(games), 'category': rng.choice(CATEGORIES),
+             'engagement_score': rng.random()} for _ in range(count)]
+
+# --- operations -------------------------------------------------------------------------------
+# Each setup(rng, scale) returns a zero-argument callable timed by the runner.
+
+def setup_sentiment_communication(rng, scale):
+    analyzer = SentimentAnalyzer()
+    messages = synthetic_messages(rng, scale)
+    return lambda: analyzer.analyze_relationship_communication(messages)
+
+def setup_topic_observe(rng, scale):
+    tagger = TopicTagger()
+    messages = synthetic_messages(rng, scale)
+    return lambda: tagger.observe('user_a_user_b', messages)
+
+def setup_recommender_recommend(rng, scale):
+    recommender = QuestionRecommender()
+    recommender.question_bank = synthetic_bank(rng, scale)
+    answered = [f"q_{i}" for i in range(0, scale, 3)]
+    # The near-duplicate index is built once per bank, not per call
+    recommender.duplicate_index()
+    return lambda: recommender.recommend('user_a', answered, {})
+
+def setup_retrieval_recommend(rng, scale):
+    recommender = QuestionRecommender()
+    recommender.question_bank = synthetic_bank(rng, scale)
+    engaged = [f"q_{i}" for i in range(min(scale, 50))]
+    for _ in range(20):
+        recommender.record_engagement('user_a', 'user_b', rng.sample(engaged, min(5, len(engaged))), rng.random())
+    answered = set(engaged)
+    return lambda: recommender.retriever.recommend('user_a_user_b', k=20, exclude=answered)
+
+def setup_dedup_build(rng, scale):
+    questions = synthetic_question_texts(rng, scale)
+    return lambda: DuplicateIndex().build(questions)
+
+def setup_comparison_results(rng, scale):
+    manager = GameResultsManager()
+    session = synthetic_session(rng, scale)
+    return lambda: manager._generate_comparison_results(session)
+
+def setup_compatibility_analyze(rng, scale):
+    analyzer = CompatibilityAnalyzer()
+    user1, user2 = synthetic_answers(rng, scale), synthetic_answers(rng, scale)
+    return lambda: analyzer.analyze(user1, user2)
+
+def setup_compatibility_insights(rng, scale):
+    analyzer = CompatibilityAnalyzer()
+    history = synthetic_interactions(rng, scale)
+    return lambda: analyzer.generate_insights(history)
+
+def setup_adaptive_select(rng, scale):
+    engine = AdaptiveLearningEngine()
+    for _ in range(20):
+        engine.record_game_session('user_a', 'user_b', {
+            'score': rng.random(), 'difficulty': rng.choice(DIFFICULTIES), 'category': rng.choice(CATEGORIES),
+            'question_ids': [f"q_{rng.randrange(scale)}" for _ in range(5)]})
+    questions = synthetic_questions(rng, scale)
+    return lambda: engine.select_questions('user_a', 'user_b', questions, count=5)
+
+def setup_adaptive_train(rng, scale):
+    engine = AdaptiveLearningEngine()
+    for user in range(scale):
+        for _ in range(3):
+            engine.update_user_profile(f"user_{user}", {
+                'score': rng.random(), 'difficulty': rng.choice(DIFFICULTIES), 'category': rng.choice(CATEGORIES),
+                'engagement_score': rng.random()})
+    return lambda: engine.train_models()
+
+def setup_generator_questions(rng, scale):
+    generator = QuestionGenerator()
+    profile = {'preferred_categories': {category: rng.randint(1, 5) for category in CATEGORIES},
+               'games_played': 12, 'avg_score': 0.75}
+    return lambda: generator.generate_questions(profile, profile, count=scale)
+
+def setup_generator_follow_ups(rng, scale):
+    generator = QuestionGenerator()
+    answers = [{'question': {'category': rng.choice(['communication', 'intimacy', 'fun'])},
+                'answer': ' '.join(rng.choices(VOCABULARY, k=12))} for _ in range(scale)]
+    return lambda: generator.generate_follow_up_questions(answers, count=scale)
+
+def setup_follow_up_session(rng, scale):
+    generator = QuestionGenerator()
+    answers = [{'question': {'id': f"q{i}", 'category': rng.choice(['communication', 'intimacy', 'fun'])},
+                'answer': ' '.join(rng.choices(VOCABULARY, k=12))} for i in range(scale)]
+
+    def run():
+        # Cold keyphrase cache and no seen follow-ups, so every call does the full extraction
+        generator.follow_ups.keyphrase_cache.clear()
+        generator.follow_ups.seen.clear()
+        return generator.generate_follow_up_questions(answers, count=scale, couple_id='user_a_user_b')
+    return run
+
+def setup_recommend_games(rng, scale):
+    engine = RecommendationEngine()
+    history = synthetic_interactions(rng, scale)
+    return lambda: engine.recommend_games({'focus': 'fun'}, history)
+
+OPERATIONS: Dict[str, Dict[str, Any]] = {
+    'sentiment.communication': {'setup': setup_sentiment_communication, 'scales': [10, 1000, 100000],
+                                'label': 'SentimentAnalyzer.analyze_relationship_communication (messages)'},
+    'topics.observe': {'setup': setup_topic_observe, 'scales': [10, 1000, 100000],
+                       'label': 'TopicTagger.observe (messages)'},
+    'recommender.recommend': {'setup': setup_recommender_recommend, 'scales': [15, 10000, 100000],
+                              'label': 'QuestionRecommender.recommend (bank size)'},
+    'retrieval.recommend': {'setup': setup_retrieval_recommend, 'scales': [100, 10000, 100000],
+                            'label': 'QuestionRetriever.recommend (bank size)'},
+    'dedup.build': {'setup': setup_dedup_build, 'scales': [100, 10000, 100000],
+                    'label': 'DuplicateIndex.build (questions)'},
+    'game_results.comparison': {'setup': setup_comparison_results, 'scales': [10, 1000],
+                                'label': 'GameResultsManager._generate_comparison_results (questions)'},
+    'compatibility.analyze': {'setup': setup_compatibility_analyze, 'scales': [10, 1000, 10000],
+                              'label': 'CompatibilityAnalyzer.analyze (answers per category)'},
+    'compatibility.insights': {'setup': setup_compatibility_insights, 'scales': [10, 1000, 100000],
+                               'label': 'CompatibilityAnalyzer.generate_insights (interactions)'},
+    'adaptive.select_questions': {'setup': setup_adaptive_select, 'scales': [100, 1000, 10000],
+                                  'label': 'AdaptiveLearningEngine.select_questions (candidates)'},
+    'adaptive.train_models': {'setup': setup_adaptive_train, 'scales': [100, 1000, 10000],
+                              'label': 'AdaptiveLearningEngine.train_models (users)'},
+    'generator.questions': {'setup': setup_generator_questions, 'scales': [5, 100, 1000],
+                            'label': 'QuestionGenerator.generate_questions (count)'},
+    'generator.follow_ups': {'setup': setup_generator_follow_ups, 'scales': [3, 100, 1000],
+                             'label': 'QuestionGenerator.generate_follow_up_questions (answers)'},
+    'generator.follow_ups_cold': {'setup': setup_follow_up_session, 'scales': [50, 1000, 10000],
+                                  'label': 'QuestionGenerator.generate_follow_up_questions, cold cache (answers)'},
+    'recommendation.games': {'setup': setup_recommend_games, 'scales': [10, 1000, 100000],
+                             'label': 'RecommendationEngine.recommend_games (interactions)'}
+}
+
+# --- runner -----------------------------------------------------------------------------------
+
+def measure(fn: Callable[[], Any], min_time: float, max_repeats: int) -> Dict[str, float]:
+    """Median wall time over repeats (at least one, until min_time elapses), then peak traced memory"""
+    timings = []
+    gc.collect()
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_repeats and (not timings or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'repeats': len(timings),
+        'median_ms': round(statistics.median(timings) * 1000, 4),
+        'min_ms': round(min(timings) * 1000, 4),
+        'peak_memory_bytes': peak
+    }
+
+def scaling_exponents(points: List[Dict[str, Any]]) -> List[Optional[float]]:
+    """log-log slope of median time between successive scales (1 = linear, 2 = quadratic)"""
+    slopes = []
+    for before, after in zip(points, points[1:]):
+        if before['median_ms'] > 0 and after['median_ms'] > 0 and after['scale'] != before['scale']:
+            slopes.append(round(math.log(after['median_ms'] / before['median_ms'])
+                                / math.log(after['scale'] / before['scale']), 2))
+        else:
+            slopes.append(None)
+    return slopes
+
+def run(ops: List[str], scales_override: Optional[List[int]], min_time: float, max_repeats: int,
+        seed: int) -> Dict[str, Any]:
+    results = {}
+    for name in ops:
+        operation = OPERATIONS[name]
+        points = []
+        for scale in scales_override or operation['scales']:
+            rng = random.Random(seed)
+            fn = operation['setup'](rng, scale)
+            point = {'scale': scale, **measure(fn, min_time, max_repeats)}
+            points.append(point)
+            print(f"{name:28s} n={scale:<8d} {point['median_ms']:>12.3f} ms "
+                  f"{point['peak_memory_bytes'] / 1024:>12.1f} KiB", file=sys.stderr)
+        results[name] = {'label': operation['label'], 'points': points, 'scaling_exponents': scaling_exponents(points)}
+    return results
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Dict[str, Any]:
+    """Per (operation, scale) time and memory ratios against a saved run; flags slowdowns beyond threshold"""
+    comparison = {'regressions': [], 'operations': {}}
+    for name, result in results.items():
+        previous = {point['scale']: point for point in baseline.get('results', {}).get(name, {}).get('points', [])}
+        rows = []
+        for point in result['points']:
+            before = previous.get(point['scale'])
+            if not before:
+                continue
+            time_ratio = round(point['median_ms'] / before['median_ms'], 3) if before['median_ms'] else None
+            memory_ratio = (round(point['peak_memory_bytes'] / before['peak_memory_bytes'], 3)
+                            if before['peak_memory_bytes'] else None)
+            rows.append({'scale': point['scale'], 'time_ratio': time_ratio, 'memory_ratio': memory_ratio})
+            if time_ratio and time_ratio > 1 + threshold:
+                comparison['regressions'].append({'operation': name, 'scale': point['scale'], 'time_ratio': time_ratio})
+        comparison['operations'][name] = rows
+    return comparison
+
+def plot(results: Dict[str, Any], path: str):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping --plot", file=sys.stderr)
+        return
+
+    figure, (time_axis, memory_axis) = plt.subplots(1, 2, figsize=(14, 6))
+    for name, result in results.items():
+        scales = [point['scale'] for point in result['points']]
+        time_axis.plot(scales, [point['median_ms'] for point in result['points']], marker='o', label=name)
+        memory_axis.plot(scales, [point['peak_memory_bytes'] for point in result['points']], marker='o', label=name)
+    for axis, ylabel in ((time_axis, 'median time (ms)'), (memory_axis, 'peak traced memory (bytes)')):
+        axis.set_xscale('log')
+        axis.set_yscale('log')
+        axis.set_xlabel('input size')
+        axis.set_ylabel(ylabel)
+        axis.grid(True, which='both', alpha=0.3)
+    time_axis.legend(fontsize='small')
+    figure.tight_layout()
+    figure.savefig(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', default=','.join(OPERATIONS), help=f"Comma-separated operations: {', '.join(OPERATIONS)}")
+    parser.add_argument('--scales', type=lambda v: [int(s) for s in v.split(',')],
+                        help='Override the input sizes for every selected operation')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Keep repeating each point for at least this long')
+    parser.add_argument('--max-repeats', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--save-baseline', help='Write this run to a baseline JSON file')
+    parser.add_argument('--baseline', help='Compare against a saved baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Slowdown ratio above which a point is a regression')
+    parser.add_argument('--plot', help='Write log-log scaling curves to this image (requires matplotlib)')
+    args = parser.parse_args()
+
+    ops = [op.strip() for op in args.ops.split(',') if op.strip()]
+    unknown = [op for op in ops if op not in OPERATIONS]
+    if unknown:
+        raise SystemExit(f"Unknown operations: {', '.join(unknown)}")
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'results': run(ops, args.scales, args.min_time, args.max_repeats, args.seed)
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare_to_baseline(report['results'], json.load(f), args.threshold)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.plot:
+        plot(report['results'], args.plot)
+
+    print(json.dumps(report, indent=2))
+    if report.get('comparison', {}).get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Measure /health latency while heavy engine requests hammer the service.
+
+Runs the service twice, with the engine executor enabled and disabled
+(ENGINE_EXECUTOR_ENABLED=0 runs engine work inline on the event loop), and
+prints a JSON comparison.
+
+    python benchmarks/health_under_load.py --concurrency 16 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from common import latency_summary, running_service
+
+WORDS = ['love', 'happy', 'tired', 'work', 'dinner', 'sad', 'great', 'thank', 'you', 'today', 'upset', 'we']
+
+def heavy_payloads(messages: int, answers: int) -> List[Dict[str, Any]]:
+    conversation = [' '.join(random.choices(WORDS, k=12)) for _ in range(messages)]
+    user_answers = {
+        category: {f"q{i}": random.random() for i in range(answers)}
+        for category in ['communication', 'values', 'lifestyle', 'intimacy', 'goals', 'personality']
+    }
+    return [
+        {'path': '/analyze-communication', 'json': {'messages': conversation}},
+        {'path': '/analyze-compatibility', 'json': {'user1_answers': user_answers, 'user2_answers': user_answers}}
+    ]
+
+async def heavy_worker(client: httpx.AsyncClient, payloads: List[Dict], stop_at: float, counts: Dict[str, int]):
+    while time.perf_counter() < stop_at:
+        payload = random.choice(payloads)
+        try:
+            response = await client.post(payload['path'], json=payload['json'])
+            counts['ok' if response.status_code == 200 else 'error'] += 1
+        except httpx.HTTPError:
+            counts['error'] += 1
+
+async def health_prober(client: httpx.AsyncClient, interval: float, timeout: float, stop_at: float,
+                        latencies: List[float], counts: Dict[str, int]):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        try:
+            await client.get('/health', timeout=timeout)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            counts['health_timeouts'] += 1
+        await asyncio.sleep(interval)
+
+async def run_scenario(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    payloads = heavy_payloads(args.messages, args.answers)
+    counts = {'ok': 0, 'error': 0, 'health_timeouts': 0}
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as heavy_client, \
+            httpx.AsyncClient(base_url=base_url) as health_client:
+        stop_at = time.perf_counter() + args.duration
+        await asyncio.gather(
+            health_prober(health_client, args.probe_interval, args.health_timeout, stop_at, latencies, counts),
+            *[heavy_worker(heavy_client, payloads, stop_at, counts) for _ in range(args.concurrency)]
+        )
+
+    return {
+        'health_latency': latency_summary(latencies),
+        'health_timeouts': counts['health_timeouts'],
+        'heavy_requests': counts['ok'],
+        'heavy_errors': counts['error'],
+        'heavy_throughput_rps': round(counts['ok'] / args.duration, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main', help='Entry point module to serve')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent heavy request loops')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per scenario')
+    parser.add_argument('--messages', type=int, default=5000, help='Messages per /analyze-communication call')
+    parser.add_argument('--answers', type=int, default=200, help='Answers per category per compatibility call')
+    parser.add_argument('--probe-interval', type=float, default=0.05, help='Seconds between /health probes')
+    parser.add_argument('--health-timeout', type=float, default=2.0, help='Probe timeout, like keep-alive pings')
+    args = parser.parse_args()
+
+    results = {}
+    for name, enabled in [('executor', '1'), ('inline', '0')]:
+        with running_service(args.module, env={'ENGINE_EXECUTOR_ENABLED': enabled}) as base_url:
+            results[name] = asyncio.run(run_scenario(base_url, args))
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
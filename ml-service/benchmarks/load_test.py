@@ -0,0 +1,245 @@
+"""Replay a production-like traffic mix against the ML service and report per-route latency.
+
+Starts the chosen entry point locally (or targets --url), sweeps concurrency
+levels with closed-loop workers, and writes throughput, p50/p95/p99 latency
+and error rate per route as JSON.
+
+    python benchmarks/load_test.py --module main --concurrency 1,8,32 --duration 15 --output main.json
+    python benchmarks/load_test.py --module minimal_main --output minimal.json --compare main.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from common import SERVICE_DIR, latency_summary, running_service
+
+DEFAULT_MIX = {
+    'adaptive': 30,
+    'generate': 20,
+    'analyze_communication': 15,
+    'game_create': 10,
+    'game_submit': 10,
+    'compatibility': 15
+}
+
+CATEGORIES = ['communication', 'intimacy', 'fun', 'love', 'future']
+MESSAGES = [
+    "I love how you made dinner tonight, thank you",
+    "I'm so tired after work today",
+    "Can we talk about the weekend plans?",
+    "I felt upset when you didn't call",
+    "You're amazing, I appreciate you so much",
+    "Let's try that new place on Friday"
+]
+
+def build_requests(rng: random.Random, users: int) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """Request factories per traffic class, shaped like what the Node backend sends"""
+    def couple():
+        user = rng.randrange(users)
+        return f"user_{user}", f"user_{user ^ 1}"
+
+    def adaptive():
+        user_id, partner_id = couple()
+        return {'method': 'POST', 'path': '/questions/adaptive', 'json': {
+            'user_id': user_id, 'partner_id': partner_id,
+            'category': rng.choice(CATEGORIES), 'count': rng.choice([3, 5, 10])}}
+
+    def generate():
+        user_id, partner_id = couple()
+        return {'method': 'POST', 'path': '/questions/generate', 'json': {
+            'user_id': user_id, 'partner_id': partner_id,
+            'category': rng.choice(CATEGORIES), 'count': 5}}
+
+    def analyze_communication():
+        return {'method': 'POST', 'path': '/analyze-communication', 'json': {
+            'messages': [rng.choice(MESSAGES) for _ in range(rng.randint(5, 50))]}}
+
+    def game_create():
+        user_id, partner_id = couple()
+        return {'method': 'POST', 'path': '/games/create-session', 'json': {
+            'couple_id': f"{min(user_id, partner_id)}_{max(user_id, partner_id)}",
+            'game_type': rng.choice(['adaptive', 'this_or_that', 'love_language']), 'user_id': user_id}}
+
+    def game_submit():
+        user_id, partner_id = couple()
+        return {'method': 'POST', 'path': '/games/submit-response', 'json': {
+            'user_id': user_id, 'partner_id': partner_id, 'game_type': 'quiz',
+            'game_data': {'score': round(rng.random(), 2), 'difficulty': rng.choice(['easy', 'medium', 'hard']),
+                          'engagement_score': round(rng.random(), 2)},
+            'session_id': f"quiz_{user_id}"}}
+
+    def compatibility():
+        def answers():
+            return {category: {f"q{i}": rng.randint(1, 5) for i in range(10)}
+                    for category in ['communication', 'values', 'lifestyle', 'intimacy', 'goals', 'personality']}
+        return {'method': 'POST', 'path': '/analyze-compatibility', 'json': {
+            'user1_answers': answers(), 'user2_answers': answers()}}
+
+    return {
+        'adaptive': adaptive,
+        'generate': generate,
+        'analyze_communication': analyze_communication,
+        'game_create': game_create,
+        'game_submit': game_submit,
+        'compatibility': compatibility
+    }
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """Parse 'adaptive=5,generate=2' into weights; unknown classes are rejected"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown traffic class '{name}'; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+async def worker(client: httpx.AsyncClient, factories: Dict[str, Callable], names: List[str],
+                 weights: List[float], rng: random.Random, stop_at: float, results: Dict[str, Dict]):
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        request = factories[name]()
+        started = time.perf_counter()
+        try:
+            response = await client.request(request['method'], request['path'], json=request.get('json'))
+            ok = 200 <= response.status_code < 400
+            status = response.status_code
+        except httpx.HTTPError as e:
+            ok = False
+            status = type(e).__name__
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        route = results.setdefault(name, {'latencies': [], 'errors': 0, 'statuses': {}})
+        route['latencies'].append(elapsed_ms)
+        route['statuses'][str(status)] = route['statuses'].get(str(status), 0) + 1
+        if not ok:
+            route['errors'] += 1
+
+async def run_level(base_url: str, concurrency: int, duration: float, mix: Dict[str, float],
+                    users: int, seed: int, timeout: float) -> Dict[str, Any]:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results: Dict[str, Dict] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        stop_at = time.perf_counter() + duration
+        tasks = []
+        for index in range(concurrency):
+            rng = random.Random(seed * 1000 + index)
+            tasks.append(worker(client, build_requests(rng, users), names, weights, rng, stop_at, results))
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    total_requests = total_errors = 0
+    for name, route in sorted(results.items()):
+        count = len(route['latencies'])
+        total_requests += count
+        total_errors += route['errors']
+        routes[name] = {
+            **latency_summary(route['latencies']),
+            'throughput_rps': round(count / elapsed, 2),
+            'error_rate': round(route['errors'] / count, 4) if count else 0.0,
+            'statuses': route['statuses']
+        }
+
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(total_requests / elapsed, 2),
+        'error_rate': round(total_errors / total_requests, 4) if total_requests else 0.0,
+        'routes': routes
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change in throughput and p95/p99 per (concurrency, route) against a previous report"""
+    baseline_levels = {level['concurrency']: level for level in baseline.get('levels', [])}
+    deltas = {}
+    for level in current['levels']:
+        previous = baseline_levels.get(level['concurrency'])
+        if not previous:
+            continue
+        for name, route in level['routes'].items():
+            before = previous['routes'].get(name)
+            if not before:
+                continue
+            deltas.setdefault(str(level['concurrency']), {})[name] = {
+                metric: _relative_change(before[metric], route[metric])
+                for metric in ('throughput_rps', 'p95_ms', 'p99_ms')
+            }
+            deltas[str(level['concurrency'])][name]['error_rate'] = round(route['error_rate'] - before['error_rate'], 4)
+    return {'baseline': baseline.get('target'), 'relative_change': deltas}
+
+def _relative_change(before: float, after: float) -> Optional[float]:
+    return round((after - before) / before, 3) if before else None
+
+async def sweep(base_url: str, args: argparse.Namespace, mix: Dict[str, float]) -> List[Dict[str, Any]]:
+    levels = []
+    for concurrency in args.concurrency:
+        if args.warmup:
+            await run_level(base_url, concurrency, args.warmup, mix, args.users, args.seed, args.timeout)
+        levels.append(await run_level(base_url, concurrency, args.duration, mix, args.users, args.seed, args.timeout))
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main', help='Entry point to start locally (main, minimal_main, simple_main)')
+    parser.add_argument('--url', help='Target an already running service instead of starting one')
+    parser.add_argument('--concurrency', default='1,4,16', type=lambda v: [int(c) for c in v.split(',')],
+                        help='Comma-separated concurrency levels to sweep')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds measured per concurrency level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each level')
+    parser.add_argument('--mix', help=f"Traffic weights, e.g. adaptive=5,compatibility=1 (classes: {', '.join(DEFAULT_MIX)})")
+    parser.add_argument('--users', type=int, default=1000, help='Distinct simulated users')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    parser.add_argument('--compare', help='Previous JSON report to diff against')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.url:
+        target = args.url
+        levels = asyncio.run(sweep(args.url, args, mix))
+    else:
+        target = f"{args.module}.py"
+        with running_service(args.module) as base_url:
+            levels = asyncio.run(sweep(base_url, args, mix))
+
+    report = {
+        'target': target,
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'mix': mix,
+        'levels': levels
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Publishing daily picks to memcached, and reading them there instead of over HTTP.
+
+Publishes --couples synthetic daily picks (two keys per couple) one `set` per round trip on a
+single connection, then in pipelined batches over a pool, and reports items/second for each.
+Then starts the service with MEMCACHED_URL pointing at the same server and compares reading a
+pick with GET /daily/{user}/{partner} over HTTP against a `get` of the published key, the read
+new-backend/src/services/mlResults.js tries first (timed here from Python, not from node). It also checks that a published compatibility result reads back as the JSON object
+the backend parses. Uses --server if given, otherwise starts the backend's stand-in
+(node new-backend/start-memcached.js) on a free port.
+
+    python benchmarks/memcached_publish_bench.py --couples 50000 --reads 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+import httpx
+
+from common import SERVICE_DIR, free_port, latency_summary, running_service
+
+sys.path.insert(0, SERVICE_DIR)
+
+STANDIN = os.path.join(os.path.dirname(SERVICE_DIR), 'new-backend', 'start-memcached.js')
+
+@contextmanager
+def memcached_server(server: Optional[str]) -> Iterator[str]:
+    if server:
+        yield server
+        return
+    port = free_port()
+    process = subprocess.Popen(['node', STANDIN], env=dict(os.environ, MEMCACHED_PORT=str(port)),
+                               stdout=subprocess.DEVNULL)
+    try:
+        time.sleep(0.5)
+        yield f"127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def daily_rows(couples: int, day):
+    games = ['this_or_that', 'love_language_quiz', 'memory_lane']
+    return [{'couple_key': f"user{couple}_user{couple}p", 'day': day,
+             'question': {'id': f"q{couple % 300}", 'text': 'What made you smile today?', 'category': 'fun'},
+             'tip': 'Plan a walk somewhere new this week', 'games': random.sample(games, 2)}
+            for couple in range(couples)]
+
+async def publish_rate(server: str, rows, pool_size: int, batch_size: int) -> dict:
+    from app.memcached import MemcachedPublisher
+
+    publisher = MemcachedPublisher(server, pool_size=pool_size, batch_size=batch_size)
+    items = publisher.daily_items(rows)
+    started = time.perf_counter()
+    if batch_size == 1:
+        # One round trip per set, the way a per-result cache.set would write them
+        for item in items:
+            await publisher.publish([item])
+    else:
+        await publisher.publish(items)
+    seconds = time.perf_counter() - started
+    await publisher.drain()
+    return {'pool_size': pool_size, 'batch_size': batch_size, 'items': len(items), 'stored': publisher.published,
+            'seconds': round(seconds, 3), 'items_per_second': round(len(items) / seconds, 1)}
+
+async def read_latencies(base_url: str, server: str, couples: int, reads: int, day) -> dict:
+    from app.memcached import MemcachedPool, daily_key
+
+    host, port = server.rsplit(':', 1)
+    pool = MemcachedPool(host, int(port), size=1)
+    sample = [random.randrange(couples) for _ in range(reads)]
+    http_ms, memcached_ms = [], []
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for couple in sample:
+            started = time.perf_counter()
+            response = await client.get(f"/daily/user{couple}/user{couple}p", params={'day': day.isoformat()})
+            http_ms.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+        # The service published each pick it served; read them back the way the backend would
+        await asyncio.sleep(0.5)
+        hits = 0
+        for couple in sample:
+            started = time.perf_counter()
+            values = await pool.get_many([daily_key(f"user{couple}_user{couple}p", day).encode()])
+            memcached_ms.append((time.perf_counter() - started) * 1000)
+            hits += bool(values)
+        publish_stats = (await client.get('/stats/memcached')).json()
+    await pool.close()
+    return {'http': latency_summary(http_ms), 'memcached': latency_summary(memcached_ms),
+            'memcached_hit_rate': round(hits / len(sample), 3), 'service_publisher': publish_stats}
+
+async def compatibility_roundtrip(base_url: str, server: str) -> dict:
+    """POST /analyze-compatibility for a couple and check the published value parses back to an object"""
+    from app.memcached import MemcachedPool, compatibility_key
+
+    host, port = server.rsplit(':', 1)
+    pool = MemcachedPool(host, int(port), size=1)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post('/analyze-compatibility', json={
+            'user1_answers': {'communication': {'q1': 4}, 'values': {'q3': 5}},
+            'user2_answers': {'communication': {'q1': 3}, 'values': {'q3': 2}},
+            'user_id': 'user1p', 'partner_id': 'user1'})
+        response.raise_for_status()
+    await asyncio.sleep(0.5)
+    key = compatibility_key('user1_user1p').encode()
+    raw = (await pool.get_many([key])).get(key)
+    await pool.close()
+    if raw is None:
+        raise RuntimeError(f"{key.decode()} was not published")
+    stored = json.loads(raw)
+    if not isinstance(stored, dict) or stored != response.json():
+        raise RuntimeError(f"{key.decode()} does not hold the response object: {raw[:200]!r}")
+    return {'key': key.decode(), 'fields': sorted(stored)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', help='host:port of a running memcached (default: start the node stand-in)')
+    parser.add_argument('--couples', type=int, default=50000)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--reads', type=int, default=2000, help='Daily pick reads compared over HTTP and memcached')
+    parser.add_argument('--module', default='main', help='Entry point module to serve')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    random.seed(7)
+    day = datetime.utcnow().date() + timedelta(days=1)
+    rows = daily_rows(args.couples, day)
+    report = {'config': vars(args)}
+    with memcached_server(args.server) as server:
+        report['one_set_per_round_trip'] = asyncio.run(publish_rate(server, rows, 1, 1))
+        report['pipelined'] = asyncio.run(publish_rate(server, rows, args.pool_size, args.batch_size))
+        env = {'MEMCACHED_URL': server, 'PERSIST_GAME_RESULTS': '0', 'ID_REGISTRY_PATH': '', 'SNAPSHOT_PATH': '',
+               'DAILY_BATCH_HOUR': ''}
+        with running_service(args.module, env=env) as base_url:
+            report['backend_read'] = asyncio.run(read_latencies(base_url, server, args.couples, args.reads, day))
+            report['compatibility_published'] = asyncio.run(compatibility_roundtrip(base_url, server))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Total memory of N workers: `uvicorn --workers N` against preload mode (python -m app.preload).
+
+Starts each server in turn, sends the same warm-up traffic (every engine is exercised at least
+once per worker), then sums memory over the whole process tree. RSS counts a shared page
+once per process that maps it, so PSS (each shared page split between its users) is the
+figure that adds up to what the machine actually spends; USS is the memory private to each
+process. Linux only (reads /proc/<pid>/smaps_rollup).
+
+    python benchmarks/preload_rss.py --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def descendants(root: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    found, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        found.append(pid)
+        stack.extend(children.get(pid, []))
+    return found
+
+def memory(pid: int) -> Dict[str, int]:
+    """rss/pss/uss in bytes from smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) * 1024
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+def request(port: int, method: str, path: str, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read()
+
+def wait_healthy(port: int, timeout: float = 120.0) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            request(port, 'GET', '/health')
+            return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not become healthy")
+
+def warm_up(port: int, rounds: int):
+    """Enough requests that every worker has served every engine (connections are spread by the kernel)"""
+    for i in range(rounds):
+        user, partner = f"user_{i % 50}", f"user_{(i + 1) % 50}"
+        request(port, 'POST', '/questions/adaptive', {'user_id': user, 'partner_id': partner, 'count': 5})
+        request(port, 'POST', '/questions/generate', {'user_id': user, 'partner_id': partner, 'count': 3})
+        request(port, 'POST', '/analyze-communication', {'messages': ['I love planning trips with you', 'not happy about work']})
+        request(port, 'POST', '/analyze-sentiment', {'text': 'I really appreciate you'})
+        request(port, 'POST', '/questions/recommend', {'user_id': user, 'partner_id': partner, 'answered_questions': []})
+        request(port, 'POST', '/games/submit-response', {
+            'user_id': user, 'partner_id': partner,
+            'game_data': {'score': 0.7, 'difficulty': 'medium', 'engagement_score': 0.8, 'question_ids': ['comm_1', 'comm_2']}
+        })
+
+def measure(command: List[str], env: Dict[str, str], port: int, rounds: int, settle: float) -> Dict:
+    process = subprocess.Popen(command, cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        boot_seconds = wait_healthy(port)
+        warm_up(port, rounds)
+        time.sleep(settle)
+        processes = {}
+        for pid in descendants(process.pid):
+            try:
+                processes[pid] = memory(pid)
+            except OSError:
+                continue
+        totals = {key: sum(usage[key] for usage in processes.values()) for key in ('rss', 'pss', 'uss')}
+        return {
+            'boot_seconds': round(boot_seconds, 2),
+            'processes': len(processes),
+            'total_mb': {key: round(value / 2 ** 20, 1) for key, value in totals.items()},
+            'per_process_pss_mb': sorted(round(usage['pss'] / 2 ** 20, 1) for usage in processes.values())
+        }
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=40, help='Warm-up rounds (each hits every engine once)')
+    parser.add_argument('--settle', type=float, default=2.0, help='Seconds to wait after warm-up before measuring')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    report = {'workers': args.workers}
+    for mode in ('uvicorn', 'preload'):
+        directory = tempfile.mkdtemp()
+        # uvicorn's workers are daemonic and cannot start the sentiment process pool, so both modes use threads
+        env = dict(os.environ, PERSIST_GAME_RESULTS='0', ENGINE_POOL_SENTIMENT='thread',
+                   ID_REGISTRY_PATH=os.path.join(directory, 'ids.tsv'), SNAPSHOT_PATH=os.path.join(directory, 'state.snap'))
+        port = free_port()
+        if mode == 'uvicorn':
+            command = [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+                       '--workers', str(args.workers), '--log-level', 'warning']
+        else:
+            command = [sys.executable, '-m', 'app.preload', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+                       '--workers', str(args.workers), '--log-level', 'warning']
+        report[mode] = measure(command, env, port, args.rounds, args.settle)
+
+    report['pss_saved_mb'] = round(report['uvicorn']['total_mb']['pss'] - report['preload']['total_mb']['pss'], 1)
+    report['pss_saved_percent'] = round(100 * report['pss_saved_mb'] / report['uvicorn']['total_mb']['pss'], 1)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
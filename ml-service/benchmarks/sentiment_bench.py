@@ -0,0 +1,187 @@
+"""Throughput of the compiled sentiment lexicon against the previous implementations.
+
+Compares messages/second for:
+  - SentimentAnalyzer.analyze: the old per-message re.sub + set lookups vs the compiled lexicon
+  - /analyze-communication scoring: the old list-scan lexicon in main.py vs the compiled lexicon
+  - both, with synthetic lexicons of growing size: the compiled pass costs the same at
+    hundreds or hundreds of thousands of entries, the list scan grows with the lexicon
+
+    python benchmarks/sentiment_bench.py --messages 20000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lexicon import DEFAULT_LEXICON_PATH, CompiledLexicon, _read_entries, load_lexicon
+from app.models import SentimentResponse
+from app.sentiment import SentimentAnalyzer
+
+MESSAGES = [
+    "I love how you made dinner tonight, thank you so much",
+    "I'm not happy about how the weekend went",
+    "Can we talk about the plans for next year?",
+    "I felt really upset when you didn't call",
+    "You're amazing, I appreciate you so much",
+    "Work was exhausting and I'm so stressed",
+    "Not bad at all, actually kind of fun!",
+    "I miss you, can't wait to see you",
+    "Why do you never listen to me? I'm fed up.",
+    "Let's try that new place on Friday"
+]
+
+# --- previous implementations, kept here as the baseline --------------------------------------
+
+LEGACY_POSITIVE = {
+    'love', 'happy', 'joy', 'amazing', 'wonderful', 'great', 'fantastic', 'excited', 'grateful', 'blessed',
+    'perfect', 'beautiful', 'awesome', 'incredible', 'thrilled', 'delighted', 'content', 'peaceful', 'warm',
+    'caring', 'supportive', 'understanding', 'romantic', 'sweet', 'kind'
+}
+LEGACY_NEGATIVE = {
+    'sad', 'angry', 'frustrated', 'disappointed', 'hurt', 'upset', 'mad', 'annoyed', 'worried', 'stressed',
+    'anxious', 'confused', 'lonely', 'tired', 'exhausted', 'overwhelmed', 'distant', 'cold', 'harsh',
+    'critical', 'judgmental', 'impatient', 'selfish', 'rude', 'mean'
+}
+LEGACY_EMOTIONS = {
+    'joy': ['happy', 'joyful', 'excited', 'thrilled', 'delighted', 'elated'],
+    'love': ['love', 'adore', 'cherish', 'treasure', 'romantic', 'affection'],
+    'gratitude': ['grateful', 'thankful', 'blessed', 'appreciate', 'lucky'],
+    'sadness': ['sad', 'disappointed', 'hurt', 'lonely', 'melancholy'],
+    'anger': ['angry', 'mad', 'frustrated', 'annoyed', 'irritated', 'furious'],
+    'anxiety': ['worried', 'anxious', 'nervous', 'stressed', 'concerned', 'tense'],
+    'surprise': ['surprised', 'shocked', 'amazed', 'astonished', 'stunned'],
+    'trust': ['trust', 'secure', 'safe', 'confident', 'reliable', 'dependable']
+}
+
+def legacy_analyze(text: str) -> SentimentResponse:
+    """SentimentAnalyzer.analyze before the compiled lexicon"""
+    words = re.sub(r'[^\w\s]', '', text.lower()).split()
+    positive = sum(1 for word in words if word in LEGACY_POSITIVE)
+    negative = sum(1 for word in words if word in LEGACY_NEGATIVE)
+    if positive + negative == 0 or not words:
+        sentiment, confidence = 'neutral', 0.5
+    else:
+        sentiment_score = (positive - negative) / len(words)
+        if sentiment_score > 0.1:
+            sentiment, confidence = 'positive', min(0.9, 0.5 + abs(sentiment_score) * 2)
+        elif sentiment_score < -0.1:
+            sentiment, confidence = 'negative', min(0.9, 0.5 + abs(sentiment_score) * 2)
+        else:
+            sentiment, confidence = 'neutral', 0.6
+    emotions = {emotion: round(sum(1 for word in words if word in keywords) / max(len(words), 1), 2)
+                for emotion, keywords in LEGACY_EMOTIONS.items()}
+    return SentimentResponse(sentiment=sentiment, confidence=round(confidence, 2), emotions=emotions)
+
+LEGACY_COMMUNICATION_POSITIVE = ['love', 'happy', 'great', 'good', 'amazing', 'wonderful', 'thank', 'appreciate']
+LEGACY_COMMUNICATION_NEGATIVE = ['sad', 'angry', 'upset', 'bad', 'terrible', 'hate', 'frustrated']
+
+def legacy_score_communication(messages: List[str], positive_words: List[str] = LEGACY_COMMUNICATION_POSITIVE,
+                               negative_words: List[str] = LEGACY_COMMUNICATION_NEGATIVE) -> Dict[str, int]:
+    """score_communication's counting before the compiled lexicon: `word in list` per token"""
+    positive = negative = total = 0
+    for message in messages:
+        words = message.lower().split()
+        total += len(words)
+        positive += sum(1 for word in words if word in positive_words)
+        negative += sum(1 for word in words if word in negative_words)
+    return {'positive': positive, 'negative': negative, 'words': total}
+
+def compiled_score_communication(messages: List[str], lexicon: Optional[CompiledLexicon] = None) -> Dict[str, int]:
+    lexicon = lexicon or load_lexicon()
+    positive = negative = total = 0
+    for message in messages:
+        score = lexicon.score(message)
+        total += score.word_count
+        positive += score.positive_hits
+        negative += score.negative_hits
+    return {'positive': positive, 'negative': negative, 'words': total}
+
+# --- runner -----------------------------------------------------------------------------------
+
+def throughput(fn: Callable[[], Any], count: int, repeats: int) -> Dict[str, float]:
+    """Best-of-repeats messages per second"""
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return {'seconds': round(best, 4), 'messages_per_s': round(count / best, 1)}
+
+def synthetic_lexicon(rng: random.Random, size: int) -> Tuple[CompiledLexicon, List[str], List[str]]:
+    """The bundled lexicon plus `size` random words and phrases (a quarter of them multi-word)
+
+    Also returns the single words as positive/negative lists padded the same way, which is
+    what growing the old list-based lexicon would have looked like.
+    """
+    entries = _read_entries(DEFAULT_LEXICON_PATH)
+    positive_words = list(LEGACY_COMMUNICATION_POSITIVE)
+    negative_words = list(LEGACY_COMMUNICATION_NEGATIVE)
+    for index in range(size):
+        length = 1 if index % 4 else rng.randint(2, 4)
+        phrase = ' '.join(f"w{rng.randrange(size * 4)}" for _ in range(length))
+        value = rng.uniform(-3, 3)
+        entries.append(('term', phrase, value, ()))
+        if length == 1:
+            (positive_words if value > 0 else negative_words).append(phrase)
+    return CompiledLexicon(entries), positive_words, negative_words
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='Messages scored per measurement')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--lexicon-sizes', default='1000,10000,100000',
+                        type=lambda v: [int(size) for size in v.split(',')],
+                        help='Synthetic lexicon sizes for the scaling check')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [rng.choice(MESSAGES) for _ in range(args.messages)]
+    analyzer = SentimentAnalyzer()
+    analyze = SentimentAnalyzer.analyze.__wrapped__
+    count = len(messages)
+
+    report: Dict[str, Any] = {
+        'messages': count,
+        'lexicon_entries': load_lexicon().size,
+        'analyze': {
+            'legacy': throughput(lambda: [legacy_analyze(m) for m in messages], count, args.repeats),
+            # Unwrapped, so neither side pays for the @timed metrics
+            'compiled': throughput(lambda: [analyze(analyzer, m) for m in messages], count, args.repeats),
+            'compiled_score_only': throughput(lambda: [analyzer.lexicon.score(m) for m in messages], count, args.repeats)
+        },
+        'score_communication': {
+            'legacy': throughput(lambda: legacy_score_communication(messages), count, args.repeats),
+            'compiled': throughput(lambda: compiled_score_communication(messages), count, args.repeats)
+        },
+        'lexicon_scaling': {}
+    }
+    # The list scan is O(lexicon) per word, so it gets a smaller sample to finish in reasonable time
+    list_messages = messages[:max(1, count // 20)]
+    for size in args.lexicon_sizes:
+        started = time.perf_counter()
+        lexicon, positive_words, negative_words = synthetic_lexicon(rng, size)
+        build_seconds = time.perf_counter() - started
+        report['lexicon_scaling'][str(size)] = {
+            'entries': lexicon.size,
+            'build_seconds': round(build_seconds, 3),
+            'compiled': throughput(lambda: compiled_score_communication(messages, lexicon), count, args.repeats),
+            'legacy_list': throughput(lambda: legacy_score_communication(list_messages, positive_words, negative_words),
+                                      len(list_messages), 1)
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
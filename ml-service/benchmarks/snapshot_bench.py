@@ -0,0 +1,140 @@
+"""Snapshot save and restore time for engine state at production-like sizes.
+
+Fills the adaptive engine, topic tagger, follow-up engine and recommender profiles through
+their public APIs, saves a snapshot and restores it into fresh engines, with and without
+checksum verification, then serves a first request from the restored state.
+
+    python benchmarks/snapshot_bench.py --users 100000 --games 300000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adaptive_learning import AdaptiveLearningEngine
+from app.interning import IdRegistry
+from app.question_generator import QuestionGenerator
+from app.question_recommender import QuestionRecommender
+from app.snapshots import SnapshotStore
+from app.topic_tagger import TopicTagger
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+CATEGORIES = ['communication', 'intimacy', 'fun', 'values', 'future']
+MESSAGES = ['we should plan a vacation', 'money has been stressful', 'I loved our date night', 'work is a lot lately']
+
+def engines(registry: IdRegistry):
+    return {
+        'adaptive': AdaptiveLearningEngine(registry=registry),
+        'generator': QuestionGenerator(),
+        'topics': TopicTagger(),
+        'recommender': QuestionRecommender()
+    }
+
+def store_for(path: str, registry: IdRegistry, registered, verify: bool = True) -> SnapshotStore:
+    store = SnapshotStore(path, registry=registry, verify=verify)
+    for name, engine in registered.items():
+        store.register(name, engine)
+    return store
+
+def populate(registered, registry: IdRegistry, rng: random.Random, users: int, games: int, bank: int):
+    adaptive = registered['adaptive']
+    bank_ids = [question['id'] for questions in registered['recommender'].question_bank.values() for question in questions]
+    for _ in range(games):
+        user, partner = f"user_{rng.randrange(users)}", f"user_{rng.randrange(users)}"
+        asked = [f"q{rng.randrange(bank)}" for _ in range(5)]
+        adaptive.record_game_session(user, partner, {
+            'score': rng.random(), 'difficulty': rng.choice(DIFFICULTIES), 'category': rng.choice(CATEGORIES),
+            'engagement_score': rng.random(), 'question_ids': asked, 'responses': {question: 'a' for question in asked}
+        })
+    for couple in range(users // 2):
+        couple_id = registry.couple(f"user_{couple}", f"user_{couple + users // 2}")
+        registered['topics'].observe(couple_id, rng.sample(MESSAGES, 2))
+        registered['generator'].follow_ups.mark_seen(couple_id, [f"followup_{rng.randrange(10 ** 6)}" for _ in range(3)])
+        registered['recommender'].record_engagement(f"user_{couple}", f"user_{couple + users // 2}", rng.sample(bank_ids, 3), rng.random())
+
+def restore_only(path: str, registry_path: str, verify: bool) -> dict:
+    started = time.perf_counter()
+    registry = IdRegistry(registry_path)
+    registry_seconds = time.perf_counter() - started
+    restored = engines(registry)
+    started = time.perf_counter()
+    result = store_for(path, registry, restored, verify=verify).restore()
+    restore_seconds = time.perf_counter() - started
+    # The first request against the restored state touches the mapped pages it needs
+    started = time.perf_counter()
+    restored['adaptive'].get_learning_insights('user_1')
+    restored['adaptive'].select_questions('user_1', 'user_2', [{'id': f"q{i}"} for i in range(1000)])
+    first_request = time.perf_counter() - started
+    return {
+        'registry_replay_seconds': round(registry_seconds, 4),
+        'seconds': round(restore_seconds, 4),
+        'first_request_ms': round(first_request * 1000, 3),
+        'restored': result['restored'],
+        'rejected': result['rejected']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--games', type=int, default=300000)
+    parser.add_argument('--bank', type=int, default=10000, help='Distinct question ids in the games')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    parser.add_argument('--restore', help=argparse.SUPPRESS)
+    parser.add_argument('--registry', help=argparse.SUPPRESS)
+    parser.add_argument('--no-verify', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.restore:
+        print(json.dumps(restore_only(args.restore, args.registry, not args.no_verify)))
+        return
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'state.snap')
+    registry = IdRegistry()
+    registered = engines(registry)
+
+    started = time.perf_counter()
+    populate(registered, registry, rng, args.users, args.games, args.bank)
+    populate_seconds = time.perf_counter() - started
+
+    store = store_for(path, registry, registered)
+    started = time.perf_counter()
+    state = store.collect()
+    collect_seconds = time.perf_counter() - started
+    saved = store.write(state)
+
+    report = {
+        'config': vars(args),
+        'populate_seconds': round(populate_seconds, 2),
+        'collect_seconds': round(collect_seconds, 4),
+        'write_seconds': saved['seconds'],
+        'bytes': saved['bytes'],
+        'restore': {}
+    }
+    # Restores run in fresh processes, like a restart: a small heap, nothing in the page cache's favour but the OS
+    registry_path = os.path.join(directory, 'ids.tsv')
+    with open(registry_path, 'w', encoding='utf-8') as f:
+        for namespace, keys in registry.keys.items():
+            f.writelines(f"{namespace}\t{index}\t{json.dumps(key)}\n" for index, key in enumerate(keys))
+    for verify in (True, False):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--restore', path, '--registry', registry_path] + ([] if verify else ['--no-verify']),
+            capture_output=True, text=True, check=True
+        )
+        report['restore']['verified' if verify else 'unverified'] = json.loads(completed.stdout)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Soak test for the engines' in-process state.
+
+Simulates couples playing through the engine APIs for a simulated month and samples
+process RSS plus the deep size of each long-lived structure once per simulated day.
+Reports bytes per user, bytes per session and the daily growth rate of each structure,
+and flags structures that are still growing linearly at the end of the run (no eviction).
+
+    python benchmarks/soak_test.py --couples 500 --days 30 --sessions-per-day 2
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adaptive_learning import AdaptiveLearningEngine
+from app.game_results import GameResultsManager
+from app.learning_engine import LearningEngine
+from app.question_generator import QuestionGenerator
+from app.question_recommender import QuestionRecommender
+
+CATEGORIES = ['communication', 'intimacy', 'fun', 'deep', 'memories']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+def rss_bytes() -> int:
+    """Current resident set size; falls back to peak RSS where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def deep_size(root: Any) -> int:
+    """Total sys.getsizeof over everything reachable through containers, counting shared objects once"""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+    return total
+
+def linear_slope(xs: List[float], ys: List[float]) -> float:
+    """Least-squares slope of ys over xs"""
+    if len(xs) < 2:
+        return 0.0
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    if denominator == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator
+
+class Simulation:
+    def __init__(self, couples: int, seed: int):
+        self.rng = random.Random(seed)
+        self.couples = [(f"user_{2 * i}", f"user_{2 * i + 1}") for i in range(couples)]
+        self.adaptive = AdaptiveLearningEngine()
+        self.game_results = GameResultsManager()
+        self.learning = LearningEngine()
+        self.generator = QuestionGenerator()
+        self.recommender = QuestionRecommender()
+        self.all_questions = [q for questions in self.recommender.question_bank.values() for q in questions]
+        self.sessions_played = 0
+
+    def structures(self) -> Dict[str, Callable[[], Any]]:
+        """Long-lived engine state tracked by the soak test"""
+        return {
+            'GameResultsManager.game_sessions': lambda: self.game_results.game_sessions,
+            'GameResultsManager.couple_results': lambda: self.game_results.couple_results,
+            'AdaptiveLearningEngine.answered': lambda: [self.adaptive.answered.pool, self.adaptive.answered.slabs.columns],
+            'AdaptiveLearningEngine.question_history': lambda: [self.adaptive.question_history.pool,
+                                                                self.adaptive.question_history.slabs.columns,
+                                                                self.adaptive.couple_state.columns],
+            'AdaptiveLearningEngine.user_state': lambda: self.adaptive.user_state.columns,
+            'IdRegistry': lambda: [self.adaptive.registry.ids, self.adaptive.registry.keys, self.adaptive.registry.couples],
+            'LearningEngine.user_preferences': lambda: self.learning.user_preferences,
+            'LearningEngine.interaction_history': lambda: self.learning.interaction_history,
+            'QuestionGenerator.used_combinations': lambda: self.generator.used_combinations
+        }
+
+    def play_session(self, user_id: str, partner_id: str):
+        """One game played by a couple, going through the same engine calls the service would make"""
+        rng = self.rng
+        couple_id = f"{min(user_id, partner_id)}_{max(user_id, partner_id)}"
+        questions = self.adaptive.select_questions(user_id, partner_id, self.all_questions, count=5)
+        questions += self.generator.generate_questions(
+            self.adaptive.get_user_profile(user_id), self.adaptive.get_user_profile(partner_id), count=2
+        )
+
+        session_id = self.game_results.create_game_session(couple_id, rng.choice(['adaptive', 'this_or_that']), questions)
+        for player in (user_id, partner_id):
+            for question in questions:
+                answer = rng.choice(['A', 'B']) if question['type'] != 'open_ended' else 'we should talk more often'
+                self.game_results.submit_response(session_id, player, question['id'], answer)
+        results = self.game_results.complete_game_session(session_id)
+        score = results.get('summary', {}).get('compatibility_score', 0.5)
+
+        for player, partner in ((user_id, partner_id), (partner_id, user_id)):
+            game_data = {
+                'score': score,
+                'difficulty': rng.choice(DIFFICULTIES),
+                'category': rng.choice(CATEGORIES),
+                'engagement_score': rng.random(),
+                'question_ids': [question['id'] for question in questions],
+                'responses': {question['id']: rng.choice(['A', 'B']) for question in questions}
+            }
+            self.adaptive.record_game_session(player, partner, game_data)
+            self.learning.learn_from_interaction(player, game_data)
+
+        self.sessions_played += 1
+
+    def sample(self, day: int, started: float) -> Dict[str, Any]:
+        return {
+            'day': day,
+            'elapsed_s': round(time.perf_counter() - started, 2),
+            'sessions': self.sessions_played,
+            'rss_bytes': rss_bytes(),
+            'structures': {name: deep_size(getter()) for name, getter in self.structures().items()}
+        }
+
+def summarize(samples: List[Dict[str, Any]], users: int, baseline_rss: int) -> Dict[str, Any]:
+    days = [sample['day'] for sample in samples]
+    final = samples[-1]
+    sessions = max(final['sessions'], 1)
+    half = len(samples) // 2
+
+    structures = {}
+    for name in final['structures']:
+        sizes = [sample['structures'][name] for sample in samples]
+        early = linear_slope(days[:half + 1], sizes[:half + 1])
+        late = linear_slope(days[half:], sizes[half:])
+        structures[name] = {
+            'final_bytes': sizes[-1],
+            'bytes_per_user': round(sizes[-1] / users, 1),
+            'bytes_per_session': round(sizes[-1] / sessions, 1),
+            'growth_bytes_per_day': round(linear_slope(days, sizes), 1),
+            # Bounded structures level off (or oscillate under a cap); unbounded ones keep setting
+            # new highs at a similar rate late in the run
+            'unbounded': (late > 0 and late >= 0.5 * early
+                          and max(sizes[half:]) > 1.1 * max(sizes[:half + 1]))
+        }
+
+    rss_growth = linear_slope(days, [sample['rss_bytes'] for sample in samples])
+    return {
+        'rss_growth_bytes_per_day': round(rss_growth, 1),
+        'rss_bytes_per_user': round((final['rss_bytes'] - baseline_rss) / users, 1),
+        'rss_bytes_per_session': round((final['rss_bytes'] - baseline_rss) / sessions, 1),
+        'tracked_bytes_per_user': round(sum(s['final_bytes'] for s in structures.values()) / users, 1),
+        'unbounded_structures': [name for name, stats in structures.items() if stats['unbounded']],
+        'structures': structures
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--couples', type=int, default=200, help='Simulated couples (two users each)')
+    parser.add_argument('--days', type=int, default=30, help='Simulated days')
+    parser.add_argument('--sessions-per-day', type=float, default=1.5,
+                        help='Average games per couple per day (drawn per couple per day)')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    baseline_rss = rss_bytes()
+    simulation = Simulation(args.couples, args.seed)
+    started = time.perf_counter()
+    samples = [simulation.sample(0, started)]
+
+    for day in range(1, args.days + 1):
+        for user_id, partner_id in simulation.couples:
+            sessions_today = int(args.sessions_per_day)
+            if simulation.rng.random() < args.sessions_per_day - sessions_today:
+                sessions_today += 1
+            for _ in range(sessions_today):
+                simulation.play_session(user_id, partner_id)
+        samples.append(simulation.sample(day, started))
+        print(f"day {day:3d}: {simulation.sessions_played} sessions, "
+              f"rss {samples[-1]['rss_bytes'] / 2 ** 20:.1f} MiB", file=sys.stderr)
+
+    users = args.couples * 2
+    report = {
+        'config': {'couples': args.couples, 'users': users, 'days': args.days,
+                   'sessions_per_day': args.sessions_per_day, 'seed': args.seed},
+        'baseline_rss_bytes': baseline_rss,
+        'summary': summarize(samples, users, baseline_rss),
+        'samples': samples
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""A burst of heavy requests with and without admission control.
+
+Fires --spike heavy requests at once (compatibility and relationship insights with large payloads,
+each distinct so none are coalesced) with a client timeout like the backend's HTTP calls, while
+probing /health. Runs the service with ADMISSION_CONTROL_ENABLED=0 and =1 and reports, for each,
+how many requests were answered in time, timed out, were shed with 503 or got a degraded
+response, plus latency of the answered ones, of the shed ones and of /health. The client runs
+on the same machine, so give it spare cores or the timings include its own CPU contention.
+
+    python benchmarks/spike_bench.py --spike 400 --client-timeout 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from common import latency_summary, running_service
+
+CATEGORIES = ['communication', 'values', 'lifestyle', 'intimacy', 'goals', 'personality']
+
+def spike_payloads(count: int, answers: int, history: int) -> List[Dict[str, Any]]:
+    """Request bodies encoded up front, so the client's own JSON work does not skew the timings"""
+    payloads = []
+    for i in range(count):
+        if i % 2:
+            user_answers = {category: {f"q{j}": random.random() for j in range(answers)} for category in CATEGORIES}
+            body = {'user1_answers': user_answers, 'user2_answers': user_answers}
+            payloads.append({'path': '/analyze-compatibility', 'content': json.dumps(body).encode()})
+        else:
+            interactions = [{'type': 'game', 'score': random.random(), 'timestamp': '2026-09-01'} for _ in range(history)]
+            body = {'couple_id': str(i), 'interaction_history': interactions}
+            payloads.append({'path': '/insights/relationship', 'content': json.dumps(body).encode()})
+    return payloads
+
+async def send(client: httpx.AsyncClient, payload: Dict, timeout: float, counts: Dict[str, int],
+               latencies: Dict[str, List[float]]):
+    started = time.perf_counter()
+    try:
+        # A deadline on the whole request, like an axios timeout (httpx's own timeouts are per read)
+        response = await asyncio.wait_for(client.post(payload['path'], content=payload['content'], timeout=None), timeout)
+    except asyncio.TimeoutError:
+        counts['timed_out'] += 1
+        return
+    except httpx.HTTPError:
+        counts['error'] += 1
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if response.status_code == 503:
+        counts['shed'] += 1
+        latencies['shed'].append(elapsed_ms)
+    elif response.headers.get('x-degraded'):
+        counts['degraded'] += 1
+        latencies['shed'].append(elapsed_ms)
+    elif response.status_code == 200:
+        counts['ok'] += 1
+        latencies['ok'].append(elapsed_ms)
+    else:
+        counts['error'] += 1
+
+async def probe_health(client: httpx.AsyncClient, done: asyncio.Event, latencies: List[float], counts: Dict[str, int]):
+    while not done.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get('/health', timeout=2.0)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            counts['health_failures'] += 1
+        await asyncio.sleep(0.05)
+
+async def run_spike(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    payloads = spike_payloads(args.spike, args.answers, args.history)
+    counts = {'ok': 0, 'timed_out': 0, 'shed': 0, 'degraded': 0, 'error': 0, 'health_failures': 0}
+    latencies: Dict[str, List[float]] = {'ok': [], 'shed': []}
+    health_latencies: List[float] = []
+    done = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.spike + 4)
+    headers = {'Content-Type': 'application/json'}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers) as client, httpx.AsyncClient(base_url=base_url) as health_client:
+        # A few requests one at a time first, so the service has seen what a heavy request costs
+        for payload in spike_payloads(args.warm_up, args.answers, args.history):
+            await client.post(payload['path'], content=payload['content'], timeout=None)
+        prober = asyncio.create_task(probe_health(health_client, done, health_latencies, counts))
+        started = time.perf_counter()
+        await asyncio.gather(*[send(client, payload, args.client_timeout, counts, latencies) for payload in payloads])
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+        admission = (await health_client.get('/stats/admission')).json()
+    return {
+        'seconds': round(elapsed, 2),
+        'counts': counts,
+        'answered_latency': latency_summary(latencies['ok']),
+        'shed_latency': latency_summary(latencies['shed']),
+        'health_latency': latency_summary(health_latencies),
+        'heavy_class': admission['classes'].get('heavy')
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main', help='Entry point module to serve')
+    parser.add_argument('--spike', type=int, default=400, help='Heavy requests sent at once')
+    parser.add_argument('--client-timeout', type=float, default=2.0, help='Seconds before the client gives up on a request')
+    parser.add_argument('--answers', type=int, default=200, help='Answers per category per compatibility call')
+    parser.add_argument('--history', type=int, default=2000, help='Interactions per insights call')
+    parser.add_argument('--warm-up', type=int, default=6, help='Sequential requests before the spike')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='ADMISSION_WAIT_BUDGET_MS for the admission-controlled run')
+    parser.add_argument('--output', help='Write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    report = {'config': vars(args)}
+    for name, enabled in [('without', '0'), ('with', '1')]:
+        env = {'ADMISSION_CONTROL_ENABLED': enabled, 'ADMISSION_WAIT_BUDGET_MS': str(args.budget_ms),
+               'PERSIST_GAME_RESULTS': '0', 'ID_REGISTRY_PATH': '', 'SNAPSHOT_PATH': ''}
+        with running_service(args.module, env=env) as base_url:
+            report[name] = asyncio.run(run_spike(base_url, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
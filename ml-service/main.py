@@ -1,14 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import os
 import uvicorn
 import random
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from app.adaptive_learning import AdaptiveLearningEngine
+from app.admission import AdmissionController, AdmissionMiddleware
+from app.batch import BatchDispatcher, BatchRequest, RawJSON
+from app.compatibility import CompatibilityAnalyzer
+from app.daily_picks import DailyPicks, RunInProgress
+from app.database import db, get_db
+from app.executor import EngineExecutor
+from app.inference_batcher import InferenceBatcher
+from app.interning import IdRegistry
+from app.lexicon import load_lexicon
+from app.memcached import MemcachedPublisher
+from app.metrics import MetricsMiddleware, metrics
+from app.profiling import ProfilingMiddleware, memory_tracker, profile_store, require_admin, sample_stacks
+from app.aggregates import PerformanceIngestor, insight_inputs, load_aggregate
+from app.performance import engagement_trend
+from app.models import (
+    CompatibilityRequest, QuestionRecommendationRequest, RelationshipInsightRequest, SentimentRequest
+)
+from app.question_generator import QuestionGenerator
+from app.question_recommender import QuestionRecommender
+from app.recommendation import RecommendationEngine
+from app.response_cache import ResponseCache
+from app.sentiment import SentimentAnalyzer, score_communication
+from app.single_flight import SingleFlight
+from app.snapshots import SnapshotError, SnapshotStore
+from app.topic_tagger import TopicTagger
 
 app = FastAPI(title="Echo ML Service", version="1.0.0")
 
+# Sheds work on model and template routes once their queues would outlast the wait budget;
+# innermost, so shed requests still get CORS headers and show up in the request metrics
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -16,6 +49,151 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+# User, couple and question ids map to dense ints; the log keeps them stable across restarts ('' = memory only)
+id_registry = IdRegistry(os.environ.get("ID_REGISTRY_PATH", "echo_ml_ids.tsv") or None)
+adaptive_engine = AdaptiveLearningEngine(registry=id_registry)
+compatibility_analyzer = CompatibilityAnalyzer()
+question_recommender = QuestionRecommender()
+
+# Engine work runs off the event loop so /health stays responsive under load.
+# NumPy/sklearn engines release the GIL and share one instance on the thread pool;
+# pure-Python scoring gets its own copy in each process pool worker.
+engine_executor = EngineExecutor()
+engine_executor.register('adaptive', adaptive_engine, pool='thread')
+engine_executor.register('compatibility', compatibility_analyzer, pool='thread')
+engine_executor.register('recommender', question_recommender, pool='thread')
+engine_executor.register('sentiment', SentimentAnalyzer, pool='process')
+
+# Concurrent requests share one predict_proba call per batching window
+difficulty_batcher = InferenceBatcher(
+    lambda: adaptive_engine.difficulty_classifier if adaptive_engine.is_trained else None,
+    executor=engine_executor
+)
+
+# Chat messages are tagged once as they arrive; contextual questions read the decayed per-couple topics
+question_generator = QuestionGenerator()
+topic_tagger = TopicTagger()
+# Follow-ups for a whole session are one call; the keyphrase cache and seen-sets are shared across requests
+engine_executor.register('generator', question_generator, pool='thread')
+
+def couple_key(user_id: str, partner_id: str) -> int:
+    return id_registry.couple(user_id, partner_id)
+
+# Template-driven question payloads are identical per normalized (category, count)
+response_cache = ResponseCache()
+
+# Both partners opening the dashboard at once send the same compatibility/insights/recommend calls;
+# identical requests in flight together share one engine call
+single_flight = SingleFlight()
+
+metrics.add_collector(engine_executor.metric_families)
+metrics.add_collector(lambda: difficulty_batcher.metric_families('difficulty'))
+metrics.add_collector(response_cache.metric_families)
+metrics.add_collector(single_flight.metric_families)
+metrics.add_collector(admission.metric_families)
+
+# Submitted game results are written to user_performance / user_aggregates in batches, off the request path
+PERSIST_GAME_RESULTS = os.environ.get("PERSIST_GAME_RESULTS", "1") != "0"
+performance_ingestor = PerformanceIngestor()
+
+RETRAIN_EVERY_SESSIONS = int(os.environ.get("ADAPTIVE_RETRAIN_EVERY", 50))
+sessions_since_training = 0
+
+# Learned engine state is saved periodically and at shutdown, and mapped back in at startup ('' disables)
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "echo_ml_state.snap")
+snapshot_store = SnapshotStore(SNAPSHOT_PATH, registry=id_registry) if SNAPSHOT_PATH else None
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", 300))
+snapshot_task = None
+# Fire-and-forget startup work; the loop only keeps weak references to tasks
+background_tasks: Set[asyncio.Task] = set()
+if snapshot_store:
+    snapshot_store.register('adaptive', adaptive_engine)
+    snapshot_store.register('generator', question_generator)
+    snapshot_store.register('topics', topic_tagger)
+    snapshot_store.register('recommender', question_recommender)
+
+# Preload mode (python -m app.preload) builds engine state once in a master process and forks the workers.
+# The adaptive engine's per-user, per-question and per-couple state then lives in shared memory; only worker 0
+# writes snapshots.
+PRELOAD_SHARED_USERS = int(os.environ.get("PRELOAD_SHARED_USERS", 1000000))
+PRELOAD_SHARED_QUESTIONS = int(os.environ.get("PRELOAD_SHARED_QUESTIONS", 200000))
+PRELOAD_SHARED_COUPLES = int(os.environ.get("PRELOAD_SHARED_COUPLES", 500000))
+PRELOAD_SHARED_SET_SLOTS = int(os.environ.get("PRELOAD_SHARED_SET_SLOTS", 16000000))
+preloaded = False
+snapshot_writer = True
+
+# Precomputed results are also written to the backend's memcached (MEMCACHED_URL) under agreed keys,
+# so most of its ML reads never reach this service
+memcached_publisher = MemcachedPublisher()
+metrics.add_collector(memcached_publisher.metric_families)
+
+# Each couple's daily question, tip and games are planned for the next day by a nightly batch (DAILY_BATCH_HOUR,
+# UTC; '' leaves it to cron running `python -m app.daily_picks`) and served from the daily_picks table
+daily_picks = DailyPicks(adaptive_engine, question_recommender, RecommendationEngine(), publisher=memcached_publisher)
+DAILY_BATCH_HOUR = os.environ.get("DAILY_BATCH_HOUR", "2")
+daily_batch_task = None
+
+async def precompute_daily_picks_nightly():
+    hour = int(DAILY_BATCH_HOUR)
+    while True:
+        now = datetime.utcnow()
+        next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            report = await daily_picks.job.run(next_run.date() + timedelta(days=1))
+            print(f"Planned daily picks for {report['planned']} couples ({report['couples_per_second']}/s)")
+        except RunInProgress:
+            # Another worker, replica or cron job took tonight's run
+            pass
+        except Exception as e:
+            print(f"Error precomputing daily picks: {e}")
+
+def preload_engines():
+    """Build read-only state and restore learned state once, in the master, before workers are forked"""
+    global preloaded
+    load_lexicon()
+    question_recommender.duplicate_index()
+    if snapshot_store:
+        snapshot_store.restore()
+    adaptive_engine.train_models()
+    if id_registry.path:
+        id_registry.share()
+        adaptive_engine.share_state(PRELOAD_SHARED_USERS, PRELOAD_SHARED_QUESTIONS, PRELOAD_SHARED_COUPLES,
+                                    PRELOAD_SHARED_SET_SLOTS)
+    else:
+        print("ID_REGISTRY_PATH is empty; preloaded workers keep separate per-user state")
+    preloaded = True
+
+def preload_worker_started(worker: int):
+    global snapshot_writer
+    snapshot_writer = worker == 0
+
+def preload_finished():
+    """Called by the master once every worker has exited"""
+    adaptive_engine.release_shared_state()
+
+async def snapshot_periodically():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        # One process writes (SnapshotStore.claim_writer); the others retry, and take over once it exits
+        if not snapshot_store.claim_writer():
+            continue
+        try:
+            await snapshot_store.save_async()
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+
+async def predict_difficulty(user_id: str) -> str:
+    """Optimal difficulty from the batched model, falling back to the profile heuristic"""
+    probabilities = await difficulty_batcher.predict_proba(adaptive_engine.user_features(user_id))
+    if probabilities is None:
+        return adaptive_engine.get_optimal_difficulty(user_id)
+    return adaptive_engine.difficulty_from_proba(probabilities)
 
 # Pydantic Models
 class AdaptiveQuestionsRequest(BaseModel):
@@ -33,6 +211,24 @@ class QuestionGenerateRequest(BaseModel):
 
 class CommunicationAnalysisRequest(BaseModel):
     messages: List[str] = Field(default=[], description="List of messages to analyze")
+    user_id: Optional[str] = Field(default=None, description="Sender; with partner_id, the messages update the couple's topics")
+    partner_id: Optional[str] = None
+
+class ContextualQuestionsRequest(BaseModel):
+    user_id: str
+    partner_id: str
+    count: Optional[int] = 3
+
+class DailyPickRequest(BaseModel):
+    user_id: str
+    partner_id: str
+    day: Optional[date] = None
+
+class FollowUpQuestionsRequest(BaseModel):
+    answers: List[Dict[str, Any]] = Field(default=[], description="Session answers as {'question': {...}, 'answer': str}")
+    user_id: Optional[str] = Field(default=None, description="With partner_id, follow-ups the couple has already seen are skipped")
+    partner_id: Optional[str] = None
+    per_answer: Optional[int] = 1
 
 # Question Templates
 QUESTION_TEMPLATES = {
@@ -81,132 +277,253 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "ml-service", "version": "1.0.0"}
 
+def reload_question_templates(templates: Dict[str, List[str]]):
+    """Swap in a new question bank and drop cached question responses built from the old one"""
+    QUESTION_TEMPLATES.clear()
+    QUESTION_TEMPLATES.update(templates)
+    response_cache.invalidate('/questions/adaptive')
+    response_cache.invalidate('/questions/generate')
+
+def build_adaptive_questions(category: str, count: int, difficulty: str) -> Dict[str, Any]:
+    # Get questions from templates
+    templates = QUESTION_TEMPLATES.get(category, QUESTION_TEMPLATES['communication'])
+    
+    # Generate questions
+    questions = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        questions.append({
+            "id": i + 1,
+            "text": template,
+            "category": category,
+            "type": "multiple_choice",
+            "generated_at": datetime.now().isoformat()
+        })
+    
+    return {
+        "questions": questions,
+        "learning_based": True,
+        "user_preferences": {"category": category, "difficulty": difficulty}
+    }
+
+async def adaptive_questions_entry(request: AdaptiveQuestionsRequest) -> Tuple[Hashable, Callable[[], Dict[str, Any]]]:
+    """Response cache key and payload builder for an adaptive questions request"""
+    category = (request.category or 'communication').strip().lower()
+    count = min(request.count or 5, 10)
+    difficulty = await predict_difficulty(request.user_id)
+
+    key = ResponseCache.make_key('/questions/adaptive', category=category, count=count, difficulty=difficulty)
+    return key, lambda: build_adaptive_questions(category, count, difficulty)
+
 @app.post("/questions/adaptive")
-async def get_adaptive_questions(request: AdaptiveQuestionsRequest):
+async def get_adaptive_questions(request: AdaptiveQuestionsRequest, http_request: Request):
     try:
-        category = request.category or 'communication'
-        count = min(request.count or 5, 10)
-        
-        # Get questions from templates
-        templates = QUESTION_TEMPLATES.get(category, QUESTION_TEMPLATES['communication'])
-        
-        # Generate questions
-        questions = []
-        for i in range(count):
-            template = templates[i % len(templates)]
-            questions.append({
-                "id": i + 1,
-                "text": template,
-                "category": category,
-                "type": "multiple_choice",
-                "generated_at": datetime.now().isoformat()
-            })
-        
-        return {
-            "questions": questions,
-            "learning_based": True,
-            "user_preferences": {"category": category}
-        }
+        key, builder = await adaptive_questions_entry(request)
+        return response_cache.respond(http_request, key, builder)
     except Exception as e:
-        return {
-            "questions": [
-                {"id": 1, "text": "What's your favorite thing about our relationship?", "category": "love"},
-                {"id": 2, "text": "How can we communicate better?", "category": "communication"}
-            ],
-            "learning_based": False,
-            "error": str(e)
-        }
+        return dict(fallback_adaptive_questions(), error=str(e))
+
+async def batch_adaptive_questions(request: AdaptiveQuestionsRequest):
+    try:
+        key, builder = await adaptive_questions_entry(request)
+        return RawJSON(response_cache.get_or_build(key, builder)[0])
+    except Exception as e:
+        return dict(fallback_adaptive_questions(), error=str(e))
+
+def fallback_adaptive_questions() -> Dict[str, Any]:
+    return {
+        "questions": [
+            {"id": 1, "text": "What's your favorite thing about our relationship?", "category": "love"},
+            {"id": 2, "text": "How can we communicate better?", "category": "communication"}
+        ],
+        "learning_based": False
+    }
+
+def build_generated_questions(category: str, count: int) -> Dict[str, Any]:
+    templates = QUESTION_TEMPLATES.get(category, QUESTION_TEMPLATES['communication'])
+    
+    questions = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        questions.append({
+            "id": i + 1,
+            "text": template,
+            "category": category,
+            "type": "open_ended",
+            "generated_by": "ml_service",
+            "created_at": datetime.now().isoformat()
+        })
+    
+    return {
+        "questions": questions,
+        "generated_at": datetime.now().isoformat(),
+        "personalization_level": "adaptive",
+        "learning_based": True
+    }
+
+def generated_questions_entry(request: QuestionGenerateRequest) -> Tuple[Hashable, Callable[[], Dict[str, Any]]]:
+    """Response cache key and payload builder for a question generation request"""
+    category = (request.category or 'general').strip().lower()
+    count = min(request.count or 5, 10)
+
+    key = ResponseCache.make_key('/questions/generate', category=category, count=count)
+    return key, lambda: build_generated_questions(category, count)
 
 @app.post("/questions/generate")
-async def generate_questions(request: QuestionGenerateRequest):
+async def generate_questions(request: QuestionGenerateRequest, http_request: Request):
     try:
-        category = request.category or 'general'
-        count = min(request.count or 5, 10)
-        
-        templates = QUESTION_TEMPLATES.get(category, QUESTION_TEMPLATES['communication'])
-        
-        questions = []
-        for i in range(count):
-            template = templates[i % len(templates)]
-            questions.append({
-                "id": i + 1,
-                "text": template,
-                "category": category,
-                "type": "open_ended",
-                "generated_by": "ml_service",
-                "created_at": datetime.now().isoformat()
-            })
-        
-        return {
-            "questions": questions,
-            "generated_at": datetime.now().isoformat(),
-            "personalization_level": "adaptive",
-            "learning_based": True
-        }
+        key, builder = generated_questions_entry(request)
+        return response_cache.respond(http_request, key, builder)
     except Exception as e:
-        return {
-            "questions": [
-                {"id": 1, "text": "What's something you appreciate about our relationship?", "category": "love"},
-                {"id": 2, "text": "How can we make tomorrow better together?", "category": "future"}
-            ],
-            "generated_at": datetime.now().isoformat(),
-            "personalization_level": "basic",
-            "learning_based": False
-        }
+        return fallback_generated_questions()
+
+async def batch_generated_questions(request: QuestionGenerateRequest):
+    try:
+        key, builder = generated_questions_entry(request)
+        return RawJSON(response_cache.get_or_build(key, builder)[0])
+    except Exception as e:
+        return fallback_generated_questions()
+
+def fallback_generated_questions() -> Dict[str, Any]:
+    return {
+        "questions": [
+            {"id": 1, "text": "What's something you appreciate about our relationship?", "category": "love"},
+            {"id": 2, "text": "How can we make tomorrow better together?", "category": "future"}
+        ],
+        "generated_at": datetime.now().isoformat(),
+        "personalization_level": "basic",
+        "learning_based": False
+    }
 
 @app.post("/analyze-communication")
 async def analyze_communication(request: CommunicationAnalysisRequest):
     try:
-        messages = request.messages
-        
-        # Simple sentiment analysis
-        positive_words = ['love', 'happy', 'great', 'good', 'amazing', 'wonderful', 'thank', 'appreciate']
-        negative_words = ['sad', 'angry', 'upset', 'bad', 'terrible', 'hate', 'frustrated']
-        
-        positive_count = 0
-        negative_count = 0
-        total_words = 0
-        
-        for message in messages:
-            if isinstance(message, str):
-                words = message.lower().split()
-                total_words += len(words)
-                positive_count += sum(1 for word in words if word in positive_words)
-                negative_count += sum(1 for word in words if word in negative_words)
-        
-        # Calculate scores
-        if total_words > 0:
-            positive_ratio = positive_count / total_words
-            negative_ratio = negative_count / total_words
-            communication_health = max(0.3, min(0.9, 0.5 + positive_ratio - negative_ratio))
-        else:
-            communication_health = 0.5
-        
-        # Determine overall sentiment
-        if positive_count > negative_count:
-            sentiment = 'positive'
-        elif negative_count > positive_count:
-            sentiment = 'negative'
-        else:
-            sentiment = 'neutral'
-        
-        return {
-            'overall_sentiment': sentiment,
-            'communication_health': communication_health,
-            'emotional_balance': min(0.9, communication_health + 0.1),
-            'suggestions': [
-                'Keep up the positive communication!' if sentiment == 'positive' else 'Try using more positive language',
-                'Share more about your feelings',
-                'Ask open-ended questions to deepen conversations'
-            ]
-        }
+        result = await engine_executor.run_in_pool(
+            engine_executor.pool_for('sentiment'), score_communication, request.messages
+        )
+        if request.user_id and request.partner_id:
+            key = couple_key(request.user_id, request.partner_id)
+            topic_hits = topic_tagger.observe(key, request.messages)
+            adaptive_engine.update_conversation_context(key, {
+                'topics': topic_hits,
+                'sentiment': result['overall_sentiment'],
+                'participants': [request.user_id, request.partner_id],
+                'message_count': len(request.messages)
+            })
+            result['topics'] = topic_tagger.top_topics(key)
+        return result
     except Exception as e:
-        return {
-            'overall_sentiment': 'neutral',
-            'communication_health': 0.5,
-            'emotional_balance': 0.5,
-            'suggestions': ['Continue your conversation to get better insights']
-        }
+        return fallback_communication_analysis()
+
+def fallback_communication_analysis() -> Dict[str, Any]:
+    return {
+        'overall_sentiment': 'neutral',
+        'communication_health': 0.5,
+        'emotional_balance': 0.5,
+        'suggestions': ['Continue your conversation to get better insights']
+    }
+
+# Template routes are cheap; model routes share the engine thread pool. Routes with a fallback payload
+# answer with it when shed, the rest get 503 + Retry-After. Everything unregistered is never shed.
+admission.add_class('cheap', slots=int(os.environ.get('ADMISSION_CHEAP_SLOTS', 64)), service_time_ms=2)
+admission.add_class('heavy', slots=int(os.environ.get('ADMISSION_HEAVY_SLOTS', engine_executor.pool_sizes['thread'])),
+                    service_time_ms=50)
+admission.route('/questions/adaptive', 'cheap', fallback=fallback_adaptive_questions)
+admission.route('/questions/generate', 'cheap', fallback=fallback_generated_questions)
+admission.route('/questions/contextual', 'cheap')
+admission.route('/games/create-session', 'cheap')
+admission.route('/analyze-communication', 'heavy', fallback=fallback_communication_analysis)
+admission.route('/analyze-sentiment', 'heavy')
+admission.route('/analyze-compatibility', 'heavy')
+admission.route('/insights/relationship', 'heavy')
+admission.route('/questions/recommend', 'heavy')
+admission.route('/questions/follow-up', 'heavy')
+admission.route('/games/submit-response', 'heavy')
+
+@app.post("/questions/contextual")
+async def contextual_questions(request: ContextualQuestionsRequest):
+    """Questions about what the couple has been talking about lately, from the streamed topic counts"""
+    key = couple_key(request.user_id, request.partner_id)
+    topics = topic_tagger.top_topics(key, count=request.count)
+    sentiment = adaptive_engine.couple_sentiment(key)
+    questions = await engine_executor.call(
+        'generator', 'generate_contextual_questions', topics, sentiment, request.user_id, request.partner_id,
+        count=request.count
+    )
+    return {"questions": questions, "topics": topics, "sentiment": sentiment}
+
+@app.post("/questions/follow-up")
+async def follow_up_questions(request: FollowUpQuestionsRequest):
+    """Follow-up questions for every answer in a session, generated in one batch"""
+    couple_id = couple_key(request.user_id, request.partner_id) if request.user_id and request.partner_id else None
+    questions = await engine_executor.call(
+        'generator', 'generate_follow_up_questions', request.answers,
+        count=len(request.answers), couple_id=couple_id, per_answer=max(1, request.per_answer or 1)
+    )
+    return {"questions": questions}
+
+@app.post("/analyze-sentiment")
+async def analyze_sentiment(request: SentimentRequest):
+    try:
+        return await engine_executor.call('sentiment', 'analyze', request.text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze-compatibility")
+async def analyze_compatibility(request: CompatibilityRequest):
+    # The score is symmetric in the two answer sets, so either partner's request shares the key
+    key = single_flight.make_key(*sorted([request.user1_answers, request.user2_answers], key=single_flight.make_key))
+    try:
+        result = await single_flight.run('compatibility.analyze', key, lambda: engine_executor.call(
+            'compatibility', 'analyze', request.user1_answers, request.user2_answers
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if request.user_id and request.partner_id:
+        memcached_publisher.publish_compatibility(request.user_id, request.partner_id, result)
+    return result
+
+@app.post("/insights/relationship")
+async def relationship_insights(request: RelationshipInsightRequest):
+    key = single_flight.make_key(request.interaction_history)
+    try:
+        return await single_flight.run('compatibility.generate_insights', key, lambda: engine_executor.call(
+            'compatibility', 'generate_insights', request.interaction_history
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/daily/{user_id}/{partner_id}")
+async def daily_pick(user_id: str, partner_id: str, day: Optional[date] = None):
+    """The couple's question, tip and games for the day (default today, UTC), as planned by the nightly batch"""
+    return await daily_picks.get(user_id, partner_id, day or datetime.utcnow().date())
+
+@app.get("/insights/learning/{user_id}")
+async def learning_insights(user_id: str, trend: bool = False, window_days: int = 7,
+                            session: AsyncSession = Depends(get_db)):
+    """Learning insights from the user's materialized aggregate row; trend=true adds a daily engagement series"""
+    aggregate = await load_aggregate(session, user_id)
+    if aggregate is None:
+        return adaptive_engine.insights_from_aggregates({'games_played': 0})
+    insights = adaptive_engine.insights_from_aggregates(insight_inputs(aggregate))
+    insights['last_active'] = aggregate['last_active']
+    if trend:
+        insights['engagement_trend'] = await engagement_trend(session, user_id, window_days=window_days)
+    return insights
+
+@app.post("/questions/recommend")
+async def recommend_questions(request: QuestionRecommendationRequest):
+    # Recommendations are per couple and read the answered list only as a set plus its length
+    key = single_flight.make_key(
+        sorted([request.user_id, request.partner_id]), sorted(request.answered_questions), request.preferences
+    )
+    try:
+        return await single_flight.run('recommender.recommend', key, lambda: engine_executor.call(
+            'recommender', 'recommend', request.user_id, request.answered_questions, request.preferences,
+            partner_id=request.partner_id
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/games/create-session")
 async def create_game_session(request: dict):
@@ -214,6 +531,7 @@ async def create_game_session(request: dict):
         couple_id = request.get('couple_id', 'couple_123')
         game_type = request.get('game_type', 'adaptive')
         user_id = request.get('user_id', 'user_123')
+        optimal_difficulty = await predict_difficulty(user_id)
         
         # Generate fallback questions
         questions = [
@@ -225,14 +543,42 @@ async def create_game_session(request: dict):
         return {
             "session_id": f"session_{user_id}_{couple_id}",
             "questions": questions,
-            "optimal_difficulty": "medium"
+            "optimal_difficulty": optimal_difficulty
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/games/submit-response")
 async def submit_game_response(request: dict):
+    global sessions_since_training
     try:
+        user_id = request.get('user_id')
+        if user_id:
+            game_data = dict(request.get('game_data') or {})
+            game_data.setdefault('category', request.get('game_type', 'general'))
+            adaptive_engine.record_game_session(user_id, request.get('partner_id', 'unknown'), game_data)
+            if game_data.get('question_ids') and request.get('partner_id'):
+                await engine_executor.call(
+                    'recommender', 'record_engagement', user_id, request['partner_id'],
+                    game_data['question_ids'], game_data.get('engagement_score', 0.5)
+                )
+            if PERSIST_GAME_RESULTS:
+                performance_ingestor.add({
+                    'user_id': user_id,
+                    'game_type': request.get('game_type'),
+                    'score': game_data.get('score'),
+                    'difficulty': game_data.get('difficulty'),
+                    'category': game_data.get('category'),
+                    'engagement_score': game_data.get('engagement_score'),
+                    'completion_time': game_data.get('completion_time'),
+                    'answers': game_data.get('responses')
+                })
+            
+            sessions_since_training += 1
+            if sessions_since_training >= RETRAIN_EVERY_SESSIONS:
+                sessions_since_training = 0
+                await engine_executor.call('adaptive', 'train_models')
+        
         return {
             "success": True,
             "learning_updated": True,
@@ -247,6 +593,203 @@ async def submit_game_response(request: dict):
             "engagement_score": 0.5
         }
 
+# A dashboard render sends its reads as one /batch request; each op runs the same code as its route
+# and is admitted into its route's class, so /batch itself is not under admission control.
+# Writes (game submissions) are left to their own routes.
+batch_dispatcher = BatchDispatcher(admission=admission)
+batch_dispatcher.register('questions/adaptive', AdaptiveQuestionsRequest, batch_adaptive_questions)
+batch_dispatcher.register('questions/generate', QuestionGenerateRequest, batch_generated_questions)
+batch_dispatcher.register('questions/contextual', ContextualQuestionsRequest, contextual_questions)
+batch_dispatcher.register('questions/follow-up', FollowUpQuestionsRequest, follow_up_questions)
+batch_dispatcher.register('questions/recommend', QuestionRecommendationRequest, recommend_questions)
+batch_dispatcher.register('analyze-communication', CommunicationAnalysisRequest, analyze_communication)
+batch_dispatcher.register('analyze-sentiment', SentimentRequest, analyze_sentiment)
+batch_dispatcher.register('analyze-compatibility', CompatibilityRequest, analyze_compatibility)
+batch_dispatcher.register('insights/relationship', RelationshipInsightRequest, relationship_insights)
+batch_dispatcher.register('daily', DailyPickRequest, lambda request: daily_pick(request.user_id, request.partner_id, request.day))
+metrics.add_collector(batch_dispatcher.metric_families)
+
+@app.post("/batch")
+async def batch(request: BatchRequest):
+    """Several ML operations in one round trip, run concurrently; results keyed by name, each with its own status"""
+    return Response(content=await batch_dispatcher.run(request), media_type='application/json')
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/inference")
+async def inference_stats():
+    return {"difficulty_model": difficulty_batcher.stats()}
+
+@app.get("/stats/cache")
+async def cache_stats():
+    return response_cache.stats()
+
+@app.get("/stats/ingestion")
+async def ingestion_stats():
+    return performance_ingestor.stats()
+
+@app.get("/stats/ids")
+async def id_stats():
+    return {
+        'registry': id_registry.stats(),
+        'user_state': adaptive_engine.user_state.stats(),
+        'question_state': adaptive_engine.question_state.stats(),
+        'couple_state': adaptive_engine.couple_state.stats(),
+        'answered': adaptive_engine.answered.stats(),
+        'question_history': adaptive_engine.question_history.stats()
+    }
+
+@app.get("/stats/topics")
+async def topic_stats():
+    return topic_tagger.stats()
+
+@app.get("/stats/follow-ups")
+async def follow_up_stats():
+    return question_generator.follow_ups.stats()
+
+@app.get("/stats/snapshots")
+async def snapshot_stats():
+    return snapshot_store.stats() if snapshot_store else {'enabled': False}
+
+@app.get("/stats/daily")
+async def daily_stats():
+    return daily_picks.stats()
+
+@app.post("/admin/daily-picks", dependencies=[Depends(require_admin)])
+async def precompute_daily_picks(day: Optional[date] = None, limit: Optional[int] = None):
+    """Plan a day's picks now (default tomorrow, UTC); couples already planned for that day are skipped"""
+    try:
+        return await daily_picks.job.run(day or datetime.utcnow().date() + timedelta(days=1), limit=limit)
+    except RunInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/snapshot", dependencies=[Depends(require_admin)])
+async def save_snapshot():
+    if not snapshot_store:
+        raise HTTPException(status_code=409, detail="Snapshots are disabled (SNAPSHOT_PATH is empty)")
+    try:
+        return await snapshot_store.save_async()
+    except SnapshotError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.put("/admin/question-templates", dependencies=[Depends(require_admin)])
+async def replace_question_templates(templates: Dict[str, List[str]]):
+    """Replace the question templates; cached question responses built from the old ones are dropped"""
+    # Requests normalize the category to lower case, and unknown categories fall back to communication
+    templates = {category.strip().lower(): texts for category, texts in templates.items()}
+    if not templates.get('communication'):
+        raise HTTPException(status_code=422, detail="Templates must include a non-empty 'communication' category")
+    empty = [category for category, texts in templates.items() if not texts]
+    if empty:
+        raise HTTPException(status_code=422, detail=f"Categories without templates: {', '.join(empty)}")
+    reload_question_templates(templates)
+    return {"categories": {category: len(texts) for category, texts in templates.items()}}
+
+@app.get("/stats/coalescing")
+async def coalescing_stats():
+    return single_flight.stats()
+
+@app.get("/stats/memcached")
+async def memcached_stats():
+    return memcached_publisher.stats()
+
+@app.get("/stats/batch")
+async def batch_stats():
+    return batch_dispatcher.stats()
+
+@app.get("/stats/admission")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/stats/executor")
+async def executor_stats():
+    return engine_executor.pool_stats()
+
+@app.get("/admin/profile/sample", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def sample_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample all threads' stacks for N seconds and return collapsed (flamegraph-ready) stacks"""
+    seconds = max(0.1, min(seconds, 120.0))
+    interval = max(0.001, interval_ms / 1000.0)
+    collapsed = await asyncio.to_thread(sample_stacks, seconds, interval)
+    return PlainTextResponse(collapsed)
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def list_request_profiles():
+    return {"profiles": profile_store.list()}
+
+@app.get("/admin/profile/requests/{profile_id}", response_class=PlainTextResponse,
+         dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str):
+    report = profile_store.get(profile_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report['stats'])
+
+@app.post("/admin/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot():
+    return memory_tracker.take_baseline()
+
+@app.get("/admin/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(limit: int = 25, group_by: str = 'lineno', engines_only: bool = False):
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    try:
+        return memory_tracker.diff(limit=limit, group_by=group_by, engines_only=engines_only)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/admin/memory/snapshot", dependencies=[Depends(require_admin)])
+async def stop_memory_tracking():
+    memory_tracker.stop()
+    return {"tracing": False}
+
+@app.on_event("startup")
+async def start_executor():
+    await engine_executor.start()
+
+@app.on_event("startup")
+async def restore_snapshot():
+    global snapshot_task
+    if not snapshot_store or not snapshot_writer:
+        return
+    # Preloaded workers were forked after the master restored the snapshot and trained the model
+    if not preloaded:
+        report = snapshot_store.restore()
+        if 'adaptive' in report['restored']:
+            # Requests fall back to the heuristic difficulty until the model is refit from the restored profiles
+            task = asyncio.create_task(engine_executor.call('adaptive', 'train_models'))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+    if SNAPSHOT_INTERVAL_SECONDS > 0:
+        snapshot_task = asyncio.create_task(snapshot_periodically())
+
+@app.on_event("startup")
+async def schedule_daily_picks():
+    global daily_batch_task
+    # Preloaded workers leave it to worker 0. Under uvicorn --workers every worker schedules it,
+    # and the job's run lock lets one of them (or a replica, or cron) plan the day.
+    if DAILY_BATCH_HOUR and snapshot_writer:
+        daily_batch_task = asyncio.create_task(precompute_daily_picks_nightly())
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    if daily_batch_task:
+        daily_batch_task.cancel()
+    await performance_ingestor.drain()
+    await memcached_publisher.drain()
+    if snapshot_task:
+        snapshot_task.cancel()
+    if snapshot_store and snapshot_writer and snapshot_store.claim_writer():
+        try:
+            await snapshot_store.save_async()
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+    engine_executor.shutdown()
+    id_registry.close()
+    await db.dispose()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7860))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -93,6 +93,15 @@ router.post('/submit', auth, async (req, res) => {
       
       await activity.save();
       
+      // A quiz both partners finished updates the couple's compatibility score
+      if (bothCompleted && activityType === 'quiz') {
+        const quizActivities = await CoupleActivity.findAll({
+          where: { coupleId, activityType: 'quiz', bothCompleted: true }
+        });
+        const mlResults = require('../services/mlResults');
+        await mlResults.analyzeCompatibility(userId, user.partnerId, quizActivities);
+      }
+      
       // Send notification to partner when user completes activity
       try {
         const partner = await User.findByPk(user.partnerId);
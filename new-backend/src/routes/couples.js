@@ -100,4 +100,22 @@ router.get('/current', auth, async (req, res) => {
   }
 });
 
+// Get the couple's latest compatibility result (published by the ML service)
+router.get('/compatibility', auth, async (req, res) => {
+  try {
+    const user = await User.findByPk(req.user.id);
+
+    if (!user.partnerId) {
+      return res.json({ hasPartner: false, compatibility: null });
+    }
+
+    const mlResults = require('../services/mlResults');
+    const compatibility = await mlResults.getCompatibility(user.id, user.partnerId);
+
+    res.json({ hasPartner: true, compatibility });
+  } catch (error) {
+    res.status(500).json({ error: error.message });
+  }
+});
+
 module.exports = router;
\ No newline at end of file
@@ -280,6 +280,26 @@ router.get('/partner-results/:gameType', auth, async (req, res) => {
   }
 });
 
+// Get the couple's recommended games for today (planned by the ML service)
+router.get('/recommended', auth, async (req, res) => {
+  try {
+    const currentUser = await User.findByPk(req.user.id);
+    const partnerId = currentUser?.partnerId;
+
+    if (!partnerId) {
+      return res.json({ hasPartner: false, games: [] });
+    }
+
+    const mlResults = require('../services/mlResults');
+    const games = await mlResults.getRecommendedGames(req.user.id, partnerId);
+
+    res.json({ hasPartner: true, games: games || [] });
+  } catch (error) {
+    console.error('Recommended games error:', error);
+    res.status(500).json({ error: 'Failed to get recommended games' });
+  }
+});
+
 // Get leaderboard
 router.get('/leaderboard', async (req, res) => {
   try {
@@ -358,14 +358,20 @@ router.get('/today', auth, async (req, res) => {
     const userAnswer = userAnswerData ? JSON.parse(userAnswerData) : null;
     const partnerAnswer = partnerAnswerData ? JSON.parse(partnerAnswerData) : null;
     
+    // The ML service's daily pick for the couple: the planned question, a tip and the games to play today
+    const mlResults = require('../services/mlResults');
+    const dailyPick = partnerId ? await mlResults.getDailyPick(req.user.id, partnerId) : null;
+    
     // Return in expected format
     res.json({
-      question: question,
+      question: dailyPick?.question || question,
       userHasAnswered: !!userAnswer,
       partnerHasAnswered: !!partnerAnswer,
       bothAnswered: !!userAnswer && !!partnerAnswer,
       userAnswer: userAnswer?.answer || null,
-      partnerAnswer: partnerAnswer?.answer || null
+      partnerAnswer: partnerAnswer?.answer || null,
+      tip: dailyPick?.tip || null,
+      recommendedGames: dailyPick?.games || []
     });
   } catch (error) {
     console.error('Today question error:', error);
@@ -380,7 +386,9 @@ router.get('/today', auth, async (req, res) => {
       partnerHasAnswered: false,
       bothAnswered: false,
       userAnswer: null,
-      partnerAnswer: null
+      partnerAnswer: null,
+      tip: null,
+      recommendedGames: []
     });
   }
 });
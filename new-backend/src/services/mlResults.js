@@ -0,0 +1,110 @@
+const axios = require('axios');
+const memcached = require('./memcached');
+
+// Compatibility category each couple quiz's answers count towards; other quizzes count as personality
+const QUIZ_CATEGORIES = {
+  love_language: 'intimacy',
+  adaptive_intimacy: 'intimacy',
+  communication_style: 'communication',
+  adaptive_communication: 'communication',
+  financial_personality: 'values',
+  adaptive_fun: 'lifestyle'
+};
+
+// Reads results the ML service publishes to memcached (see ml-service/README.md for the keys).
+// On a miss for the daily pick it asks the ML service, which also publishes the pick again.
+class MlResultsService {
+  constructor() {
+    this.mlServiceUrl = process.env.ML_SERVICE_URL;
+    this.timeout = 3000;
+  }
+
+  // Same couple key the ML service uses: the two user ids in sorted order joined by "_"
+  coupleKey(userId, partnerId) {
+    const [first, second] = [String(userId), String(partnerId)].sort();
+    return `${first}_${second}`;
+  }
+
+  // Daily keys are per UTC day, YYYY-MM-DD
+  utcDay(date = new Date()) {
+    return date.toISOString().slice(0, 10);
+  }
+
+  async readJson(key) {
+    try {
+      const value = await memcached.get(key);
+      return value ? JSON.parse(value) : null;
+    } catch (error) {
+      console.error(`ML result read error for ${key}:`, error.message);
+      return null;
+    }
+  }
+
+  // { question, tip, games } for the couple's day, or null if neither memcached nor the ML service has it
+  async getDailyPick(userId, partnerId, day = this.utcDay()) {
+    const cached = await this.readJson(`ml:daily:${this.coupleKey(userId, partnerId)}:${day}`);
+    if (cached) return cached;
+    if (!this.mlServiceUrl) return null;
+
+    try {
+      const response = await axios.get(
+        `${this.mlServiceUrl}/daily/${encodeURIComponent(userId)}/${encodeURIComponent(partnerId)}`,
+        { params: { day }, timeout: this.timeout }
+      );
+      const { question, tip, games } = response.data;
+      return { question, tip, games };
+    } catch (error) {
+      console.error('ML daily pick error:', error.message);
+      return null;
+    }
+  }
+
+  async getRecommendedGames(userId, partnerId, day = this.utcDay()) {
+    const games = await this.readJson(`ml:games:${this.coupleKey(userId, partnerId)}:${day}`);
+    if (games) return games;
+    const pick = await this.getDailyPick(userId, partnerId, day);
+    return pick ? pick.games : null;
+  }
+
+  // The last /analyze-compatibility result for the couple (see analyzeCompatibility); null until
+  // both partners have completed a quiz
+  async getCompatibility(userId, partnerId) {
+    return this.readJson(`ml:compatibility:${this.coupleKey(userId, partnerId)}`);
+  }
+
+  // Scores the couple on every quiz both partners completed. The ML service publishes the result
+  // under the couple's ml:compatibility key, which getCompatibility reads.
+  async analyzeCompatibility(userId, partnerId, quizActivities) {
+    if (!this.mlServiceUrl) return null;
+
+    const userAnswers = {};
+    const partnerAnswers = {};
+    for (const activity of quizActivities) {
+      const category = QUIZ_CATEGORIES[activity.activityName] || 'personality';
+      const [userResponse, partnerResponse] = activity.user1Id === userId
+        ? [activity.user1Response, activity.user2Response]
+        : [activity.user2Response, activity.user1Response];
+      (userResponse?.answers || []).forEach((answer, index) => {
+        userAnswers[category] = { ...userAnswers[category], [`${activity.activityName}_${index}`]: answer };
+      });
+      (partnerResponse?.answers || []).forEach((answer, index) => {
+        partnerAnswers[category] = { ...partnerAnswers[category], [`${activity.activityName}_${index}`]: answer };
+      });
+    }
+
+    try {
+      const response = await axios.post(`${this.mlServiceUrl}/analyze-compatibility`, {
+        user1_answers: userAnswers,
+        user2_answers: partnerAnswers,
+        user_id: String(userId),
+        partner_id: String(partnerId)
+      }, { timeout: this.timeout });
+      return response.data;
+    } catch (error) {
+      console.error('ML compatibility error:', error.message);
+      return null;
+    }
+  }
+}
+
+module.exports = new MlResultsService();
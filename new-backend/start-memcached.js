@@ -1,35 +1,142 @@
 const net = require('net');
 
+// A stand-in for memcached in local development: enough of the text protocol for the
+// `memcached` client and the ML service's publisher (storage commands with data blocks,
+// multi-key get/gets, delete, touch, flush_all, noreply and pipelined commands).
 const cache = new Map();
+let casCounter = 0;
+
+const STORAGE_COMMANDS = new Set(['set', 'add', 'replace', 'append', 'prepend', 'cas']);
+
+// memcached reads an expiry above 30 days as an absolute unix time; 0 never expires
+function expiresAt(exptime) {
+  const seconds = parseInt(exptime, 10) || 0;
+  if (seconds === 0) return Infinity;
+  if (seconds < 0) return 0;
+  return seconds > 30 * 24 * 3600 ? seconds * 1000 : Date.now() + seconds * 1000;
+}
+
+function lookup(key) {
+  const item = cache.get(key);
+  if (!item) return null;
+  if (Date.now() >= item.expires) {
+    cache.delete(key);
+    return null;
+  }
+  return item;
+}
+
+function store(cmd, args, data) {
+  const [key, flags, exptime] = args;
+  const existing = lookup(key);
+  if (cmd === 'add' && existing) return 'NOT_STORED';
+  if ((cmd === 'replace' || cmd === 'append' || cmd === 'prepend') && !existing) return 'NOT_STORED';
+  if (cmd === 'cas') {
+    if (!existing) return 'NOT_FOUND';
+    if (String(existing.cas) !== args[4]) return 'EXISTS';
+  }
+
+  let value = data;
+  if (cmd === 'append') value = Buffer.concat([existing.value, data]);
+  if (cmd === 'prepend') value = Buffer.concat([data, existing.value]);
+  const keepExpiry = cmd === 'append' || cmd === 'prepend';
+  cache.set(key, {
+    value,
+    flags: keepExpiry ? existing.flags : parseInt(flags, 10) || 0,
+    expires: keepExpiry ? existing.expires : expiresAt(exptime),
+    cas: ++casCounter
+  });
+  return 'STORED';
+}
+
+function retrieve(cmd, keys) {
+  const parts = [];
+  for (const key of keys) {
+    const item = lookup(key);
+    if (!item) continue;
+    const cas = cmd === 'gets' ? ` ${item.cas}` : '';
+    parts.push(Buffer.from(`VALUE ${key} ${item.flags} ${item.value.length}${cas}\r\n`), item.value, Buffer.from('\r\n'));
+  }
+  parts.push(Buffer.from('END\r\n'));
+  return Buffer.concat(parts);
+}
+
+function execute(cmd, args) {
+  switch (cmd) {
+    case 'delete':
+      return cache.delete(args[0]) ? 'DELETED' : 'NOT_FOUND';
+    case 'touch': {
+      const item = lookup(args[0]);
+      if (!item) return 'NOT_FOUND';
+      item.expires = expiresAt(args[1]);
+      return 'TOUCHED';
+    }
+    case 'flush_all':
+      cache.clear();
+      return 'OK';
+    case 'version':
+      return 'VERSION 1.6.0-standin';
+    case 'stats':
+      return `STAT curr_items ${cache.size}\r\nEND`;
+    default:
+      return 'ERROR';
+  }
+}
 
 const server = net.createServer((socket) => {
-  socket.on('data', (data) => {
-    const command = data.toString().trim().split(' ');
-    const cmd = command[0].toLowerCase();
-    
-    switch (cmd) {
-      case 'set':
-        const [, key, flags, exptime, bytes] = command;
-        cache.set(key, { value: '', expires: Date.now() + (parseInt(exptime) * 1000) });
-        socket.write('STORED\r\n');
-        break;
-        
-      case 'get':
-        const getKey = command[1];
-        const item = cache.get(getKey);
-        if (item && Date.now() < item.expires) {
-          socket.write(`VALUE ${getKey} 0 ${item.value.length}\r\n${item.value}\r\nEND\r\n`);
+  let buffer = Buffer.alloc(0);
+  // A storage command waiting for its data block
+  let pending = null;
+
+  socket.on('data', (chunk) => {
+    buffer = Buffer.concat([buffer, chunk]);
+    const replies = [];
+
+    while (true) {
+      if (pending) {
+        if (buffer.length < pending.bytes + 2) break;
+        const data = buffer.subarray(0, pending.bytes);
+        buffer = buffer.subarray(pending.bytes + 2);
+        const reply = store(pending.cmd, pending.args, Buffer.from(data));
+        if (!pending.noreply) replies.push(Buffer.from(`${reply}\r\n`));
+        pending = null;
+        continue;
+      }
+
+      const end = buffer.indexOf('\r\n');
+      if (end < 0) break;
+      const line = buffer.subarray(0, end).toString();
+      buffer = buffer.subarray(end + 2);
+      const [rawCmd, ...args] = line.trim().split(/ +/);
+      const cmd = (rawCmd || '').toLowerCase();
+      const noreply = args[args.length - 1] === 'noreply';
+      if (noreply) args.pop();
+
+      if (STORAGE_COMMANDS.has(cmd)) {
+        const bytes = parseInt(args[3], 10);
+        if (args.length < 4 || Number.isNaN(bytes) || bytes < 0) {
+          replies.push(Buffer.from('CLIENT_ERROR bad command line format\r\n'));
         } else {
-          socket.write('END\r\n');
+          pending = { cmd, args, bytes, noreply };
         }
-        break;
-        
-      default:
-        socket.write('ERROR\r\n');
+      } else if (cmd === 'get' || cmd === 'gets') {
+        replies.push(retrieve(cmd, args));
+      } else if (cmd === 'quit') {
+        socket.end();
+        return;
+      } else {
+        const reply = execute(cmd, args);
+        if (!noreply) replies.push(Buffer.from(`${reply}\r\n`));
+      }
     }
+
+    if (replies.length) socket.write(Buffer.concat(replies));
   });
+
+  socket.on('error', () => socket.destroy());
 });
 
-server.listen(11211, () => {
-  console.log('Memcached server running on port 11211');
-});
\ No newline at end of file
+const port = parseInt(process.env.MEMCACHED_PORT || '11211', 10);
+server.listen(port, () => {
+  console.log(`Memcached server running on port ${port}`);
+});